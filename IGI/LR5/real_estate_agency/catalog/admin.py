@@ -27,8 +27,8 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Estate)
 class EstateAdmin(admin.ModelAdmin):
-    list_display = ["address", "cost", "category", "sale"]
-    list_filter = ["category", "category__category"]
+    list_display = ["address", "cost", "category", "sale", "is_available"]
+    list_filter = ["is_available", "category", "category__category"]
 
 
 @admin.register(PurchaseRequest)
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from catalog.models import Estate
+
+
+class Command(BaseCommand):
+    help = "Recompute Estate.is_available from the existing sales"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            sold = Estate.objects.filter(sale__isnull=False, is_available=True).update(
+                is_available=False
+            )
+            available = Estate.objects.filter(
+                sale__isnull=True, is_available=False
+            ).update(is_available=True)
+
+        self.stdout.write(
+            f"Marked {sold} estate(s) as sold and {available} as available"
+        )
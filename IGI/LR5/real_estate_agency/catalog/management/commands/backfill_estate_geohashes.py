@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from catalog.models import Estate
+from catalog.utils import CatalogVersion
+
+
+class Command(BaseCommand):
+    help = "Recompute Estate.geohash from the stored coordinates"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of estates updated per query",
+        )
+
+    def handle(self, *args, **options):
+        changed = []
+        queryset = Estate.objects.only("id", "lat", "lng", "geohash").order_by("id")
+        for estate in queryset.iterator(chunk_size=options["batch_size"]):
+            geohash = Estate.make_geohash(estate.lat, estate.lng)
+            if geohash != estate.geohash:
+                estate.geohash = geohash
+                changed.append(estate)
+
+        with transaction.atomic():
+            Estate.objects.bulk_update(
+                changed, ["geohash"], batch_size=options["batch_size"]
+            )
+        if changed:
+            CatalogVersion.bump()
+        self.stdout.write(f"Updated geohashes of {len(changed)} estate(s)")
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from catalog.models import Estate
+
+
+class Command(BaseCommand):
+    help = "Recompute Estate.summary from the estate descriptions"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of estates updated per query",
+        )
+
+    def handle(self, *args, **options):
+        changed = []
+        queryset = Estate.objects.only("id", "description", "summary").order_by("id")
+        for estate in queryset.iterator(chunk_size=options["batch_size"]):
+            summary = Estate.make_summary(estate.description)
+            if summary != estate.summary:
+                estate.summary = summary
+                changed.append(estate)
+
+        with transaction.atomic():
+            Estate.objects.bulk_update(
+                changed, ["summary"], batch_size=options["batch_size"]
+            )
+        self.stdout.write(f"Updated summaries of {len(changed)} estate(s)")
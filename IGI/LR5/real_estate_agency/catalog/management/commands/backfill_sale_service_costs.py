@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import DecimalField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from catalog.models import Sale, Service
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill Sale.service_cost from the current service costs, then run "
+        "rebuild_sales_rollups"
+    )
+
+    def handle(self, *args, **options):
+        service_cost = Subquery(
+            Service.objects.filter(estate=OuterRef("estate_id")).values("cost")[:1]
+        )
+        with transaction.atomic():
+            updated = Sale.objects.update(
+                service_cost=Coalesce(
+                    service_cost, Value(0), output_field=DecimalField()
+                )
+            )
+        self.stdout.write(f"Updated service costs of {updated} sale(s)")
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from catalog.utils import AssignmentStrategy, EmployeeLoad, EmployeeLoadIndex
+from catalog.utils.assignment_strategies import ASSIGNMENT_STRATEGIES
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure purchase request assignment throughput against the current "
+        "employees; every change is rolled back"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--strategy",
+            choices=sorted(ASSIGNMENT_STRATEGIES),
+            action="append",
+            help="Strategy to measure, all of them by default",
+        )
+        parser.add_argument("--count", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        names = options["strategy"] or sorted(ASSIGNMENT_STRATEGIES)
+        count = options["count"]
+
+        with transaction.atomic():
+            EmployeeLoadIndex.clear_local()
+            if not EmployeeLoadIndex.get().employee_ids:
+                raise CommandError("There are no employees to assign requests to")
+
+            for name in names:
+                strategy = AssignmentStrategy.get(name)
+                index = EmployeeLoadIndex.get()
+                started = time.perf_counter()
+                for _ in range(count):
+                    strategy.choose(index)
+                choices = count / (time.perf_counter() - started)
+
+                started = time.perf_counter()
+                for _ in range(count):
+                    EmployeeLoad.assign(strategy=strategy)
+                assignments = count / (time.perf_counter() - started)
+
+                self.stdout.write(
+                    f"{name}: {choices:.0f} choices/s, {assignments:.0f} assignments/s"
+                )
+            transaction.set_rollback(True)
+        EmployeeLoadIndex.clear_local()
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalog.utils import EstateGeocoder
+
+
+class Command(BaseCommand):
+    help = "Geocode estates whose coordinates are missing or outdated"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling the queue instead of exiting once it is drained",
+        )
+        parser.add_argument("--interval", type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        while True:
+            processed = EstateGeocoder.process_pending(limit=options["batch_size"])
+            if processed:
+                self.stdout.write(f"Geocoded {processed} estate(s)")
+
+            if processed < options["batch_size"]:
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from catalog.utils import EmployeeLoad
+
+
+class Command(BaseCommand):
+    help = "Recompute the active purchase request counters of all employees"
+
+    def handle(self, *args, **options):
+        corrected = EmployeeLoad.rebuild()
+        self.stdout.write(f"Corrected {corrected} employee counter(s)")
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from catalog.utils import EstateSearch
+
+
+class Command(BaseCommand):
+    help = "Create the estate full-text index if needed and refill it"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default="default",
+            help="Database alias to rebuild the index on",
+        )
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        if not EstateSearch.install(using):
+            self.stderr.write(f"Full-text search is not supported on {using}")
+            return
+
+        count = EstateSearch.rebuild(using)
+        self.stdout.write(f"Indexed {count} estate(s)")
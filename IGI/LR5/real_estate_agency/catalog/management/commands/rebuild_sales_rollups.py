@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from catalog.utils import SalesRollup
+
+
+class Command(BaseCommand):
+    help = "Recompute the sales statistics rollup tables from scratch"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report rows that differ from a fresh computation",
+        )
+
+    def handle(self, *args, **options):
+        if options["check"]:
+            mismatches = SalesRollup.check()
+            for key, (stored, expected) in sorted(mismatches.items(), key=str):
+                self.stdout.write(f"{key}: stored={stored} expected={expected}")
+            if mismatches:
+                self.stderr.write(f"{len(mismatches)} rollup row(s) out of sync")
+            else:
+                self.stdout.write("Rollups are consistent")
+            return
+
+        SalesRollup.rebuild()
+        self.stdout.write("Rollups rebuilt")
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalog.utils import EstateRecommender
+
+
+class Command(BaseCommand):
+    help = "Precompute similar estates for new and changed listings"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Recompute the neighbours of every available estate",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling the queue instead of exiting once it is drained",
+        )
+        parser.add_argument("--interval", type=float, default=30.0)
+
+    def handle(self, *args, **options):
+        if options["rebuild"]:
+            count = EstateRecommender.rebuild()
+            self.stdout.write(f"Similar estates rebuilt for {count} estate(s)")
+            return
+
+        while True:
+            processed = EstateRecommender.process_pending(limit=options["batch_size"])
+            if processed:
+                self.stdout.write(f"Refreshed similar estates of {processed} estate(s)")
+
+            if processed < options["batch_size"]:
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
@@ -1,10 +1,12 @@
 from django.core.validators import MinValueValidator
-from django.db import models
-from django.db.models import Count
+from django.db import models, transaction
 from django.urls import reverse
 from django.conf import settings
+from django.utils.text import Truncator
 from users.models import Employee, Client
 
+SUMMARY_LENGTH = 150
+
 
 class Estate(models.Model):
     cost = models.DecimalField(
@@ -30,14 +32,73 @@ class Estate(models.Model):
     )
     image = models.ImageField(blank=True, null=True, upload_to="estates/")
     address = models.CharField(max_length=200)
+    lat = models.FloatField(blank=True, null=True, editable=False)
+    lng = models.FloatField(blank=True, null=True, editable=False)
+    geocoded_at = models.DateTimeField(blank=True, null=True, editable=False)
+    is_available = models.BooleanField(default=True, editable=False)
+    summary = models.CharField(max_length=SUMMARY_LENGTH, blank=True, editable=False)
+    geohash = models.CharField(max_length=12, blank=True, editable=False)
+    similar_refreshed_at = models.DateTimeField(blank=True, null=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        self.summary = self.make_summary(self.description)
+        self.geohash = self.make_geohash(self.lat, self.lng)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            if "description" in update_fields:
+                update_fields = {*update_fields, "summary"}
+            if "address" in update_fields:
+                # A new address resets the coordinates in pre_save.
+                update_fields = {
+                    *update_fields,
+                    "lat",
+                    "lng",
+                    "geocoded_at",
+                    "similar_refreshed_at",
+                }
+            if {"lat", "lng"} & set(update_fields):
+                update_fields = {*update_fields, "geohash"}
+            kwargs["update_fields"] = update_fields
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def make_geohash(lat, lng):
+        if lat is None or lng is None:
+            return ""
+        from .utils import Geohash
+
+        return Geohash.encode(lat, lng, settings.ESTATE_GEOHASH_PRECISION)
+
+    @staticmethod
+    def make_summary(description):
+        return Truncator(" ".join(str(description).split())).chars(SUMMARY_LENGTH)
 
     def get_image_url(self):
         if self.image and hasattr(self.image, "url"):
             return self.image.url
         return settings.MEDIA_URL + "image_placeholder.jpg"
 
+    @property
+    def has_coordinates(self):
+        return self.lat is not None and self.lng is not None
+
     class Meta:
         ordering = ("-id",)
+        # Partial indexes: SQLite filters on a bare boolean column, which a
+        # composite (is_available, ...) index cannot serve.
+        indexes = [
+            models.Index(
+                fields=["cost"],
+                condition=models.Q(is_available=True),
+                name="estate_available_cost_idx",
+            ),
+            models.Index(
+                fields=["area"],
+                condition=models.Q(is_available=True),
+                name="estate_available_area_idx",
+            ),
+            models.Index(fields=["geohash"], name="estate_geohash_idx"),
+        ]
 
     def __str__(self):
         return f"{self.address}: {self.cost}"
@@ -46,6 +107,22 @@ class Estate(models.Model):
         return reverse("estate-detail", args=[str(self.pk)])
 
 
+class SimilarEstate(models.Model):
+    estate = models.ForeignKey(
+        Estate, on_delete=models.CASCADE, related_name="similar_links"
+    )
+    similar = models.ForeignKey(Estate, on_delete=models.CASCADE, related_name="+")
+    rank = models.PositiveSmallIntegerField()
+    distance = models.FloatField()
+
+    class Meta:
+        ordering = ["estate", "rank"]
+        unique_together = ["estate", "rank"]
+
+    def __str__(self):
+        return f"{self.estate_id} -> {self.similar_id} (#{self.rank})"
+
+
 class ServiceCategory(models.Model):
     name = models.CharField(max_length=200, help_text="Enter the service category name")
 
@@ -69,7 +146,12 @@ class Service(models.Model):
         ordering = ["category__name", "name"]
 
     def __str__(self):
-        return f"({str(self.category)[:2]}) - {self.name}"
+        from .utils import ReferenceData
+
+        category = None
+        if not Service.category.is_cached(self):
+            category = ReferenceData.service_category(self.category_id)
+        return f"({str(category or self.category)[:2]}) - {self.name}"
 
 
 class Sale(models.Model):
@@ -79,15 +161,35 @@ class Sale(models.Model):
     date_of_sale = models.DateField(auto_now_add=True)
     estate = models.OneToOneField(Estate, on_delete=models.CASCADE)
     cost = models.DecimalField(max_digits=10, decimal_places=2, auto_created=True)
+    # Cost of the estate's service when the sale was made; later price
+    # changes of the service do not rewrite sales or their rollups.
+    service_cost = models.DecimalField(
+        max_digits=10, decimal_places=2, default=0, editable=False
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["employee", "date_of_sale"], name="sale_employee_date_idx"
+            ),
+            models.Index(fields=["date_of_sale"], name="sale_date_idx"),
+        ]
 
     def save(self, *args, **kwargs):
-        service_cost = 0
-        if self.estate.category:
-            service_cost = self.estate.category.cost
+        self.cost, self.service_cost = Sale.compute_cost(self.estate_id)
 
-        self.cost = service_cost + self.estate.cost
+        # Keeps the availability flag and rollups in the sale's transaction.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
-        super().save(*args, **kwargs)
+    @staticmethod
+    def compute_cost(estate_id):
+        """Return ``(total cost, service cost)``, read in one query."""
+        estate_cost, service_cost = (
+            Estate.objects.filter(pk=estate_id).values_list("cost", "category__cost").get()
+        )
+        service_cost = service_cost or 0
+        return estate_cost + service_cost, service_cost
 
     def __str__(self):
         return f"{self.employee.user.username} - {self.date_of_contract}"
@@ -95,24 +197,21 @@ class Sale(models.Model):
 
 class PurchaseRequestManager(models.Manager):
     def create_with_assignment(self, **kwargs):
-        active_statuses = ["new", "in_progress"]
-        employee = (
-            Employee.objects.annotate(
-                request_count=Count(
-                    "purchaserequest",
-                    filter=models.Q(purchaserequest__status__in=active_statuses),
-                )
-            )
-            .order_by("request_count")
-            .first()
-        )
+        from .utils import EmployeeLoad
 
-        if employee:
-            kwargs["employee"] = employee
-        else:
-            raise ValueError("Employee does not exist.")
+        with transaction.atomic(using=self.db):
+            client = kwargs.get("client")
+            employee_id = EmployeeLoad.assign(
+                client_id=kwargs.get("client_id", client.pk if client else None)
+            )
+            if employee_id is None:
+                raise ValueError("Employee does not exist.")
 
-        return self.create(**kwargs)
+            request = self.model(employee_id=employee_id, **kwargs)
+            # The claim already counted this request.
+            request._load_claimed = True
+            request.save(force_insert=True, using=self.db)
+        return request
 
 
 class PurchaseRequest(models.Model):
@@ -121,6 +220,7 @@ class PurchaseRequest(models.Model):
         ("in_progress", "In progress"),
         ("completed", "Completed"),
     ]
+    ACTIVE_STATUSES = ("new", "in_progress")
 
     estate = models.ForeignKey(Estate, on_delete=models.CASCADE)
     client = models.ForeignKey(Client, on_delete=models.CASCADE)
@@ -138,6 +238,54 @@ class PurchaseRequest(models.Model):
 
     class Meta:
         unique_together = ["estate", "client"]
+        indexes = [
+            models.Index(
+                fields=["employee", "status"], name="purchase_employee_status_idx"
+            ),
+            models.Index(fields=["client", "estate"], name="purchase_client_estate_idx"),
+        ]
 
     def __str__(self):
         return f"{self.estate} - {self.client.user.username}"
+
+
+class ServiceSalesRollup(models.Model):
+    service = models.OneToOneField(
+        Service, on_delete=models.CASCADE, related_name="sales_rollup"
+    )
+    sold_count = models.IntegerField(default=0)
+    service_cost_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    full_cost_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.service}: {self.sold_count}"
+
+
+class EmployeeDailySalesRollup(models.Model):
+    employee = models.ForeignKey(
+        Employee, on_delete=models.CASCADE, related_name="daily_sales_rollups"
+    )
+    date = models.DateField()
+    sale_count = models.IntegerField(default=0)
+    service_cost_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_cost_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ["employee", "date"]
+        indexes = [
+            models.Index(fields=["date", "employee"], name="employee_rollup_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.employee} - {self.date}: {self.sale_count}"
+
+
+class DailySalesRollup(models.Model):
+    date = models.DateField(unique=True)
+    sale_count = models.IntegerField(default=0)
+    service_cost_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_cost_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    request_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.date}: {self.sale_count}"
@@ -0,0 +1,247 @@
+import logging
+
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    pre_save,
+    post_save,
+    pre_delete,
+    post_delete,
+)
+from django.dispatch import receiver
+
+from users.models import Employee
+
+from .models import Estate, Sale, PurchaseRequest, Service, ServiceCategory
+from .utils import (
+    CatalogVersion,
+    EmployeeLoad,
+    EmployeeLoadIndex,
+    EstateRecommender,
+    EstateSearch,
+    GeocodeCache,
+    ReferenceData,
+    SalesRollup,
+    StaticMapCache,
+)
+
+logger = logging.getLogger(__name__)
+
+
+SIMILARITY_FEATURES = ("cost", "area", "category_id", "lat", "lng")
+SALE_FIELDS = (
+    "sale__id",
+    "sale__employee_id",
+    "sale__date_of_sale",
+    "sale__cost",
+    "sale__service_cost",
+)
+
+
+@receiver(pre_save, sender=Estate)
+def track_estate_changes(sender, instance, raw=False, **kwargs):
+    """Compare the instance with the stored row, read in a single query."""
+    if raw or not instance.pk:
+        return
+
+    old = (
+        Estate.objects.filter(pk=instance.pk)
+        .values_list(
+            "is_available",
+            "address",
+            "similar_refreshed_at",
+            *SIMILARITY_FEATURES,
+            *SALE_FIELDS,
+        )
+        .first()
+    )
+    if old is None:
+        return
+    # Availability is owned by the sale handlers, which write it with
+    # update(); an instance loaded before a sale must not write it back.
+    instance.is_available = old[0]
+    old_address, refreshed_at = old[1:3]
+    old_features = old[3 : 3 + len(SIMILARITY_FEATURES)]
+    sale_id, *sale = old[3 + len(SIMILARITY_FEATURES) :]
+
+    if old_address != instance.address:
+        logger.debug(
+            f"Estate {instance.pk} address changed: {old_address} -> {instance.address}"
+        )
+        GeocodeCache.invalidate(old_address)
+        GeocodeCache.invalidate(instance.address)
+        StaticMapCache.invalidate(instance.pk)
+        instance.lat = instance.lng = instance.geocoded_at = None
+        instance.geohash = ""
+
+    # The refresh mark belongs to the recommender, a stale instance must
+    # not overwrite it.
+    instance.similar_refreshed_at = refreshed_at
+    if old_features != tuple(getattr(instance, f) for f in SIMILARITY_FEATURES):
+        instance.similar_refreshed_at = None
+
+    instance._rollup_contribution = None
+    if sale_id is not None:
+        instance._rollup_contribution = (old_features[2], *sale)
+
+
+@receiver(post_save, sender=Estate)
+def update_rollups_on_estate_save(sender, instance, created, raw=False, **kwargs):
+    old = getattr(instance, "_rollup_contribution", None)
+    if raw or not old:
+        return
+    new = (instance.category_id, *old[1:])
+    if new != old:
+        SalesRollup.apply(old, sign=-1)
+        SalesRollup.apply(new)
+        instance._rollup_contribution = new
+
+
+@receiver(pre_save, sender=Sale)
+def remember_sale_contribution(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        instance._rollup_contribution = SalesRollup.contribution(pk=instance.pk)
+        instance._old_estate_id = (
+            Sale.objects.filter(pk=instance.pk).values_list("estate_id", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Sale)
+def mark_estate_sold(sender, instance, raw=False, **kwargs):
+    old_estate_id = getattr(instance, "_old_estate_id", None)
+    if old_estate_id and old_estate_id != instance.estate_id:
+        Estate.objects.filter(pk=old_estate_id).update(is_available=True)
+    Estate.objects.filter(pk=instance.estate_id).update(is_available=False)
+    logger.debug(f"Estate {instance.estate_id} marked as sold")
+
+
+@receiver(post_delete, sender=Sale)
+def mark_estate_available(sender, instance, **kwargs):
+    Estate.objects.filter(pk=instance.estate_id).update(is_available=True)
+    logger.debug(f"Estate {instance.estate_id} marked as available")
+
+
+@receiver(post_save, sender=Sale)
+def withdraw_sold_estate_from_recommendations(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    old_estate_id = getattr(instance, "_old_estate_id", None)
+    if old_estate_id and old_estate_id != instance.estate_id:
+        EstateRecommender.requeue(old_estate_id)
+    EstateRecommender.withdraw(instance.estate_id)
+
+
+@receiver(post_delete, sender=Sale)
+def requeue_unsold_estate_for_recommendations(sender, instance, **kwargs):
+    EstateRecommender.requeue(instance.estate_id)
+
+
+@receiver(pre_delete, sender=Estate)
+def withdraw_deleted_estate_from_recommendations(sender, instance, **kwargs):
+    EstateRecommender.withdraw(instance.pk)
+
+
+@receiver(post_save, sender=Sale)
+def update_rollups_on_sale_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    SalesRollup.apply(getattr(instance, "_rollup_contribution", None), sign=-1)
+    instance._rollup_contribution = SalesRollup.contribution(pk=instance.pk)
+    SalesRollup.apply(instance._rollup_contribution)
+
+
+@receiver(pre_delete, sender=Sale)
+def update_rollups_on_sale_delete(sender, instance, **kwargs):
+    SalesRollup.apply(SalesRollup.contribution(pk=instance.pk), sign=-1)
+
+
+@receiver(post_save, sender=Estate)
+@receiver(post_delete, sender=Estate)
+@receiver(post_save, sender=Sale)
+@receiver(post_delete, sender=Sale)
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def bump_catalog_version(sender, raw=False, **kwargs):
+    if raw:
+        return
+    CatalogVersion.bump()
+    # Again after commit, so no page cached mid-transaction under the new
+    # version outlives it.
+    transaction.on_commit(CatalogVersion.bump)
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+@receiver(post_save, sender=ServiceCategory)
+@receiver(post_delete, sender=ServiceCategory)
+def invalidate_reference_data(sender, raw=False, **kwargs):
+    if raw:
+        return
+    ReferenceData.invalidate()
+    # Again after commit, so no worker keeps a snapshot read mid-transaction.
+    transaction.on_commit(ReferenceData.invalidate)
+
+
+@receiver(pre_save, sender=Employee)
+def keep_employee_load(sender, instance, raw=False, **kwargs):
+    if raw or not instance.pk:
+        return
+    # The counter belongs to EmployeeLoad, a stale instance must not
+    # overwrite it.
+    load = (
+        Employee.objects.filter(pk=instance.pk)
+        .values_list("active_request_count", flat=True)
+        .first()
+    )
+    if load is not None:
+        instance.active_request_count = load
+
+
+@receiver(post_save, sender=Employee)
+@receiver(post_delete, sender=Employee)
+@receiver(m2m_changed, sender=Employee.clients.through)
+def invalidate_employee_load_index(sender, raw=False, **kwargs):
+    if raw or kwargs.get("action", "post_").startswith("pre_"):
+        return
+    EmployeeLoadIndex.invalidate()
+    transaction.on_commit(EmployeeLoadIndex.invalidate)
+
+
+@receiver(pre_save, sender=PurchaseRequest)
+def remember_request_load(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        instance._old_load = (
+            PurchaseRequest.objects.filter(pk=instance.pk)
+            .values_list("employee_id", "status")
+            .first()
+        )
+
+
+@receiver(post_save, sender=PurchaseRequest)
+def update_employee_load_on_request_save(sender, instance, created, raw=False, **kwargs):
+    if raw or (created and getattr(instance, "_load_claimed", False)):
+        return
+    old = None if created else getattr(instance, "_old_load", None)
+    EmployeeLoad.transition(old, (instance.employee_id, instance.status))
+    instance._old_load = (instance.employee_id, instance.status)
+
+
+@receiver(post_delete, sender=PurchaseRequest)
+def update_employee_load_on_request_delete(sender, instance, **kwargs):
+    EmployeeLoad.transition((instance.employee_id, instance.status), None)
+
+
+@receiver(post_save, sender=PurchaseRequest)
+def update_rollups_on_request_create(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        SalesRollup.apply_request(instance.created_at)
+
+
+@receiver(pre_delete, sender=PurchaseRequest)
+def update_rollups_on_request_delete(sender, instance, **kwargs):
+    SalesRollup.apply_request(instance.created_at, sign=-1)
+
+
+def install_estate_search(sender, using="default", **kwargs):
+    """Connected to ``post_migrate`` in ``CatalogConfig.ready``."""
+    EstateSearch.install(using)
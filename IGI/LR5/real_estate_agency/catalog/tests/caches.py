@@ -0,0 +1,14 @@
+"""Cache settings for tests: every alias in process memory, so a run
+never touches the file caches a local server uses."""
+
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "geocoding": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "geocoding-tests",
+    },
+    "coordination": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "coordination-tests",
+    },
+}
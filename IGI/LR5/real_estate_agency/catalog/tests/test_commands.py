@@ -0,0 +1,272 @@
+from decimal import Decimal
+from datetime import date
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from users.models import Employee, User
+
+from ..models import (
+    Estate,
+    Sale,
+    Service,
+    ServiceCategory,
+    ServiceSalesRollup,
+    SimilarEstate,
+)
+from ..utils import CatalogVersion, Geohash
+from .caches import LOCMEM_CACHES
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class GeocodeEstatesCommandTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = ServiceCategory.objects.create(name="Category")
+        service = Service.objects.create(name="Service", category=category, cost=1)
+        cls.estate = Estate.objects.create(
+            cost=Decimal("100.00"),
+            area=Decimal("10.00"),
+            category=service,
+            description="Description",
+            address="Test Address 1",
+        )
+
+    def run_command(self):
+        call_command("geocode_estates", stdout=StringIO())
+        self.estate.refresh_from_db()
+
+    @patch("catalog.utils.estate_geocoder.MapboxClient.lookup")
+    def test_fills_coordinates(self, mock_lookup):
+        mock_lookup.return_value = (True, (27.56, 53.9))
+        version = CatalogVersion.get()
+        self.run_command()
+        self.assertNotEqual(CatalogVersion.get(), version)
+        self.assertEqual((self.estate.lng, self.estate.lat), (27.56, 53.9))
+        self.assertEqual(self.estate.geohash, Geohash.encode(53.9, 27.56))
+        self.assertIsNotNone(self.estate.geocoded_at)
+
+    @patch("catalog.utils.estate_geocoder.MapboxClient.lookup")
+    def test_unresolved_address_is_not_retried(self, mock_lookup):
+        mock_lookup.return_value = (True, None)
+        self.run_command()
+        self.run_command()
+        self.assertFalse(self.estate.has_coordinates)
+        self.assertIsNotNone(self.estate.geocoded_at)
+        self.assertEqual(mock_lookup.call_count, 1)
+
+    @patch("catalog.utils.estate_geocoder.MapboxClient.lookup")
+    def test_failed_lookup_stays_queued(self, mock_lookup):
+        mock_lookup.return_value = (False, None)
+        version = CatalogVersion.get()
+        self.run_command()
+        self.assertIsNone(self.estate.geocoded_at)
+        self.assertEqual(CatalogVersion.get(), version)
+
+    @patch("catalog.utils.estate_geocoder.MapboxClient.lookup")
+    def test_address_change_requeues(self, mock_lookup):
+        mock_lookup.return_value = (True, (27.56, 53.9))
+        self.run_command()
+
+        self.estate.address = "Test Address 2"
+        self.estate.save()
+        self.estate.refresh_from_db()
+        self.assertIsNone(self.estate.geocoded_at)
+        self.assertFalse(self.estate.has_coordinates)
+        self.assertEqual(self.estate.geohash, "")
+
+        mock_lookup.return_value = (True, (27.6, 53.8))
+        self.run_command()
+        self.assertEqual((self.estate.lng, self.estate.lat), (27.6, 53.8))
+
+    @patch("catalog.utils.estate_geocoder.MapboxClient.lookup")
+    def test_address_change_with_update_fields_requeues(self, mock_lookup):
+        mock_lookup.return_value = (True, (27.56, 53.9))
+        self.run_command()
+
+        self.estate.address = "Test Address 2"
+        self.estate.save(update_fields=["address"])
+        self.estate.refresh_from_db()
+        self.assertIsNone(self.estate.geocoded_at)
+        self.assertFalse(self.estate.has_coordinates)
+        self.assertEqual(self.estate.geohash, "")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RebuildSalesRollupsCommandTests(TestCase):
+    def test_check_reports_out_of_sync_rows(self):
+        category = ServiceCategory.objects.create(name="Category")
+        service = Service.objects.create(name="Service", category=category, cost=1)
+        ServiceSalesRollup.objects.create(service=service, sold_count=3)
+
+        out = StringIO()
+        call_command("rebuild_sales_rollups", "--check", stdout=out, stderr=StringIO())
+        self.assertIn("('service',", out.getvalue())
+
+        call_command("rebuild_sales_rollups", stdout=StringIO())
+        out = StringIO()
+        call_command("rebuild_sales_rollups", "--check", stdout=out)
+        self.assertIn("Rollups are consistent", out.getvalue())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BackfillEstateAvailabilityCommandTests(TestCase):
+    def test_backfill(self):
+        category = ServiceCategory.objects.create(name="Category")
+        service = Service.objects.create(name="Service", category=category, cost=1)
+        sold, available = [
+            Estate.objects.create(
+                cost=Decimal("100.00"),
+                area=Decimal("10.00"),
+                category=service,
+                description="Description",
+                address=f"Address {i}",
+            )
+            for i in range(2)
+        ]
+        Sale.objects.create(estate=sold)
+        Estate.objects.update(is_available=True)
+        Estate.objects.filter(pk=available.pk).update(is_available=False)
+
+        call_command("backfill_estate_availability", stdout=StringIO())
+
+        self.assertEqual(
+            list(Estate.objects.filter(is_available=True)), [available]
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RebuildEstateSearchCommandTests(TestCase):
+    def test_rebuild(self):
+        category = ServiceCategory.objects.create(name="Category")
+        service = Service.objects.create(name="Service", category=category, cost=1)
+        Estate.objects.create(
+            cost=Decimal("100.00"),
+            area=Decimal("10.00"),
+            category=service,
+            description="Description",
+            address="Address",
+        )
+        out = StringIO()
+        call_command("rebuild_estate_search", stdout=out)
+        self.assertIn("Indexed 1 estate(s)", out.getvalue())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BackfillEstateSummariesCommandTests(TestCase):
+    def test_backfill(self):
+        category = ServiceCategory.objects.create(name="Category")
+        service = Service.objects.create(name="Service", category=category, cost=1)
+        estate = Estate.objects.create(
+            cost=Decimal("100.00"),
+            area=Decimal("10.00"),
+            category=service,
+            description="Short   description",
+            address="Address",
+        )
+        Estate.objects.update(summary="")
+
+        out = StringIO()
+        call_command("backfill_estate_summaries", stdout=out)
+        self.assertIn("Updated summaries of 1 estate(s)", out.getvalue())
+        estate.refresh_from_db()
+        self.assertEqual(estate.summary, "Short description")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BackfillEstateGeohashesCommandTests(TestCase):
+    def test_backfill(self):
+        category = ServiceCategory.objects.create(name="Category")
+        service = Service.objects.create(name="Service", category=category, cost=1)
+        estate = Estate.objects.create(
+            cost=Decimal("100.00"),
+            area=Decimal("10.00"),
+            category=service,
+            description="Description",
+            address="Address",
+        )
+        Estate.objects.update(lat=53.9, lng=27.56)
+        version = CatalogVersion.get()
+
+        out = StringIO()
+        call_command("backfill_estate_geohashes", stdout=out)
+        self.assertIn("Updated geohashes of 1 estate(s)", out.getvalue())
+        self.assertNotEqual(CatalogVersion.get(), version)
+        estate.refresh_from_db()
+        self.assertEqual(estate.geohash, Geohash.encode(53.9, 27.56))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RefreshSimilarEstatesCommandTests(TestCase):
+    def test_refresh_and_rebuild(self):
+        category = ServiceCategory.objects.create(name="Category")
+        service = Service.objects.create(name="Service", category=category, cost=1)
+        for i in range(3):
+            Estate.objects.create(
+                cost=Decimal(100 + i),
+                area=Decimal("10.00"),
+                category=service,
+                description="Description",
+                address=f"Address {i}",
+            )
+
+        out = StringIO()
+        call_command("refresh_similar_estates", stdout=out)
+        self.assertIn("Refreshed similar estates of 3 estate(s)", out.getvalue())
+        self.assertEqual(SimilarEstate.objects.count(), 6)
+
+        out = StringIO()
+        call_command("refresh_similar_estates", "--rebuild", stdout=out)
+        self.assertIn("Similar estates rebuilt for 3 estate(s)", out.getvalue())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RebuildEmployeeLoadCommandTests(TestCase):
+    def test_rebuild(self):
+        out = StringIO()
+        call_command("rebuild_employee_load", stdout=out)
+        self.assertIn("Corrected 0 employee counter(s)", out.getvalue())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BackfillSaleServiceCostsCommandTests(TestCase):
+    def test_backfill(self):
+        category = ServiceCategory.objects.create(name="Category")
+        service = Service.objects.create(name="Service", category=category, cost=20)
+        estate = Estate.objects.create(
+            cost=Decimal("100.00"),
+            area=Decimal("10.00"),
+            category=service,
+            description="Description",
+            address="Address",
+        )
+        sale = Sale.objects.create(estate=estate)
+        Sale.objects.update(service_cost=0)
+
+        out = StringIO()
+        call_command("backfill_sale_service_costs", stdout=out)
+        self.assertIn("Updated service costs of 1 sale(s)", out.getvalue())
+        sale.refresh_from_db()
+        self.assertEqual(sale.service_cost, Decimal("20.00"))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BenchmarkAssignmentCommandTests(TestCase):
+    def test_changes_are_rolled_back(self):
+        user = User.objects.create(
+            username="employee", phone_number="+375(29)555-55-55", birth_date=date(1990, 1, 1)
+        )
+        employee = Employee.objects.create(user=user, hire_date=date(2010, 1, 1))
+
+        out = StringIO()
+        call_command(
+            "benchmark_assignment", "--strategy", "round_robin", "--count", "10", stdout=out
+        )
+        self.assertIn("round_robin:", out.getvalue())
+        employee.refresh_from_db()
+        self.assertEqual(employee.active_request_count, 0)
+
+    def test_no_employees(self):
+        with self.assertRaises(CommandError):
+            call_command("benchmark_assignment", stdout=StringIO())
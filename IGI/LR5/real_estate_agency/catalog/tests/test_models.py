@@ -1,5 +1,7 @@
 from django.core.validators import MinValueValidator
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from decimal import Decimal
 from datetime import date
 from users.models import User, Employee, Client
@@ -10,8 +12,10 @@ from ..models import (
     Sale,
     PurchaseRequest,
 )
+from .caches import LOCMEM_CACHES
 
 
+@override_settings(CACHES=LOCMEM_CACHES)
 class ServiceCategoryModelTest(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -36,6 +40,7 @@ class ServiceCategoryModelTest(TestCase):
         self.assertEqual(str(self.category), self.category.name)
 
 
+@override_settings(CACHES=LOCMEM_CACHES)
 class ServiceModelTest(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -78,6 +83,7 @@ class ServiceModelTest(TestCase):
         self.assertEqual(str(self.service), expected_str)
 
 
+@override_settings(CACHES=LOCMEM_CACHES)
 class EstateModelTest(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -168,7 +174,41 @@ class EstateModelTest(TestCase):
     def test_str_representation(self):
         self.assertEqual(str(self.estate), f"{self.estate.address}: {self.estate.cost}")
 
-
+    def test_summary_maintained_on_save(self):
+        self.assertEqual(self.estate.summary, "Test description")
+
+        self.estate.description = "Word  \n " * 100
+        self.estate.save(update_fields=["description"])
+        self.estate.refresh_from_db()
+        self.assertEqual(len(self.estate.summary), 150)
+        self.assertTrue(self.estate.summary.startswith("Word Word"))
+        self.assertTrue(self.estate.summary.endswith("…"))
+
+    def test_stale_instance_keeps_sold_estate_unavailable(self):
+        sale = Sale.objects.create(estate=Estate.objects.get(pk=self.estate.pk))
+        self.assertTrue(self.estate.is_available)
+        self.estate.cost = Decimal("120000.00")
+        self.estate.save()
+        self.assertFalse(Estate.objects.get(pk=self.estate.pk).is_available)
+
+        sale.delete()
+        self.estate.is_available = False
+        self.estate.save()
+        self.assertTrue(Estate.objects.get(pk=self.estate.pk).is_available)
+
+    def test_save_reads_stored_row_once(self):
+        Sale.objects.create(estate=self.estate)
+        self.estate.cost = Decimal("120000.00")
+        with CaptureQueriesContext(connection) as context:
+            self.estate.save()
+        selects = [
+            q["sql"] for q in context.captured_queries
+            if q["sql"].startswith("SELECT") and 'FROM "catalog_estate"' in q["sql"]
+        ]
+        self.assertEqual(len(selects), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
 class SaleModelTest(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -253,6 +293,7 @@ class SaleModelTest(TestCase):
         self.assertEqual(str(self.sale), expected_str)
 
 
+@override_settings(CACHES=LOCMEM_CACHES)
 class PurchaseRequestModelTest(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -0,0 +1,144 @@
+from datetime import date, datetime
+from unittest import skipUnless
+
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from users.models import Client, Employee, User
+
+from ..models import Estate, PurchaseRequest, Sale, Service, ServiceCategory
+from .caches import LOCMEM_CACHES
+
+
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN output is SQLite specific")
+@override_settings(CACHES=LOCMEM_CACHES)
+class QueryPlanTests(TestCase):
+    """Dashboard and statistics queries must be served by indexes.
+
+    The plans are taken from the SQL the views actually run, so a change to
+    a view's queryset is checked as well.
+    """
+
+    TABLES = (
+        "catalog_estate",
+        "catalog_purchaserequest",
+        "catalog_sale",
+        "catalog_employeedailysalesrollup",
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        users = [
+            User.objects.create_user(
+                username=f"user{i}",
+                password="testpass",
+                first_name="User",
+                last_name="Test",
+                role="client" if i % 2 else "employee",
+                phone_number="+375(29)777-77-77",
+                birth_date=datetime(2000, 1, 1),
+            )
+            for i in range(4)
+        ]
+        users[2].is_superuser = True
+        users[2].save()
+        cls.users = users
+        cls.client_obj = Client.objects.create(user=users[1])
+        cls.employee = Employee.objects.create(user=users[0], hire_date=date(2000, 1, 1))
+        category = ServiceCategory.objects.create(name="Category")
+        service = Service.objects.create(name="Service", category=category, cost=1)
+        for i in range(20):
+            estate = Estate.objects.create(
+                cost=1000 + i,
+                area=10 + i,
+                category=service,
+                description="Description",
+                address=f"Address {i}",
+            )
+            PurchaseRequest.objects.create(
+                estate=estate, client=cls.client_obj, employee=cls.employee
+            )
+            if i % 3 == 0:
+                Sale.objects.create(
+                    estate=estate, client=cls.client_obj, employee=cls.employee
+                )
+
+    def setUp(self):
+        for alias in LOCMEM_CACHES:
+            caches[alias].clear()
+
+    def plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return [row[-1] for row in cursor.fetchall()]
+
+    def full_scans(self, sql):
+        return [
+            line
+            for line in self.plan(sql)
+            if " SCAN " in f" {line} "
+            and "INDEX" not in line
+            and any(table in line.split() for table in self.TABLES)
+        ]
+
+    def assertNoFullScan(self, user, url, data=None):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, 200)
+
+        statements = [
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].lstrip().upper().startswith("SELECT")
+        ]
+        self.assertTrue(statements)
+        for sql in statements:
+            scans = self.full_scans(sql)
+            self.assertFalse(scans, f"Full table scan in:\n{sql}\n{scans}")
+        return statements
+
+    def test_client_dashboard(self):
+        self.assertNoFullScan(self.users[1], reverse("client_dashboard"))
+
+    def test_employee_dashboard(self):
+        self.assertNoFullScan(self.users[0], reverse("employee_dashboard"))
+        self.assertNoFullScan(
+            self.users[0],
+            reverse("employee_dashboard"),
+            {"clients_page": 2, "requests_page": 2, "sales_page": 2},
+        )
+
+    def test_statistics(self):
+        self.assertNoFullScan(self.users[2], reverse("statistics_data"))
+
+    def test_estate_list(self):
+        for data in (
+            {},
+            {"min_price": 1005, "sort": "price_asc"},
+            {"sort": "area_desc"},
+            {"category": 1, "max_price": 1010},
+            {"search": "Address", "min_price": 1005},
+        ):
+            with self.subTest(data=data):
+                self.assertNoFullScan(self.users[1], reverse("estates"), data)
+
+    def test_geo_search(self):
+        for data in (
+            {"bbox": "27.4,53.8,27.7,53.95"},
+            {"lat": 53.9, "lng": 27.56, "radius": 2},
+        ):
+            with self.subTest(data=data):
+                statements = self.assertNoFullScan(
+                    self.users[1], reverse("estates"), data
+                )
+                self.assertTrue(
+                    any(
+                        "USING INDEX estate_geohash_idx" in line
+                        for sql in statements
+                        for line in self.plan(sql)
+                    )
+                )
@@ -0,0 +1,1184 @@
+import base64
+import json
+import threading
+import time
+from datetime import date
+from decimal import Decimal
+from unittest.mock import patch, MagicMock
+
+import numpy as np
+import requests
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.paginator import InvalidPage
+from django.db import OperationalError, connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from real_estate_agency.http_client import (
+    CircuitBreaker,
+    CircuitOpenError,
+    OutboundHttpClient,
+)
+
+from users.models import Client, Employee, User
+
+from ..models import (
+    DailySalesRollup,
+    Estate,
+    PurchaseRequest,
+    Sale,
+    Service,
+    ServiceCategory,
+    ServiceSalesRollup,
+    SimilarEstate,
+)
+from ..utils import (
+    AssignmentStrategy,
+    CatalogVersion,
+    EmployeeLoad,
+    EmployeeLoadIndex,
+    EstateFacets,
+    EstateGeoSearch,
+    EstatePurchase,
+    EstateRecommender,
+    EstateResultCache,
+    ReferenceData,
+    CursorPaginator,
+    EstateSearch,
+    EstateUnavailableError,
+    GeocodeCache,
+    Geohash,
+    MapboxClient,
+    PurchaseRequestBatch,
+    SalesRollup,
+    StatisticsCalculator,
+)
+from .caches import LOCMEM_CACHES
+
+
+def mapbox_response(coordinates=None):
+    response = MagicMock()
+    features = [{"geometry": {"coordinates": coordinates}}] if coordinates else []
+    response.json.return_value = {"features": features}
+    return response
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class GeocodeCacheTests(TestCase):
+    def setUp(self):
+        GeocodeCache.clear_local()
+        GeocodeCache.reset_stats()
+        GeocodeCache._shared().clear()
+
+    def test_normalize(self):
+        self.assertEqual(
+            GeocodeCache.normalize("  Минск,   ул. Ленина  1 "), "минск, ул. ленина 1"
+        )
+
+    def test_miss_then_local_hit(self):
+        self.assertEqual(GeocodeCache.get("Addr 1"), (False, None))
+        GeocodeCache.set("Addr 1", (27.5, 53.9))
+        self.assertEqual(GeocodeCache.get("addr  1"), (True, (27.5, 53.9)))
+        stats = GeocodeCache.get_stats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["local_hits"], 1)
+
+    def test_shared_hit_after_local_eviction(self):
+        GeocodeCache.set("Addr 1", (27.5, 53.9))
+        GeocodeCache.clear_local()
+        self.assertEqual(GeocodeCache.get("Addr 1"), (True, (27.5, 53.9)))
+        self.assertEqual(GeocodeCache.get_stats()["shared_hits"], 1)
+
+    def test_negative_entry(self):
+        GeocodeCache.set("Nowhere", None)
+        self.assertEqual(GeocodeCache.get("Nowhere"), (True, None))
+
+    def test_invalidate(self):
+        GeocodeCache.set("Addr 1", (27.5, 53.9))
+        GeocodeCache.invalidate("Addr 1")
+        self.assertEqual(GeocodeCache.get("Addr 1"), (False, None))
+
+    @patch("catalog.utils.mapbox_client.OutboundHttpClient.get")
+    def test_map_url_requests_mapbox_once(self, mock_get):
+        mock_get.return_value = mapbox_response([27.5, 53.9])
+
+        first = MapboxClient.get_map_image_url("Addr 1")
+        second = MapboxClient.get_map_image_url("Addr 1")
+
+        self.assertEqual(first, second)
+        self.assertIn("27.5,53.9", first)
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch("catalog.utils.mapbox_client.OutboundHttpClient.get")
+    def test_not_found_is_cached(self, mock_get):
+        mock_get.return_value = mapbox_response()
+
+        for _ in range(2):
+            self.assertEqual(
+                MapboxClient.get_map_image_url("Nowhere"),
+                "/media/map_placeholder.jpg",
+            )
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch("catalog.utils.mapbox_client.OutboundHttpClient.get")
+    def test_request_errors_are_not_cached(self, mock_get):
+        mock_get.side_effect = requests.ConnectionError("down")
+
+        MapboxClient.get_map_image_url("Addr 1")
+        MapboxClient.get_map_image_url("Addr 1")
+
+        self.assertEqual(mock_get.call_count, 2)
+
+    def test_address_change_invalidates(self):
+        category = ServiceCategory.objects.create(name="Category")
+        service = Service.objects.create(name="Service", category=category, cost=1)
+        estate = Estate.objects.create(
+            cost=Decimal("100.00"),
+            area=Decimal("10.00"),
+            category=service,
+            description="Description",
+            address="Old address",
+        )
+        GeocodeCache.set("Old address", (1, 1))
+        GeocodeCache.set("New address", (2, 2))
+
+        estate.address = "New address"
+        estate.save()
+
+        self.assertEqual(GeocodeCache.get("Old address"), (False, None))
+        self.assertEqual(GeocodeCache.get("New address"), (False, None))
+
+
+class CircuitBreakerTests(TestCase):
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+
+    def test_half_open_allows_single_trial(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow())
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES,
+    OUTBOUND_HTTP_FAILURE_THRESHOLD=2,
+    OUTBOUND_HTTP_RESET_TIMEOUT=60,
+)
+class OutboundHttpClientTests(TestCase):
+    def setUp(self):
+        OutboundHttpClient.reset()
+        self.addCleanup(OutboundHttpClient.reset)
+
+    @patch("requests.Session.request")
+    def test_fails_fast_when_circuit_open(self, mock_request):
+        mock_request.side_effect = requests.Timeout("slow")
+
+        for _ in range(2):
+            with self.assertRaises(requests.Timeout):
+                OutboundHttpClient.get("http://upstream.test/a")
+        with self.assertRaises(CircuitOpenError):
+            OutboundHttpClient.get("http://upstream.test/a")
+
+        self.assertEqual(mock_request.call_count, 2)
+        metrics = OutboundHttpClient.get_metrics()["upstream.test"]
+        self.assertEqual(metrics["failures"], 2)
+        self.assertEqual(metrics["rejected"], 1)
+        self.assertEqual(metrics["circuit"], CircuitBreaker.OPEN)
+
+    @override_settings(
+        OUTBOUND_HTTP_FAILURE_THRESHOLD=1,
+        OUTBOUND_HTTP_RESET_TIMEOUT=0,
+        OUTBOUND_HTTP_MAX_CONCURRENCY=1,
+        OUTBOUND_HTTP_ACQUIRE_TIMEOUT=0,
+    )
+    @patch("requests.Session.request")
+    def test_exhausted_slots_keep_half_open_trial(self, mock_request):
+        mock_request.side_effect = requests.Timeout("slow")
+        with self.assertRaises(requests.Timeout):
+            OutboundHttpClient.get("http://upstream.test/a")
+
+        host = OutboundHttpClient._host("upstream.test")
+        host.slots.acquire()
+        with self.assertRaises(CircuitOpenError):
+            OutboundHttpClient.get("http://upstream.test/a")
+        host.slots.release()
+        self.assertEqual(host.breaker.state, CircuitBreaker.OPEN)
+
+        mock_request.side_effect = None
+        mock_request.return_value = MagicMock(status_code=200)
+        OutboundHttpClient.get("http://upstream.test/a")
+        self.assertEqual(host.breaker.state, CircuitBreaker.CLOSED)
+
+    @patch("requests.Session.request")
+    def test_server_errors_count_as_failures(self, mock_request):
+        mock_request.return_value = MagicMock(status_code=503)
+        OutboundHttpClient.get("http://upstream.test/a")
+        mock_request.return_value = MagicMock(status_code=200)
+        OutboundHttpClient.get("http://other.test/a")
+
+        metrics = OutboundHttpClient.get_metrics()
+        self.assertEqual(metrics["upstream.test"]["failures"], 1)
+        self.assertEqual(metrics["other.test"]["failures"], 0)
+
+    @patch("requests.Session.request")
+    def test_mapbox_falls_back_to_placeholder(self, mock_request):
+        mock_request.side_effect = requests.ConnectionError("down")
+        for _ in range(3):
+            self.assertEqual(
+                MapboxClient.get_map_image_url("Outage street"),
+                "/media/map_placeholder.jpg",
+            )
+        self.assertEqual(mock_request.call_count, 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class StatisticsCalculatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(
+            username="employee",
+            role="employee",
+            phone_number="+375(29)222-22-22",
+            birth_date=date(1990, 1, 1),
+        )
+        cls.employee = Employee.objects.create(user=user, hire_date=date(2010, 1, 1))
+        cls.client_obj = Client.objects.create(
+            user=User.objects.create(
+                username="client",
+                role="client",
+                phone_number="+375(29)111-11-11",
+                birth_date=date(1990, 1, 1),
+            )
+        )
+        category = ServiceCategory.objects.create(name="Category")
+        cls.services = [
+            Service.objects.create(name=f"Service {i}", category=category, cost=100 * i)
+            for i in range(1, 4)
+        ]
+
+    def create_sales(self, count):
+        for i in range(count):
+            estate = Estate.objects.create(
+                cost=Decimal(1000 + i),
+                area=Decimal("50.00"),
+                category=self.services[i % len(self.services)],
+                description="Description",
+                address=f"Address {i}",
+            )
+            Sale.objects.create(
+                client=self.client_obj, employee=self.employee, estate=estate
+            )
+
+    def test_sale_cost_stats(self):
+        self.create_sales(3)
+        full_cost_stats, service_cost_stats = StatisticsCalculator.get_sale_cost_stats()
+        self.assertEqual(full_cost_stats["mean_cost"], 1201)
+        self.assertEqual(service_cost_stats["median_cost"], 200)
+
+    def test_sale_cost_stats_query_count_is_constant(self):
+        for count in (1, 30):
+            self.create_sales(count)
+            with self.assertNumQueries(1):
+                StatisticsCalculator.get_sale_cost_stats()
+            Sale.objects.all().delete()
+
+    def test_services_by_sold_count(self):
+        self.create_sales(4)
+        services, counts = StatisticsCalculator.get_services_by_sold_count()
+        self.assertEqual(services.first(), self.services[0])
+        self.assertEqual(list(counts), [2, 1, 1])
+
+    def test_services_by_full_costs(self):
+        self.create_sales(2)
+        services, totals = StatisticsCalculator.get_services_by_full_costs()
+        self.assertEqual(list(services), [self.services[1], self.services[0]])
+        self.assertEqual(list(totals), [Decimal("1201.00"), Decimal("1100.00")])
+
+    def test_employee_stats(self):
+        self.create_sales(3)
+        employees, costs = StatisticsCalculator.get_employees_by_service_profit()
+        self.assertEqual(list(employees), [self.employee])
+        self.assertEqual(list(costs), [Decimal("600.00")])
+        employees, costs = StatisticsCalculator.get_employees_by_full_costs()
+        self.assertEqual(list(costs), [Decimal("3603.00")])
+
+
+class SalesRollupTests(StatisticsCalculatorTests):
+    def test_sale_signals_keep_rollups_in_sync(self):
+        self.create_sales(3)
+        Sale.objects.first().delete()
+        sale = Sale.objects.first()
+        sale.estate.category = self.services[2]
+        sale.estate.save()
+        sale.save()
+        self.assertEqual(SalesRollup.check(), {})
+
+    def test_service_rollup_values(self):
+        self.create_sales(1)
+        rollup = ServiceSalesRollup.objects.get(service=self.services[0])
+        self.assertEqual(rollup.sold_count, 1)
+        self.assertEqual(rollup.service_cost_sum, Decimal("100.00"))
+        self.assertEqual(rollup.full_cost_sum, Decimal("1100.00"))
+
+        Sale.objects.all().delete()
+        rollup.refresh_from_db()
+        self.assertEqual(rollup.sold_count, 0)
+
+    def test_service_changes_keep_rollups_in_sync(self):
+        self.create_sales(2)
+        service = self.services[0]
+        service.cost = Decimal("300.00")
+        service.save()
+        self.assertEqual(SalesRollup.check(), {})
+        self.assertEqual(
+            ServiceSalesRollup.objects.get(service=service).service_cost_sum,
+            Decimal("100.00"),
+        )
+
+        service.delete()
+        self.assertEqual(SalesRollup.check(), {})
+
+    def test_request_counts(self):
+        self.create_sales(1)
+        request = PurchaseRequest.objects.create(
+            estate=Estate.objects.first(), client=self.client_obj
+        )
+        self.assertEqual(DailySalesRollup.objects.get().request_count, 1)
+        request.delete()
+        self.assertEqual(DailySalesRollup.objects.get().request_count, 0)
+
+    def test_rebuild(self):
+        self.create_sales(3)
+        ServiceSalesRollup.objects.update(sold_count=42)
+        self.assertNotEqual(SalesRollup.check(), {})
+        SalesRollup.rebuild()
+        self.assertEqual(SalesRollup.check(), {})
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class EstateSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = ServiceCategory.objects.create(name="Category")
+        cls.flat = Service.objects.create(name="Flat", category=category, cost=1)
+        cls.house = Service.objects.create(name="House", category=category, cost=1)
+        cls.garden = Estate.objects.create(
+            cost=Decimal("100.00"),
+            area=Decimal("10.00"),
+            category=cls.house,
+            description="Quiet house with a garden, garden view",
+            address="Lenina 1",
+        )
+        cls.centre = Estate.objects.create(
+            cost=Decimal("200.00"),
+            area=Decimal("20.00"),
+            category=cls.flat,
+            description="Flat near the garden",
+            address="Nezavisimosti 10",
+        )
+
+    def search(self, query):
+        return EstateSearch.ranked_ids(query)
+
+    def test_index_is_installed_on_migrate(self):
+        self.assertTrue(EstateSearch.is_supported())
+
+    def test_match_expression(self):
+        self.assertEqual(EstateSearch.match_expression('garden "view'), '"garden"* "view"*')
+        self.assertEqual(EstateSearch.match_expression("  -- "), "")
+
+    def test_prefix_match_and_ranking(self):
+        self.assertEqual(self.search("gard"), [self.garden.pk, self.centre.pk])
+        self.assertEqual(self.search("nezavis"), [self.centre.pk])
+        self.assertEqual(self.search("!!"), [])
+
+    def test_triggers_follow_changes(self):
+        self.garden.address = "Pobediteley 5"
+        self.garden.save()
+        self.assertEqual(self.search("lenina"), [])
+        self.assertEqual(self.search("pobediteley"), [self.garden.pk])
+
+        Service.objects.filter(pk=self.flat.pk).update(name="Apartment")
+        self.assertEqual(self.search("apartment"), [self.centre.pk])
+
+        self.centre.delete()
+        self.assertEqual(self.search("apartment"), [])
+
+    def test_rebuild(self):
+        from django.db import connection
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {EstateSearch.TABLE}")
+        self.assertEqual(self.search("garden"), [])
+        self.assertEqual(EstateSearch.rebuild(), 2)
+        self.assertEqual(self.search("house"), [self.garden.pk])
+
+    def test_filter_and_rank_in_sql(self):
+        for i in range(5):
+            Estate.objects.create(
+                cost=Decimal("300.00"),
+                area=Decimal("30.00"),
+                category=self.flat,
+                description="Sold garden flat",
+                address=f"Sold {i}",
+                is_available=False,
+            )
+        available = Estate.objects.filter(is_available=True)
+        queryset, ranked = EstateSearch.filter(available, "garden")
+        self.assertTrue(ranked)
+        with self.assertNumQueries(1):
+            estates = list(EstateSearch.order_by_rank(queryset, "garden", "id"))
+        self.assertEqual(estates, [self.garden, self.centre])
+
+        queryset, ranked = EstateSearch.filter(available, "!!")
+        self.assertFalse(ranked)
+        self.assertFalse(queryset.exists())
+
+    def test_fallback_without_index(self):
+        with patch.object(EstateSearch, "is_supported", return_value=False):
+            queryset, ranked = EstateSearch.filter(Estate.objects.all(), "nezavis")
+        self.assertFalse(ranked)
+        self.assertEqual(list(queryset), [self.centre])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = ServiceCategory.objects.create(name="Category")
+        service = Service.objects.create(name="Service", category=category, cost=1)
+        # Repeated costs make sure ties are broken by id.
+        cls.estates = [
+            Estate.objects.create(
+                cost=Decimal(100 * (i // 2)),
+                area=Decimal(10 + i),
+                category=service,
+                description="Description",
+                address=f"Address {i}",
+            )
+            for i in range(7)
+        ]
+
+    def walk(self, ordering):
+        paginator = CursorPaginator(Estate.objects.all(), 3, ordering)
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        return paginator, pages
+
+    def test_walks_every_sort(self):
+        for ordering in ("cost", "-cost", "area", "-area"):
+            tiebreaker = "-id" if ordering.startswith("-") else "id"
+            expected = list(Estate.objects.order_by(ordering, tiebreaker))
+            paginator, pages = self.walk(ordering)
+            self.assertEqual([len(page) for page in pages], [3, 3, 1])
+            self.assertEqual([e for page in pages for e in page], expected, ordering)
+            self.assertFalse(pages[0].has_previous())
+
+    def test_previous_pages(self):
+        paginator, pages = self.walk("-cost")
+        previous = paginator.page(pages[2].previous_cursor)
+        self.assertEqual(previous.object_list, pages[1].object_list)
+        self.assertTrue(previous.has_next())
+        first = paginator.page(previous.previous_cursor)
+        self.assertEqual(first.object_list, pages[0].object_list)
+        self.assertFalse(first.has_previous())
+
+    def test_invalid_cursor(self):
+        paginator = CursorPaginator(Estate.objects.all(), 3, "cost")
+        crafted = (["n", None, 1], ["x", "100", 1], ["n", "100", None])
+        cursors = ["garbage", "W10="] + [
+            base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+            for payload in crafted
+        ]
+        for cursor in cursors:
+            with self.assertRaises(InvalidPage):
+                paginator.page(cursor)
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_count_is_cached(self):
+        paginator = CursorPaginator(Estate.objects.all(), 3, "cost")
+        self.assertEqual(paginator.count, 7)
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.count, 7)
+        self.assertEqual(CursorPaginator(Estate.objects.none(), 3, "cost").count, 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, ESTATE_PRICE_BUCKETS=[100, 200])
+class EstateFacetsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        flats = ServiceCategory.objects.create(name="Flats")
+        houses = ServiceCategory.objects.create(name="Houses")
+        cls.flat = Service.objects.create(name="Flat", category=flats, cost=1)
+        cls.house = Service.objects.create(name="House", category=houses, cost=1)
+        cls.estates = [
+            Estate.objects.create(
+                cost=Decimal(cost),
+                area=Decimal("10.00"),
+                category=category,
+                description="Description",
+                address=f"Address {i}",
+            )
+            for i, (cost, category) in enumerate(
+                [(50, cls.flat), (150, cls.flat), (150, cls.house), (500, cls.house)]
+            )
+        ]
+
+    def test_normalize(self):
+        params = {"max_price": "100", "search": "  Big   HOUSE ", "category": "", "sort": "x"}
+        self.assertEqual(
+            EstateFacets.normalize(params),
+            [("max_price", "100.00"), ("search", "big house")],
+        )
+        self.assertEqual(EstateFacets.normalize({"min_price": "abc"}), [("min_price", "abc")])
+
+    def test_compute_in_one_query(self):
+        with self.assertNumQueries(1):
+            facets = EstateFacets.compute(Estate.objects.all())
+        self.assertEqual(facets["categories"], {self.flat.id: 2, self.house.id: 2})
+        self.assertEqual(
+            facets["service_categories"],
+            {self.flat.category_id: 2, self.house.category_id: 2},
+        )
+        self.assertEqual(facets["prices"], {0: 1, 1: 2, 2: 1})
+
+    def test_cached_until_catalog_changes(self):
+        queryset = Estate.objects.filter(is_available=True)
+        EstateFacets.get(queryset, {"min_price": "100"})
+        with self.assertNumQueries(0):
+            facets = EstateFacets.get(queryset, {"min_price": "100.0"})
+        self.assertEqual(facets["prices"], {0: 1, 1: 2, 2: 1})
+
+        version = CatalogVersion.get()
+        Sale.objects.create(estate=self.estates[0])
+        self.assertNotEqual(CatalogVersion.get(), version)
+        facets = EstateFacets.get(queryset, {"min_price": "100"})
+        self.assertEqual(facets["prices"], {1: 2, 2: 1})
+
+    def test_version_bumped_again_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            Sale.objects.create(estate=self.estates[0])
+            version = CatalogVersion.get()
+        self.assertIn(CatalogVersion.bump, callbacks)
+        self.assertNotEqual(CatalogVersion.get(), version)
+
+    def test_service_rename_bumps_version(self):
+        version = CatalogVersion.get()
+        self.flat.name = "Renamed"
+        self.flat.save()
+        self.assertNotEqual(CatalogVersion.get(), version)
+
+    def test_version_lives_in_coordination_cache(self):
+        version = CatalogVersion.bump()
+        cache.clear()
+        self.assertEqual(CatalogVersion.get(), version)
+        self.assertEqual(caches["coordination"].get(CatalogVersion.KEY), version)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class EstateResultCacheTests(TestCase):
+    def test_key_is_canonical(self):
+        key = EstateResultCache.key(
+            {"min_price": "100", "category": "2", "search": ""}, "-cost", "1"
+        )
+        self.assertEqual(
+            key,
+            EstateResultCache.key({"category": "2", "min_price": "100.00"}, "-cost", 1),
+        )
+        self.assertNotEqual(key, EstateResultCache.key({"category": "2"}, "-cost", 1))
+        self.assertNotEqual(
+            key, EstateResultCache.key({"category": "2", "min_price": "100"}, "cost", 1)
+        )
+        self.assertNotEqual(
+            key, EstateResultCache.key({"category": "2", "min_price": "100"}, "-cost", 2)
+        )
+
+        CatalogVersion.bump()
+        self.assertNotEqual(
+            key, EstateResultCache.key({"category": "2", "min_price": "100"}, "-cost", 1)
+        )
+
+    def test_stats(self):
+        EstateResultCache.reset_stats()
+        key = EstateResultCache.key({}, "-cost", 1)
+        self.assertIsNone(EstateResultCache.get(key))
+        EstateResultCache.set(key, [3, 1], 2)
+        self.assertEqual(EstateResultCache.get(key), ([3, 1], 2))
+        self.assertEqual(
+            EstateResultCache.get_stats(), {"hits": 1, "misses": 1, "hit_ratio": 0.5}
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES, REFERENCE_DATA_CHECK_INTERVAL=60)
+class ReferenceDataTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = ServiceCategory.objects.create(name="Category")
+        cls.service = Service.objects.create(name="Service", category=cls.category, cost=1)
+
+    def setUp(self):
+        ReferenceData.clear_local()
+
+    def test_loaded_once(self):
+        with self.assertNumQueries(2):
+            ReferenceData.snapshot()
+        with self.assertNumQueries(0):
+            self.assertEqual(ReferenceData.services(), [self.service])
+            self.assertEqual(ReferenceData.service(self.service.id).category, self.category)
+            self.assertEqual(ReferenceData.service_categories(), [self.category])
+
+    def test_str_uses_cached_category(self):
+        ReferenceData.snapshot()
+        service = Service.objects.get(pk=self.service.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(str(service), "(Ca) - Service")
+
+    def test_invalidated_on_change(self):
+        ReferenceData.snapshot()
+        self.category.name = "Renamed"
+        self.category.save()
+        self.assertEqual(ReferenceData.service_category(self.category.id).name, "Renamed")
+
+        other = Service.objects.create(name="Other", category=self.category, cost=2)
+        self.assertEqual(ReferenceData.service(other.id), other)
+
+    def test_other_worker_change_is_picked_up(self):
+        ReferenceData.snapshot()
+        Service.objects.filter(pk=self.service.pk).update(name="Changed")
+        self.assertEqual(ReferenceData.service(self.service.id).name, "Service")
+
+        # Another worker bumped the shared version; wait out the check interval.
+        caches["coordination"].incr(ReferenceData.KEY)
+        with override_settings(REFERENCE_DATA_CHECK_INTERVAL=0):
+            self.assertEqual(ReferenceData.service(self.service.id).name, "Changed")
+
+    def test_old_snapshot_is_reloaded_without_bump(self):
+        ReferenceData.snapshot()
+        Service.objects.filter(pk=self.service.pk).update(name="Changed")
+        with override_settings(REFERENCE_DATA_CHECK_INTERVAL=0, REFERENCE_DATA_MAX_AGE=0):
+            self.assertEqual(ReferenceData.service(self.service.id).name, "Changed")
+
+
+class GeohashTests(TestCase):
+    def test_encode(self):
+        self.assertEqual(Geohash.encode(57.64911, 10.40744, 11), "u4pruydqqvj")
+        self.assertEqual(Geohash.encode(53.9, 27.56, 5), "u9ede")
+
+    def test_covering_contains_points_in_box(self):
+        box = (53.85, 27.45, 53.95, 27.65)
+        prefixes = Geohash.covering(*box, max_cells=16)
+        self.assertLessEqual(len(prefixes), 16)
+        for lat in (53.85, 53.9, 53.95):
+            for lng in (27.45, 27.5, 27.65):
+                geohash = Geohash.encode(lat, lng)
+                self.assertTrue(any(geohash.startswith(p) for p in prefixes), geohash)
+
+    def test_covering_of_the_world(self):
+        self.assertEqual(len(Geohash.covering(-90, -180, 90, 180)), 32)
+
+    def test_prefix_end(self):
+        self.assertEqual(Geohash.prefix_end("u9e"), "u9f")
+        self.assertEqual(Geohash.prefix_end("u9"), "ub")
+        self.assertEqual(Geohash.prefix_end("u9zz"), "ub")
+        self.assertIsNone(Geohash.prefix_end("zz"))
+        for geohash in ("u9e", "u9e0", "u9ezzzzzz"):
+            self.assertTrue("u9e" <= geohash < Geohash.prefix_end("u9e"))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class EstateGeoSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = ServiceCategory.objects.create(name="Category")
+        service = Service.objects.create(name="Service", category=category, cost=1)
+        cls.points = {
+            "centre": (53.9023, 27.5619),
+            "north": (53.9200, 27.5619),  # ~2 km away
+            "brest": (52.0976, 23.7341),
+        }
+        cls.estates = {}
+        for name, (lat, lng) in cls.points.items():
+            estate = Estate(
+                cost=Decimal("100.00"),
+                area=Decimal("10.00"),
+                category=service,
+                description="Description",
+                address=name,
+            )
+            estate.lat, estate.lng = lat, lng
+            estate.save()
+            cls.estates[name] = estate
+
+    def test_geohash_stored(self):
+        self.assertEqual(
+            self.estates["centre"].geohash, Geohash.encode(53.9023, 27.5619)
+        )
+
+    def test_parse(self):
+        self.assertEqual(EstateGeoSearch.parse_bbox("27,53,28,54"), (27, 53, 28, 54))
+        self.assertIsNone(EstateGeoSearch.parse_bbox("28,53,27,54"))
+        self.assertIsNone(EstateGeoSearch.parse_bbox("a,b"))
+        self.assertIsNone(EstateGeoSearch.parse_point("53", "27", "0"))
+        self.assertEqual(EstateGeoSearch.parse_point("53", "27", "1000")[2], 50)
+
+    def test_bbox(self):
+        found = EstateGeoSearch.in_bbox(Estate.objects.all(), 27.4, 53.8, 27.7, 53.91)
+        self.assertEqual(list(found), [self.estates["centre"]])
+
+    def test_radius(self):
+        found = EstateGeoSearch.within(Estate.objects.all(), 53.9023, 27.5619, 3)
+        distances = {estate.address: estate.distance for estate in found}
+        self.assertEqual(set(distances), {"centre", "north"})
+        self.assertAlmostEqual(distances["centre"], 0, places=3)
+        self.assertAlmostEqual(distances["north"], 1.97, places=1)
+
+        found = EstateGeoSearch.within(Estate.objects.all(), 53.9023, 27.5619, 1.5)
+        self.assertEqual([estate.address for estate in found], ["centre"])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SIMILAR_ESTATES_COUNT=2)
+class EstateRecommenderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = ServiceCategory.objects.create(name="Category")
+        cls.flat = Service.objects.create(name="Flat", category=category, cost=1)
+        cls.house = Service.objects.create(name="House", category=category, cost=1)
+        cls.estates = {
+            name: cls.create(name, cost, area, service)
+            for name, cost, area, service in [
+                ("small flat", 50000, 40, cls.flat),
+                ("flat", 60000, 45, cls.flat),
+                ("big flat", 80000, 70, cls.flat),
+                ("house", 300000, 200, cls.house),
+                ("villa", 900000, 500, cls.house),
+            ]
+        }
+
+    @classmethod
+    def create(cls, name, cost, area, service):
+        return Estate.objects.create(
+            cost=Decimal(cost),
+            area=Decimal(area),
+            category=service,
+            description=name,
+            address=name,
+        )
+
+    def similar(self, name):
+        return [e.address for e in EstateRecommender.similar_to(self.estates[name])]
+
+    def test_features(self):
+        rows = [(1, Decimal("10"), Decimal("5"), 7, None, None), (2, Decimal("20"), Decimal("5"), None, 53.9, 27.5)]
+        matrix = EstateRecommender.features(rows)
+        self.assertEqual(matrix.shape, (2, 5))
+        self.assertFalse(np.isnan(matrix).any())
+        self.assertEqual(EstateRecommender.features([]).shape, (0, 4))
+
+    def test_rebuild(self):
+        self.assertEqual(EstateRecommender.rebuild(), 5)
+        self.assertEqual(self.similar("flat"), ["small flat", "big flat"])
+        self.assertEqual(self.similar("villa"), ["house", "big flat"])
+        self.assertFalse(EstateRecommender.pending().exists())
+        with self.assertNumQueries(1):
+            EstateRecommender.similar_to(self.estates["flat"])
+
+    def test_new_estate_updates_other_lists(self):
+        EstateRecommender.rebuild()
+        mansion = self.create("mansion", 850000, 480, self.house)
+        self.assertEqual(list(EstateRecommender.pending()), [mansion])
+
+        self.assertEqual(EstateRecommender.process_pending(), 1)
+        self.assertEqual(self.similar("villa")[0], "mansion")
+        self.assertEqual(
+            [e.address for e in EstateRecommender.similar_to(mansion)], ["villa", "house"]
+        )
+
+    def test_sold_estate_is_withdrawn(self):
+        EstateRecommender.rebuild()
+        sale = Sale.objects.create(estate=self.estates["small flat"])
+        self.assertNotIn("small flat", self.similar("flat"))
+        self.assertFalse(SimilarEstate.objects.filter(estate=self.estates["small flat"]).exists())
+        self.assertIn(self.estates["flat"], EstateRecommender.pending())
+
+        EstateRecommender.process_pending()
+        self.assertEqual(self.similar("flat"), ["big flat", "house"])
+
+        sale.delete()
+        EstateRecommender.process_pending()
+        self.assertEqual(self.similar("flat"), ["small flat", "big flat"])
+
+    def test_feature_change_requeues(self):
+        EstateRecommender.rebuild()
+        estate = self.estates["house"]
+        estate.description = "New description"
+        estate.save()
+        self.assertFalse(EstateRecommender.pending().exists())
+
+        estate.cost = Decimal("70000")
+        estate.save()
+        self.assertEqual(list(EstateRecommender.pending()), [estate])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class EmployeeLoadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.employees = []
+        for i in range(3):
+            user = User.objects.create(
+                username=f"employee{i}",
+                role="employee",
+                phone_number=f"+375(29)333-33-3{i}",
+                birth_date=date(1990, 1, 1),
+            )
+            cls.employees.append(Employee.objects.create(user=user, hire_date=date(2010, 1, 1)))
+        user = User.objects.create(
+            username="client",
+            role="client",
+            phone_number="+375(29)444-44-44",
+            birth_date=date(1990, 1, 1),
+        )
+        cls.client_obj = Client.objects.create(user=user)
+        category = ServiceCategory.objects.create(name="Category")
+        service = Service.objects.create(name="Service", category=category, cost=1)
+        cls.estates = [
+            Estate.objects.create(
+                cost=Decimal("100.00"),
+                area=Decimal("10.00"),
+                category=service,
+                description="Description",
+                address=f"Address {i}",
+            )
+            for i in range(6)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        caches["coordination"].clear()
+        EmployeeLoadIndex.clear_local()
+
+    def loads(self):
+        return list(
+            Employee.objects.order_by("id").values_list("active_request_count", flat=True)
+        )
+
+    def submit(self, i=0):
+        return PurchaseRequest.objects.create_with_assignment(
+            client=self.client_obj, estate=self.estates[i], message="Message"
+        )
+
+    def test_requests_are_balanced(self):
+        employees = [self.submit(i).employee_id for i in range(6)]
+        self.assertEqual(employees, [e.id for e in self.employees] * 2)
+        self.assertEqual(self.loads(), [2, 2, 2])
+        self.assertEqual(EmployeeLoad.compute(), {e.id: 2 for e in self.employees})
+
+    def test_assignment_does_not_scan_requests(self):
+        with CaptureQueriesContext(connection) as context:
+            self.submit()
+        selects = [q["sql"] for q in context.captured_queries if q["sql"].startswith("SELECT")]
+        self.assertFalse([sql for sql in selects if "catalog_purchaserequest" in sql])
+
+    def test_stale_index_is_reloaded(self):
+        EmployeeLoadIndex.get()
+        # Another worker assigned a request the local index has not seen.
+        Employee.objects.filter(pk=self.employees[0].pk).update(active_request_count=1)
+
+        request = self.submit()
+        self.assertEqual(request.employee, self.employees[1])
+        self.assertEqual(self.loads(), [1, 1, 0])
+        self.assertEqual(EmployeeLoadIndex.get().loads, dict(zip(
+            [e.pk for e in self.employees], [1, 1, 0]
+        )))
+
+    def test_no_employees(self):
+        Employee.objects.all().delete()
+        with self.assertRaises(ValueError):
+            self.submit()
+        self.assertFalse(PurchaseRequest.objects.exists())
+
+    def test_status_and_reassignment_update_counters(self):
+        request = self.submit()
+        request.status = "in_progress"
+        request.save()
+        self.assertEqual(self.loads(), [1, 0, 0])
+
+        request.employee = self.employees[2]
+        request.save()
+        self.assertEqual(self.loads(), [0, 0, 1])
+
+        request.status = "completed"
+        request.save()
+        self.assertEqual(self.loads(), [0, 0, 0])
+
+        request.status = "new"
+        request.save()
+        self.assertEqual(self.loads(), [0, 0, 1])
+
+        request.delete()
+        self.assertEqual(self.loads(), [0, 0, 0])
+
+    def test_direct_create_is_counted(self):
+        PurchaseRequest.objects.create(
+            client=self.client_obj, estate=self.estates[0], employee=self.employees[1]
+        )
+        self.assertEqual(self.loads(), [0, 1, 0])
+
+    def test_rebuild(self):
+        self.submit(0)
+        self.submit(1)
+        Employee.objects.update(active_request_count=5)
+        self.assertEqual(EmployeeLoad.rebuild(), 3)
+        self.assertEqual(self.loads(), [1, 1, 0])
+        self.assertEqual(EmployeeLoad.rebuild(), 0)
+
+    @override_settings(EMPLOYEE_ASSIGNMENT_STRATEGY="client_affinity")
+    def test_client_affinity(self):
+        self.employees[2].clients.add(self.client_obj)
+        employees = [self.submit(i).employee_id for i in range(3)]
+        self.assertEqual(employees, [self.employees[2].id] * 3)
+
+    def test_capacity_change_reloads_index(self):
+        self.assertEqual(EmployeeLoadIndex.get().capacities[self.employees[0].id], 10)
+        employee = Employee.objects.get(pk=self.employees[0].pk)
+        employee.capacity = 3
+        employee.save()
+        self.assertEqual(EmployeeLoadIndex.get().capacities[employee.id], 3)
+
+    def test_old_index_is_reloaded_without_bump(self):
+        EmployeeLoadIndex.get()
+        Employee.objects.filter(pk=self.employees[0].pk).update(capacity=3)
+        with override_settings(
+            EMPLOYEE_LOAD_INDEX_CHECK_INTERVAL=0, EMPLOYEE_LOAD_INDEX_MAX_AGE=0
+        ):
+            self.assertEqual(EmployeeLoadIndex.get().capacities[self.employees[0].pk], 3)
+
+    def test_stale_employee_save_keeps_counter(self):
+        employee = Employee.objects.get(pk=self.employees[0].pk)
+        self.submit()
+        employee.save()
+        self.assertEqual(self.loads(), [1, 0, 0])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AssignmentStrategyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches["coordination"].clear()
+        # employee id: (load, capacity)
+        self.index = EmployeeLoadIndex(
+            1, {1: (4, 10), 2: (3, 4), 3: (3, 0), 4: (5, 20)}, {7: [4]}
+        )
+
+    def choose(self, name, client_id=None):
+        return AssignmentStrategy.get(name).choose(self.index, client_id)
+
+    def test_least_loaded(self):
+        self.assertEqual(self.choose("least_loaded"), 2)
+
+    def test_round_robin(self):
+        turns = [self.choose("round_robin") for _ in range(5)]
+        self.assertEqual(turns, [2, 3, 4, 1, 2])
+
+    def test_weighted_capacity(self):
+        self.assertEqual(self.choose("weighted_capacity"), 4)
+
+    def test_client_affinity(self):
+        self.assertEqual(self.choose("client_affinity", client_id=7), 4)
+        self.assertEqual(self.choose("client_affinity", client_id=8), 2)
+        self.assertEqual(self.choose("client_affinity"), 2)
+
+    def test_no_employees(self):
+        self.index = EmployeeLoadIndex(1, {}, {})
+        for name in ("least_loaded", "round_robin", "weighted_capacity", "client_affinity"):
+            self.assertIsNone(self.choose(name))
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(ImproperlyConfigured):
+            AssignmentStrategy.get("random")
+
+    def test_assignment_query_budget(self):
+        """Assignment costs one UPDATE once the index is loaded, whatever
+        the number of employees, and the choice itself is in memory; the
+        throughput is measured by the benchmark_assignment command."""
+        users = User.objects.bulk_create(
+            User(username=f"employee{i}", phone_number=f"+375(29){i:03d}-00-00",
+                 birth_date=date(1990, 1, 1))
+            for i in range(50)
+        )
+        Employee.objects.bulk_create(
+            Employee(user=user, hire_date=date(2010, 1, 1)) for user in users
+        )
+        EmployeeLoadIndex.clear_local()
+
+        for name in ("least_loaded", "round_robin", "weighted_capacity", "client_affinity"):
+            strategy = AssignmentStrategy.get(name)
+            index = EmployeeLoadIndex.get()
+            with self.assertNumQueries(0):
+                for _ in range(1000):
+                    strategy.choose(index, client_id=1)
+            with self.assertNumQueries(200):
+                for _ in range(200):
+                    EmployeeLoad.assign(client_id=1, strategy=strategy)
+
+        loads = EmployeeLoadIndex.get().loads
+        self.assertEqual(sum(loads.values()), 800)
+        self.assertEqual(EmployeeLoad.compute(), dict.fromkeys(loads, 0))
+        self.assertEqual(EmployeeLoad.rebuild(), 50)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class EstatePurchaseTests(TransactionTestCase):
+    """Buyers racing for one estate on separate connections."""
+
+    BUYERS = 8
+
+    def setUp(self):
+        cache.clear()
+        EmployeeLoadIndex.clear_local()
+        category = ServiceCategory.objects.create(name="Category")
+        service = Service.objects.create(name="Service", category=category, cost=50)
+        self.estate = Estate.objects.create(
+            cost=Decimal("1000.00"),
+            area=Decimal("10.00"),
+            category=service,
+            description="Description",
+            address="Address",
+        )
+        user = User.objects.create(
+            username="employee", phone_number="+375(29)555-55-55", birth_date=date(1990, 1, 1)
+        )
+        self.employee = Employee.objects.create(user=user, hire_date=date(2010, 1, 1))
+        self.requests = []
+        for i in range(self.BUYERS):
+            user = User.objects.create(
+                username=f"client{i}",
+                phone_number=f"+375(29)666-66-6{i}",
+                birth_date=date(1990, 1, 1),
+            )
+            self.requests.append(
+                PurchaseRequest.objects.create_with_assignment(
+                    client=Client.objects.create(user=user), estate=self.estate
+                )
+            )
+
+    def buy(self, purchase_request, barrier, results):
+        try:
+            barrier.wait()
+            for _ in range(50):
+                try:
+                    results.append(EstatePurchase.buy(purchase_request).client_id)
+                    return
+                except EstateUnavailableError:
+                    results.append(None)
+                    return
+                except OperationalError:
+                    # SQLite refuses a second writer instead of queueing it.
+                    time.sleep(0.01)
+            results.append("gave up")
+        finally:
+            connections.close_all()
+
+    def test_concurrent_buyers(self):
+        barrier = threading.Barrier(self.BUYERS)
+        results = []
+        threads = [
+            threading.Thread(target=self.buy, args=(purchase_request, barrier, results))
+            for purchase_request in self.requests
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        winners = [client_id for client_id in results if client_id is not None]
+        self.assertEqual(len(results), self.BUYERS)
+        self.assertEqual(len(winners), 1)
+        self.assertIn(winners[0], [r.client_id for r in self.requests])
+
+        sale = Sale.objects.get()
+        self.assertEqual((sale.client_id, sale.cost), (winners[0], Decimal("1050.00")))
+        self.assertFalse(
+            PurchaseRequest.objects.filter(status__in=PurchaseRequest.ACTIVE_STATUSES).exists()
+        )
+        self.employee.refresh_from_db()
+        self.assertEqual(self.employee.active_request_count, 0)
+        self.assertFalse(Estate.objects.get(pk=self.estate.pk).is_available)
+
+    def test_closed_request_can_not_buy(self):
+        PurchaseRequest.objects.filter(pk=self.requests[0].pk).update(status="completed")
+        with self.assertRaises(EstateUnavailableError):
+            EstatePurchase.buy(self.requests[0])
+        self.assertTrue(Estate.objects.get(pk=self.estate.pk).is_available)
+        self.assertFalse(Sale.objects.exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PurchaseRequestBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = ServiceCategory.objects.create(name="Category")
+        service = Service.objects.create(name="Service", category=category, cost=1)
+        estates = Estate.objects.bulk_create(
+            Estate(cost=100, area=10, category=service, description="D", address=f"A{i}")
+            for i in range(50)
+        )
+        users = User.objects.bulk_create(
+            User(username=f"user{i}", phone_number=f"+375(29){i:03d}-00-00",
+                 birth_date=date(1990, 1, 1))
+            for i in range(42)
+        )
+        cls.employee, cls.other = Employee.objects.bulk_create(
+            Employee(user=user, hire_date=date(2010, 1, 1)) for user in users[:2]
+        )
+        clients = Client.objects.bulk_create(Client(user=user) for user in users[2:])
+        PurchaseRequest.objects.bulk_create(
+            PurchaseRequest(estate=estate, client=client, employee=cls.employee)
+            for estate in estates
+            for client in clients
+        )
+        EmployeeLoad.rebuild()
+
+    def setUp(self):
+        EmployeeLoadIndex.clear_local()
+
+    def load(self):
+        return Employee.objects.get(pk=self.employee.pk).active_request_count
+
+    def test_backlog_is_cleared_in_two_statements(self):
+        self.assertEqual(self.load(), 2000)
+        with self.assertNumQueries(4):  # savepoint, UPDATE, UPDATE, release
+            moved = PurchaseRequestBatch.set_status(self.employee, "completed")
+        self.assertEqual(moved, 2000)
+        self.assertEqual(self.load(), 0)
+        self.assertEqual(EmployeeLoad.compute()[self.employee.pk], 0)
+
+    def test_selected_requests_between_open_statuses(self):
+        ids = list(PurchaseRequest.objects.values_list("pk", flat=True)[:10])
+        self.assertEqual(PurchaseRequestBatch.set_status(self.employee, "in_progress", ids), 10)
+        self.assertEqual(PurchaseRequestBatch.set_status(self.employee, "in_progress", ids), 0)
+        self.assertEqual(self.load(), 2000)
+
+        self.assertEqual(PurchaseRequestBatch.set_status(self.employee, "completed", ids[:4]), 4)
+        self.assertEqual(PurchaseRequestBatch.set_status(self.employee, "new", ids), 6)
+        self.assertEqual(self.load(), 1996)
+        self.assertEqual(
+            PurchaseRequest.objects.filter(pk__in=ids, status="completed").count(), 4
+        )
+
+    def test_other_employees_requests_are_untouched(self):
+        self.assertEqual(PurchaseRequestBatch.set_status(self.other, "completed"), 0)
+        self.assertEqual(self.load(), 2000)
+
+    def test_unknown_status(self):
+        with self.assertRaises(ValueError):
+            PurchaseRequestBatch.set_status(self.employee, "archived")
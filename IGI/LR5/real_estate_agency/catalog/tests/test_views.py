@@ -1,8 +1,25 @@
+import shutil
+import tempfile
+import threading
 from datetime import datetime
-
-from django.test import TestCase, RequestFactory
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+from unittest.mock import patch
+
+from django.test import TestCase, RequestFactory, override_settings
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.messages import get_messages
+from ..utils import (
+    ChartCache,
+    EmployeeLoadIndex,
+    EstateRecommender,
+    EstateResultCache,
+    Plotter,
+    ReferenceData,
+)
 from ..views import (
     ServiceListView,
     AvailableEstateListView,
@@ -11,8 +28,11 @@ from ..views import (
     EmployeeDashboardView,
 )
 from ..models import Service, ServiceCategory, Estate, Sale, PurchaseRequest
+from .caches import LOCMEM_CACHES
 from users.models import Client, Employee, User
 
+
+@override_settings(CACHES=LOCMEM_CACHES)
 class BaseTestCase(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -48,6 +68,11 @@ class BaseTestCase(TestCase):
         )
 
     def setUp(self):
+        # Catalogue caches outlive the rolled back test transactions.
+        for alias in LOCMEM_CACHES:
+            caches[alias].clear()
+        ReferenceData.clear_local()
+        EmployeeLoadIndex.clear_local()
         self.factory = RequestFactory()
         self.user = User.objects.get(username='client')
         self.client_user = Client.objects.get(user=self.user)
@@ -82,6 +107,16 @@ class ServiceListViewTests(BaseTestCase):
         self.assertIn('service_categories', response.context_data)
         self.assertEqual(list(response.context_data['service_categories']), [self.service_category])
 
+    def test_reference_data_is_not_queried_per_request(self):
+        request = self.factory.get(reverse('services'), {'service_category': self.service_category.id})
+        ServiceListView.as_view()(request).render()
+        with self.assertNumQueries(0):
+            response = ServiceListView.as_view()(request)
+            response.render()
+        self.assertEqual(
+            list(response.context_data['service_list']), [self.estate_category, self.service]
+        )
+
 
 class AvailableEstateListViewTests(BaseTestCase):
     @classmethod
@@ -100,6 +135,17 @@ class AvailableEstateListViewTests(BaseTestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(list(response.context_data['object_list']), [self.estate])
 
+    def test_sold_estates_hidden(self):
+        sale = Sale.objects.create(client=self.client_user, estate=self.estate, employee=self.employee)
+        request = self.factory.get(reverse('estates'))
+        request.user = self.user
+        response = AvailableEstateListView.as_view()(request)
+        self.assertEqual(list(response.context_data['object_list']), [])
+
+        sale.delete()
+        response = AvailableEstateListView.as_view()(request)
+        self.assertEqual(list(response.context_data['object_list']), [self.estate])
+
     def test_get_queryset_search(self):
         self.login()
         request = self.factory.get(reverse('estates'), {'search': 'Test St'})
@@ -108,6 +154,65 @@ class AvailableEstateListViewTests(BaseTestCase):
         response = view(request)
         self.assertEqual(list(response.context_data['object_list']), [self.estate])
 
+    def test_search_ranks_by_relevance(self):
+        best = Estate.objects.create(
+            address='1 Garden Rd',
+            cost=1,
+            area=10,
+            description='Garden garden garden',
+            category=self.estate_category
+        )
+        other = Estate.objects.create(
+            address='2 Main St',
+            cost=200000,
+            area=10,
+            description='Small garden',
+            category=self.estate_category
+        )
+        request = self.factory.get(reverse('estates'), {'search': 'garden'})
+        request.user = self.user
+        response = AvailableEstateListView.as_view()(request)
+        self.assertEqual(list(response.context_data['object_list']), [best, other])
+
+        request = self.factory.get(reverse('estates'), {'search': 'garden', 'sort': 'price_desc'})
+        request.user = self.user
+        response = AvailableEstateListView.as_view()(request)
+        self.assertEqual(list(response.context_data['object_list']), [other, best])
+
+    def test_cursor_paging(self):
+        for i in range(10):
+            Estate.objects.create(
+                address=f'{i} Cursor St',
+                cost=1000 + i,
+                area=10,
+                description='Cursor estate',
+                category=self.estate_category
+            )
+        self.login()
+        params = {'paging': 'cursor', 'sort': 'price_asc', 'search': 'cursor'}
+        response = self.client.get(reverse('estates'), params)
+        page = response.context['page_obj']
+        self.assertEqual([e.cost for e in page], list(range(1000, 1009)))
+        self.assertIn('sort=price_asc', page.next_url)
+        self.assertIsNone(page.previous_url)
+        self.assertContains(response, 'Найдено объектов: 10')
+
+        response = self.client.get(page.next_url)
+        page = response.context['page_obj']
+        self.assertEqual([e.cost for e in page], [1009])
+        self.assertIsNone(page.next_url)
+
+        response = self.client.get(page.previous_url)
+        self.assertEqual(len(response.context['page_obj']), 9)
+
+        response = self.client.get(reverse('estates'), {'paging': 'cursor', 'cursor': 'bad'})
+        self.assertEqual(response.status_code, 404)
+        # base64 of ["n", null, 1]
+        response = self.client.get(
+            reverse('estates'), {'paging': 'cursor', 'cursor': 'WyJuIiwgbnVsbCwgMV0='}
+        )
+        self.assertEqual(response.status_code, 404)
+
     def test_get_queryset_filter_category(self):
         self.login()
         request = self.factory.get(reverse('estates'), {'category': self.estate_category.id})
@@ -135,6 +240,103 @@ class AvailableEstateListViewTests(BaseTestCase):
         self.assertEqual(response.context_data['search_query'], '')
         self.assertIsNone(response.context_data['current_sort'])
 
+    def test_facet_counts(self):
+        request = self.factory.get(reverse('estates'), {'search': 'test'})
+        request.user = self.user
+        response = AvailableEstateListView.as_view()(request)
+        counts = {c.name: c.facet_count for c in response.context_data['categories']}
+        self.assertEqual(counts, {'Service1': 0, 'EstateService': 1})
+        self.assertEqual(response.context_data['service_categories'][0].facet_count, 1)
+        prices = {(b['lower'], b['upper']): b['count'] for b in response.context_data['price_facets']}
+        self.assertEqual(prices[(100000, 200000)], 1)
+        self.assertEqual(sum(prices.values()), 1)
+
+    def test_price_facet_links_match_counts(self):
+        self.login()
+        response = self.client.get(reverse('estates'))
+        for bucket in response.context['price_facets']:
+            with self.subTest(lower=bucket['lower'], upper=bucket['upper']):
+                linked = self.client.get(bucket['url'])
+                self.assertEqual(
+                    linked.context['paginator'].count, bucket['count']
+                )
+
+    def test_result_pages_are_cached(self):
+        for i in range(10):
+            Estate.objects.create(
+                address=f'{i} Cached St',
+                cost=1000 + i,
+                area=10,
+                description='Cached estate',
+                category=self.estate_category
+            )
+        params = {'sort': 'price_asc', 'page': '2'}
+        request = self.factory.get(reverse('estates'), params)
+        request.user = self.user
+        first = AvailableEstateListView.as_view()(request)
+        first = list(first.context_data['object_list'])
+
+        EstateResultCache.reset_stats()
+        request = self.factory.get(reverse('estates'), dict(params, min_price=''))
+        request.user = self.user
+        response = AvailableEstateListView.as_view()(request)
+        self.assertEqual(list(response.context_data['object_list']), first)
+        self.assertEqual(response.context_data['paginator'].count, 11)
+        self.assertEqual(EstateResultCache.get_stats()['hits'], 1)
+
+        Sale.objects.create(client=self.client_user, estate=first[0], employee=self.employee)
+        response = AvailableEstateListView.as_view()(request)
+        self.assertNotIn(first[0], response.context_data['object_list'])
+        self.assertEqual(EstateResultCache.get_stats()['misses'], 1)
+
+    def test_cards_use_projection(self):
+        for i in range(9):
+            Estate.objects.create(
+                address=f'{i} Long St',
+                cost=1000 + i,
+                area=10,
+                description='Long description. ' * 100,
+                category=self.estate_category
+            )
+        self.login()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('estates'))
+        estate_queries = [q['sql'] for q in queries if 'FROM "catalog_estate"' in q['sql']]
+        self.assertTrue(estate_queries)
+        for sql in estate_queries:
+            self.assertNotIn('"catalog_estate"."description"', sql)
+        self.assertContains(response, Estate.make_summary('Long description. ' * 100))
+        self.assertNotContains(response, 'Long description. ' * 20)
+
+        # Rendering the cards must not load deferred fields row by row.
+        self.assertFalse([sql for sql in estate_queries if '"catalog_estate"."id" =' in sql])
+
+    def test_geo_filters(self):
+        near = Estate(address='Near', cost=1, area=10, description='Near', category=self.estate_category)
+        near.lat, near.lng = 53.9100, 27.5619
+        near.save()
+        far = Estate(address='Far', cost=2, area=10, description='Far', category=self.estate_category)
+        far.lat, far.lng = 53.9023, 27.5619
+        far.save()
+        Estate.objects.filter(pk=self.estate.pk).update(lat=52.0976, lng=23.7341)
+
+        request = self.factory.get(
+            reverse('estates'), {'lat': '53.9023', 'lng': '27.5619', 'radius': '2'}
+        )
+        request.user = self.user
+        response = AvailableEstateListView.as_view()(request)
+        self.assertEqual(list(response.context_data['object_list']), [far, near])
+
+        request = self.factory.get(reverse('estates'), {'bbox': '27.5,53.905,27.6,53.95'})
+        request.user = self.user
+        response = AvailableEstateListView.as_view()(request)
+        self.assertEqual(list(response.context_data['object_list']), [near])
+
+        request = self.factory.get(reverse('estates'), {'bbox': 'nonsense', 'radius': 'x'})
+        request.user = self.user
+        response = AvailableEstateListView.as_view()(request)
+        self.assertEqual(len(response.context_data['object_list']), 3)
+
     def test_unauthenticated_access(self):
         response = self.client.get(reverse('estates'))
         self.assertEqual(response.status_code, 302)  # Redirect to login
@@ -161,6 +363,119 @@ class EstateDetailViewTests(BaseTestCase):
         response = view(request, pk=self.estate.id)
         self.assertTrue(response.context_data['request_exists'])
 
+    @patch('catalog.utils.mapbox_client.OutboundHttpClient.get')
+    def test_map_placeholder_until_geocoded(self, mock_get):
+        request = self.factory.get(reverse('estate_detail', kwargs={'pk': self.estate.id}))
+        request.user = self.user
+        response = EstateDetailView.as_view()(request, pk=self.estate.id)
+        self.assertEqual(response.context_data['map_image_url'], '/media/map_placeholder.jpg')
+        mock_get.assert_not_called()
+
+    @patch('catalog.utils.mapbox_client.OutboundHttpClient.get')
+    def test_map_built_from_stored_coordinates(self, mock_get):
+        Estate.objects.filter(pk=self.estate.id).update(lat=53.9, lng=27.56)
+        request = self.factory.get(reverse('estate_detail', kwargs={'pk': self.estate.id}))
+        request.user = self.user
+        response = EstateDetailView.as_view()(request, pk=self.estate.id)
+        self.assertTrue(
+            response.context_data['map_image_url'].startswith(
+                reverse('estate_map', kwargs={'pk': self.estate.id}) + '?v='
+            )
+        )
+        mock_get.assert_not_called()
+
+    def test_similar_estates(self):
+        other = Estate.objects.create(
+            address='124 Test St',
+            cost=110000,
+            area=100,
+            description='Neighbour',
+            category=self.estate_category
+        )
+        EstateRecommender.rebuild()
+        self.login()
+        response = self.client.get(reverse('estate_detail', args=[self.estate.pk]))
+        self.assertEqual(response.context['similar_estates'], [other])
+        self.assertContains(response, '124 Test St')
+
+
+class StubMapboxHandler(BaseHTTPRequestHandler):
+    requests_served = []
+
+    def do_GET(self):
+        self.requests_served.append(self.path)
+        body = b'\x89PNG stub ' + self.path.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class EstateMapViewTests(BaseTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = HTTPServer(('127.0.0.1', 0), StubMapboxHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.media_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(
+            MEDIA_ROOT=cls.media_root,
+            MAPBOX_STATIC_MAP_API=(
+                f'http://127.0.0.1:{cls.server.server_port}/{{lng}},{{lat}}.png?access_token={{token}}'
+            ),
+        )
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        StubMapboxHandler.requests_served.clear()
+        shutil.rmtree(Path(self.media_root) / 'maps', ignore_errors=True)
+        Estate.objects.filter(pk=self.estate.id).update(lat=53.9, lng=27.56)
+        self.url = reverse('estate_map', kwargs={'pk': self.estate.id})
+        self.login()
+
+    def test_fetches_once_and_serves_from_disk(self):
+        first = self.client.get(self.url)
+        second = self.client.get(self.url)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(b''.join(first.streaming_content), b''.join(second.streaming_content))
+        self.assertEqual(len(StubMapboxHandler.requests_served), 1)
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertIn('max-age=', first['Cache-Control'])
+
+    def test_if_none_match_returns_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(StubMapboxHandler.requests_served), 1)
+
+    def test_coordinates_change_refetches(self):
+        first = self.client.get(self.url)
+        Estate.objects.filter(pk=self.estate.id).update(lat=53.8, lng=27.6)
+        second = self.client.get(self.url)
+
+        self.assertNotEqual(first['ETag'], second['ETag'])
+        self.assertEqual(len(StubMapboxHandler.requests_served), 2)
+        self.assertEqual(len(list((Path(self.media_root) / 'maps').glob('*.png'))), 1)
+
+    def test_no_coordinates_redirects_to_placeholder(self):
+        Estate.objects.filter(pk=self.estate.id).update(lat=None, lng=None)
+        response = self.client.get(self.url)
+        self.assertRedirects(response, '/media/map_placeholder.jpg', fetch_redirect_response=False)
+
 
 class CreatePurchaseRequestViewTests(BaseTestCase):
     @classmethod
@@ -230,6 +545,53 @@ class ClientDashboardViewTests(BaseTestCase):
         self.assertEqual(purchase_request.status, 'completed')
         self.assertTrue(Sale.objects.filter(client=self.client_user, estate=self.estate).exists())
 
+    def test_post_buy_closes_competing_requests(self):
+        self.login()
+        other_user = User.objects.create_user(
+            username="other", password="testpass", role="client",
+            phone_number="+375(29)777-77-78", birth_date=datetime(2000, 1, 1),
+        )
+        other_client = Client.objects.create(user=other_user)
+        purchase_request = PurchaseRequest.objects.create_with_assignment(
+            client=self.client_user, estate=self.estate
+        )
+        competing = PurchaseRequest.objects.create_with_assignment(
+            client=other_client, estate=self.estate
+        )
+        self.employee.refresh_from_db()
+        self.assertEqual(self.employee.active_request_count, 2)
+
+        response = self.client.post(
+            reverse('client_dashboard'),
+            {'action': 'buy', 'request_id': purchase_request.id}
+        )
+        self.assertEqual(response.status_code, 302)
+        sale = Sale.objects.get(estate=self.estate)
+        self.assertEqual(sale.cost, 100500)
+        self.assertEqual(sale.employee, self.employee)
+        competing.refresh_from_db()
+        self.assertEqual(competing.status, 'completed')
+        self.employee.refresh_from_db()
+        self.assertEqual(self.employee.active_request_count, 0)
+        self.estate.refresh_from_db()
+        self.assertFalse(self.estate.is_available)
+
+    def test_post_buy_sold_estate_conflict(self):
+        self.login()
+        purchase_request = PurchaseRequest.objects.create(
+            client=self.client_user, estate=self.estate, status='new', employee=self.employee
+        )
+        Sale.objects.create(estate=self.estate)
+
+        response = self.client.post(
+            reverse('client_dashboard'),
+            {'action': 'buy', 'request_id': purchase_request.id}
+        )
+        self.assertEqual(response.status_code, 409)
+        messages = list(get_messages(response.wsgi_request))
+        self.assertEqual(str(messages[0]), 'This estate is no longer available.')
+        self.assertEqual(Sale.objects.count(), 1)
+
     def test_post_cancel_action(self):
         self.login()
         purchase_request = PurchaseRequest.objects.create(
@@ -243,6 +605,14 @@ class ClientDashboardViewTests(BaseTestCase):
         purchase_request.refresh_from_db()
         self.assertEqual(purchase_request.status, 'completed')
 
+    def test_sales_show_stored_service_cost(self):
+        self.login()
+        Sale.objects.create(client=self.client_user, estate=self.estate)
+        Service.objects.filter(pk=self.estate.category_id).update(cost=777)
+        response = self.client.get(reverse('client_dashboard'))
+        self.assertContains(response, '<td>500.00 $</td>')
+        self.assertNotContains(response, '777')
+
     def test_post_invalid_request_id(self):
         self.login()
         response = self.client.post(
@@ -277,6 +647,61 @@ class EmployeeDashboardViewTests(BaseTestCase):
         self.assertEqual(len(response.context_data['requests']), 1)
         self.assertEqual(len(response.context_data['sales']), 1)
 
+    def add_history(self, count):
+        for i in range(count):
+            user = User.objects.create(
+                username=f"buyer{self.created + i}", role="client",
+                phone_number="+375(29)777-77-77", birth_date=datetime(2000, 1, 1),
+            )
+            client = Client.objects.create(user=user)
+            estates = [
+                Estate.objects.create(
+                    address=f'Street {self.created + i}-{j}', cost=1000, area=10,
+                    description='Estate', category=self.estate_category,
+                )
+                for j in range(2)
+            ]
+            PurchaseRequest.objects.create(
+                client=client, estate=estates[0], employee=self.employee
+            )
+            Sale.objects.create(client=client, estate=estates[1], employee=self.employee)
+        self.created += count
+
+    def get_dashboard(self, query=""):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('employee_dashboard') + query)
+        self.assertEqual(response.status_code, 200)
+        return response, len(context)
+
+    def test_query_budget_does_not_grow_with_history(self):
+        self.created = 0
+        self.client.login(username='employee', password='testpass')
+        self.add_history(3)
+        response, small = self.get_dashboard()
+        self.assertEqual(len(response.context['sales']), 3)
+
+        self.add_history(30)
+        response, large = self.get_dashboard("?sales_page=2&requests_page=4")
+        self.assertEqual(len(response.context['sales']), 10)
+        self.assertEqual(len(response.context['requests']), 3)
+        self.assertEqual(response.context['clients'].paginator.count, 33)
+        self.assertContains(response, "Street 0-0")
+        self.assertContains(response, "clients_page=2")
+        self.assertEqual(large, small)
+        # Session, user and employee, the profile and client checks of the
+        # base template, then a count and a page per section.
+        self.assertEqual(large, 11)
+
+    def test_sales_show_stored_service_cost(self):
+        self.client.login(username='employee', password='testpass')
+        Sale.objects.create(
+            client=self.client_user, estate=self.estate, employee=self.employee
+        )
+        Service.objects.filter(pk=self.estate.category_id).update(cost=777)
+        response = self.client.get(reverse('employee_dashboard'))
+        self.assertContains(response, '<td>500.00</td>')
+        self.assertNotContains(response, '777')
+
     def test_no_employee(self):
         self.login()
         response = self.client.get(reverse('employee_dashboard'))
@@ -284,3 +709,160 @@ class EmployeeDashboardViewTests(BaseTestCase):
         messages = list(get_messages(response.wsgi_request))
         self.assertEqual(str(messages[0]), 'You must be employee.')
 
+
+
+class EmployeeRequestBatchViewTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.request = PurchaseRequest.objects.create_with_assignment(
+            client=self.client_user, estate=self.estate
+        )
+
+    def post(self, data):
+        return self.client.post(reverse('employee_request_batch'), data)
+
+    def test_selected_requests(self):
+        self.client.login(username='employee', password='testpass')
+        response = self.post({'status': 'completed', 'request_id': [self.request.pk]})
+        self.assertRedirects(response, reverse('employee_dashboard'))
+        self.request.refresh_from_db()
+        self.assertEqual(self.request.status, 'completed')
+        self.employee.refresh_from_db()
+        self.assertEqual(self.employee.active_request_count, 0)
+
+    def test_all_requests(self):
+        self.client.login(username='employee', password='testpass')
+        self.post({'status': 'in_progress', 'select': 'all'})
+        self.request.refresh_from_db()
+        self.assertEqual(self.request.status, 'in_progress')
+
+    def test_invalid_status(self):
+        self.client.login(username='employee', password='testpass')
+        response = self.post({'status': 'archived', 'select': 'all'})
+        messages = list(get_messages(response.wsgi_request))
+        self.assertEqual(str(messages[0]), 'Incorrect request.')
+        self.request.refresh_from_db()
+        self.assertEqual(self.request.status, 'new')
+
+    def test_no_employee(self):
+        self.login()
+        response = self.post({'status': 'completed', 'select': 'all'})
+        messages = list(get_messages(response.wsgi_request))
+        self.assertEqual(str(messages[0]), 'You must be employee.')
+        self.request.refresh_from_db()
+        self.assertEqual(self.request.status, 'new')
+
+
+class StatisticsViewTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user.is_superuser = True
+        self.user.save()
+        self.login()
+
+    def chart_url(self, response, name='services_by_sold_count'):
+        return response.context['chart_images'][name]
+
+    def test_page_does_not_render_charts(self):
+        with patch.object(Plotter, 'plt_bars') as mock_plot:
+            response = self.client.get(reverse('statistics'))
+        self.assertEqual(response.status_code, 200)
+        mock_plot.assert_not_called()
+        self.assertTrue(
+            self.chart_url(response).startswith(
+                reverse('statistics_chart', args=['services_by_sold_count'])
+            )
+        )
+
+    def test_chart_rendered_in_memory_once_per_version(self):
+        url = reverse('statistics_chart', args=['services_by_sold_count'])
+        with patch.object(Plotter, 'plt_bars', wraps=Plotter.plt_bars) as mock_plot:
+            first = self.client.get(url)
+            self.client.get(url)
+            self.assertEqual(mock_plot.call_count, 1)
+
+            Sale.objects.create(client=self.client_user, estate=self.estate, employee=self.employee)
+            second = self.client.get(url)
+            self.assertEqual(mock_plot.call_count, 2)
+
+        self.assertEqual(first['Content-Type'], 'image/jpeg')
+        self.assertTrue(first.content.startswith(b'\xff\xd8'))
+        self.assertIn('max-age=', first['Cache-Control'])
+        self.assertNotEqual(first['ETag'], second['ETag'])
+
+    def test_chart_conditional_get(self):
+        url = reverse('statistics_chart', args=['employee_total_stats'])
+        etag = self.client.get(url)['ETag']
+        with patch.object(Plotter, 'plt_bars') as mock_plot:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        mock_plot.assert_not_called()
+
+    def test_chart_requires_superuser(self):
+        self.client.login(username='employee', password='testpass')
+        response = self.client.get(reverse('statistics_chart', args=['employee_total_stats']))
+        self.assertEqual(response.status_code, 403)
+
+        self.client.logout()
+        response = self.client.get(reverse('statistics_chart', args=['employee_total_stats']))
+        self.assertEqual(response.status_code, 302)
+
+    def test_unknown_chart(self):
+        response = self.client.get(reverse('statistics_chart', args=['unknown']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_version_depends_on_data(self):
+        self.assertEqual(
+            ChartCache.version('chart', [1, 2], ['a', 'b']),
+            ChartCache.version('chart', [1.0, 2.0], ['a', 'b']),
+        )
+        self.assertNotEqual(
+            ChartCache.version('chart', [1, 2], ['a', 'b']),
+            ChartCache.version('chart', [1, 3], ['a', 'b']),
+        )
+
+
+class StatisticsDataViewTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user.is_superuser = True
+        self.user.save()
+        self.login()
+        self.url = reverse('statistics_data')
+
+    def test_requires_superuser(self):
+        self.user.is_superuser = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_series(self):
+        Sale.objects.create(client=self.client_user, estate=self.estate, employee=self.employee)
+        response = self.client.get(self.url)
+        charts = response.json()['charts']
+
+        self.assertEqual(set(charts), {
+            'services_by_sold_count',
+            'services_by_service_profit',
+            'services_by_full_costs',
+            'employee_service_stats',
+            'employee_total_stats',
+        })
+        self.assertEqual(charts['services_by_sold_count']['values'], [1.0])
+        self.assertEqual(charts['employee_total_stats'], {'labels': ['employee'], 'values': [100500.0]})
+
+    def test_conditional_get(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Sale.objects.create(client=self.client_user, estate=self.estate, employee=self.employee)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    @override_settings(STATISTICS_CLIENT_SIDE_CHARTS=True)
+    def test_page_uses_client_side_charts(self):
+        response = self.client.get(reverse('statistics'))
+        self.assertContains(response, 'data-chart="services_by_sold_count"')
+        self.assertContains(response, self.url)
+        self.assertNotContains(response, reverse('statistics_chart', args=['services_by_sold_count']))
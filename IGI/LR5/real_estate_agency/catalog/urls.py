@@ -6,8 +6,12 @@ urlpatterns = [
     re_path(r'^$', views.AvailableEstateListView.as_view(), name='estates'),
     re_path(r'^services/$', views.ServiceListView.as_view(), name='services'),
     re_path(r'^estate/(?P<pk>\d+)/$', views.EstateDetailView.as_view(), name='estate_detail'),
+    re_path(r'^estate/(?P<pk>\d+)/map/$', views.EstateMapView.as_view(), name='estate_map'),
     re_path(r'^estate/(?P<pk>\d+)/request/$', views.CreatePurchaseRequestView.as_view(), name='create_request'),
     re_path(r'^client-dashboard/$', views.ClientDashboardView.as_view(), name='client_dashboard'),
     re_path(r'^employee-dashboard/$', views.EmployeeDashboardView.as_view(), name='employee_dashboard'),
+    re_path(r'^employee-dashboard/requests/$', views.EmployeeRequestBatchView.as_view(), name='employee_request_batch'),
     re_path(r'^statistics/$', views.StatisticsView.as_view(), name='statistics'),
+    re_path(r'^statistics/data/$', views.StatisticsDataView.as_view(), name='statistics_data'),
+    re_path(r'^statistics/charts/(?P<name>\w+)\.jpg$', views.StatisticsChartView.as_view(), name='statistics_chart'),
 ]
\ No newline at end of file
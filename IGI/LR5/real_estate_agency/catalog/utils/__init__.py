@@ -1,5 +1,24 @@
+from .geohash import *
+from .geocode_cache import *
 from .mapbox_client import *
+from .estate_geocoder import *
+from .static_map_cache import *
 from .plotter import *
+from .chart_cache import *
+from .catalog_version import *
+from .sales_rollup import *
+from .estate_search import *
+from .estate_geo_search import *
+from .cursor_paginator import *
+from .estate_facets import *
+from .estate_result_cache import *
+from .reference_data import *
+from .estate_recommender import *
+from .employee_load_index import *
+from .assignment_strategies import *
+from .employee_load import *
+from .estate_purchase import *
+from .purchase_request_batch import *
 from .statistic_calculator import *
 
-__all__ = ['StatisticsCalculator', 'Plotter', 'MapboxClient']
\ No newline at end of file
+__all__ = ['StatisticsCalculator', 'Plotter', 'MapboxClient', 'GeocodeCache', 'EstateGeocoder', 'StaticMapCache', 'SalesRollup', 'ChartCache', 'EstateSearch', 'CursorPaginator', 'CatalogVersion', 'EstateFacets', 'EstateResultCache', 'ReferenceData', 'Geohash', 'EstateGeoSearch', 'EstateRecommender', 'EmployeeLoad', 'EmployeeLoadIndex', 'AssignmentStrategy', 'EstatePurchase', 'EstateUnavailableError', 'PurchaseRequestBatch']
\ No newline at end of file
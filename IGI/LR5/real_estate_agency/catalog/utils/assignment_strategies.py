@@ -0,0 +1,93 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger(__name__)
+
+
+class AssignmentStrategy(object):
+    """Picks the employee for a new purchase request from an
+    ``EmployeeLoadIndex``; ``choose`` must not query the database."""
+
+    name = None
+
+    def choose(self, index, client_id=None):
+        raise NotImplementedError
+
+    @staticmethod
+    def get(name=None):
+        name = name or settings.EMPLOYEE_ASSIGNMENT_STRATEGY
+        try:
+            return ASSIGNMENT_STRATEGIES[name]()
+        except KeyError:
+            raise ImproperlyConfigured(f"Unknown assignment strategy: {name}")
+
+
+class LeastLoadedStrategy(AssignmentStrategy):
+    name = "least_loaded"
+
+    def choose(self, index, client_id=None):
+        return self.least_loaded(index, index.employee_ids)
+
+    @staticmethod
+    def least_loaded(index, employee_ids):
+        return min(employee_ids, key=lambda pk: (index.loads[pk], pk), default=None)
+
+
+class RoundRobinStrategy(AssignmentStrategy):
+    """Cycles through employees with a counter shared by all workers."""
+
+    name = "round_robin"
+    KEY = "assignment:round_robin"
+
+    def choose(self, index, client_id=None):
+        if not index.employee_ids:
+            return None
+        cache = caches[settings.COORDINATION_CACHE_ALIAS]
+        cache.add(self.KEY, 0, None)
+        try:
+            turn = cache.incr(self.KEY)
+        except ValueError:
+            turn = 0
+        return index.employee_ids[turn % len(index.employee_ids)]
+
+
+class WeightedCapacityStrategy(AssignmentStrategy):
+    """Least loaded relative to ``Employee.capacity``; employees with zero
+    capacity never receive requests."""
+
+    name = "weighted_capacity"
+
+    def choose(self, index, client_id=None):
+        candidates = [pk for pk in index.employee_ids if index.capacities[pk]]
+        return min(
+            candidates,
+            key=lambda pk: (index.loads[pk] / index.capacities[pk], pk),
+            default=None,
+        )
+
+
+class ClientAffinityStrategy(AssignmentStrategy):
+    """Prefers the least loaded of the client's employees
+    (``Employee.clients``) and falls back to all employees."""
+
+    name = "client_affinity"
+
+    def choose(self, index, client_id=None):
+        employee_id = LeastLoadedStrategy.least_loaded(index, index.employees_of(client_id))
+        if employee_id is None:
+            employee_id = LeastLoadedStrategy.least_loaded(index, index.employee_ids)
+        return employee_id
+
+
+ASSIGNMENT_STRATEGIES = {
+    strategy.name: strategy
+    for strategy in (
+        LeastLoadedStrategy,
+        RoundRobinStrategy,
+        WeightedCapacityStrategy,
+        ClientAffinityStrategy,
+    )
+}
@@ -0,0 +1,41 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogVersion(object):
+    """Counter in the ``COORDINATION_CACHE_ALIAS`` cache, shared by all
+    workers, that changes whenever estates or sales do.
+
+    Cache keys derived from the estate catalogue embed it, so bumping the
+    version invalidates all of them at once without deleting anything.
+    """
+
+    KEY = "catalog:version"
+
+    @staticmethod
+    def _cache():
+        return caches[settings.COORDINATION_CACHE_ALIAS]
+
+    @staticmethod
+    def get():
+        cache = CatalogVersion._cache()
+        version = cache.get(CatalogVersion.KEY)
+        if version is None:
+            # Start from the clock so a lost counter never reuses old keys.
+            cache.add(CatalogVersion.KEY, int(time.time() * 1000), None)
+            version = cache.get(CatalogVersion.KEY)
+        return version
+
+    @staticmethod
+    def bump():
+        try:
+            version = CatalogVersion._cache().incr(CatalogVersion.KEY)
+        except ValueError:
+            version = CatalogVersion.get()
+        logger.debug(f"Catalog version bumped to {version}")
+        return version
@@ -0,0 +1,35 @@
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .plotter import Plotter
+
+logger = logging.getLogger(__name__)
+
+
+class ChartCache(object):
+    """Rendered bar charts keyed by a digest of the plotted values, so a
+    chart is only rasterized when its data changes."""
+
+    @staticmethod
+    def version(name, data, categories):
+        payload = json.dumps(
+            [name, [float(value) for value in data], [str(c) for c in categories]],
+            ensure_ascii=False,
+        )
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def get_image(name, data, categories):
+        data, categories = list(data), list(categories)
+        key = f"chart:{name}:{ChartCache.version(name, data, categories)}"
+
+        image = cache.get(key)
+        if image is None:
+            image = Plotter.plt_bars(data, categories=categories)
+            cache.set(key, image, settings.CHART_CACHE_TTL)
+            logger.info(f"Chart {name} rendered, {len(image)} bytes")
+        return image
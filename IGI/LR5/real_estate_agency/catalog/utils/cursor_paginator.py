@@ -0,0 +1,117 @@
+import base64
+import binascii
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+
+class CursorPage(object):
+    def __init__(self, paginator, object_list, next_cursor, previous_cursor):
+        self.paginator = paginator
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator(object):
+    """Keyset pagination over ``(ordering field, id)``.
+
+    ``ordering`` is a single field name, optionally prefixed with ``-``;
+    ``id`` breaks ties in the same direction. Cursors are opaque urlsafe
+    strings, and ``count`` is cached instead of computed per page.
+    """
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.descending = ordering.startswith("-")
+        self.field = ordering.lstrip("-")
+
+    def _order(self, reverse=False):
+        prefix = "-" if self.descending != reverse else ""
+        return [f"{prefix}{self.field}", f"{prefix}id"]
+
+    def _after(self, value, pk, reverse=False):
+        lookup = "lt" if self.descending != reverse else "gt"
+        return Q(**{f"{self.field}__{lookup}": value}) | Q(
+            **{self.field: value, f"id__{lookup}": pk}
+        )
+
+    def _encode(self, obj, direction):
+        payload = json.dumps([direction, str(getattr(obj, self.field)), obj.pk])
+        return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+    def _decode(self, cursor):
+        try:
+            direction, value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            field = self.queryset.model._meta.get_field(self.field)
+            value = field.to_python(value)
+            if direction not in ("n", "p") or value is None:
+                raise ValueError("Unexpected cursor content")
+            return direction, value, int(pk)
+        except (binascii.Error, UnicodeError, ValueError, TypeError, ValidationError):
+            raise InvalidPage(f"Invalid cursor: {cursor}")
+
+    def page(self, cursor=None):
+        reverse = False
+        queryset = self.queryset
+        if cursor:
+            direction, value, pk = self._decode(cursor)
+            reverse = direction == "p"
+            queryset = queryset.filter(self._after(value, pk, reverse))
+
+        rows = list(queryset.order_by(*self._order(reverse))[: self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if reverse:
+            rows.reverse()
+
+        if not rows:
+            return CursorPage(self, rows, None, None)
+
+        if reverse:
+            next_cursor = self._encode(rows[-1], "n")
+            previous_cursor = self._encode(rows[0], "p") if has_more else None
+        else:
+            next_cursor = self._encode(rows[-1], "n") if has_more else None
+            previous_cursor = self._encode(rows[0], "p") if cursor else None
+        return CursorPage(self, rows, next_cursor, previous_cursor)
+
+    @property
+    def count(self):
+        """Total number of rows, cached for ``ESTATE_COUNT_CACHE_TTL``."""
+        try:
+            sql = str(self.queryset.query)
+        except EmptyResultSet:
+            return 0
+        digest = hashlib.sha1(sql.encode("utf-8")).hexdigest()
+        key = f"cursor_count:{digest}"
+        count = cache.get(key)
+        if count is None:
+            count = self.queryset.count()
+            cache.set(key, count, settings.ESTATE_COUNT_CACHE_TTL)
+            logger.debug(f"Counted {count} rows for {key}")
+        return count
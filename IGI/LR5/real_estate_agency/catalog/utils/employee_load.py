@@ -0,0 +1,118 @@
+import logging
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Value, When
+from users.models import Employee
+
+from ..models import PurchaseRequest
+from .assignment_strategies import AssignmentStrategy
+from .employee_load_index import EmployeeLoadIndex
+
+logger = logging.getLogger(__name__)
+
+
+class EmployeeLoad(object):
+    """Maintains ``Employee.active_request_count`` and assigns requests.
+
+    The employee is picked by an ``AssignmentStrategy`` from the in-memory
+    ``EmployeeLoadIndex`` and claimed with a compare-and-swap UPDATE on the
+    counter, so a worker with an outdated index can not hand out a slot it
+    has not seen; the index is reloaded and the choice retried instead.
+    """
+
+    MAX_CLAIM_ATTEMPTS = 10
+
+    @staticmethod
+    def is_active(status):
+        return status in PurchaseRequest.ACTIVE_STATUSES
+
+    @staticmethod
+    def claim(employee_id, expected):
+        """Increment the counter if it still equals ``expected``."""
+        claimed = Employee.objects.filter(
+            pk=employee_id, active_request_count=expected
+        ).update(active_request_count=F("active_request_count") + 1)
+        if claimed:
+            EmployeeLoadIndex.adjust(employee_id, 1)
+        return bool(claimed)
+
+    @staticmethod
+    def assign(client_id=None, strategy=None):
+        """Return the id of the chosen employee with its counter already
+        incremented, or None when there is nobody to assign."""
+        strategy = strategy or AssignmentStrategy.get()
+        index = EmployeeLoadIndex.get()
+        for _ in range(EmployeeLoad.MAX_CLAIM_ATTEMPTS):
+            employee_id = strategy.choose(index, client_id)
+            if employee_id is None:
+                return None
+
+            if EmployeeLoad.claim(employee_id, index.loads[employee_id]):
+                logger.debug(f"Employee {employee_id} assigned by {strategy.name}")
+                return employee_id
+            logger.debug(f"Load of employee {employee_id} is outdated, reloading")
+            index = EmployeeLoadIndex.reload()
+
+        raise RuntimeError("Could not claim an employee, too much contention")
+
+    @staticmethod
+    def apply(employee_id, delta):
+        if employee_id and delta:
+            Employee.objects.filter(pk=employee_id).update(
+                active_request_count=F("active_request_count") + delta
+            )
+            EmployeeLoadIndex.adjust(employee_id, delta)
+
+    @staticmethod
+    def apply_many(deltas):
+        """Apply ``{employee_id: delta}`` in a single UPDATE."""
+        deltas = {pk: delta for pk, delta in deltas.items() if pk and delta}
+        if not deltas:
+            return
+        Employee.objects.filter(pk__in=deltas).update(
+            active_request_count=F("active_request_count")
+            + Case(
+                *[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()],
+                output_field=IntegerField(),
+            )
+        )
+        for pk, delta in deltas.items():
+            EmployeeLoadIndex.adjust(pk, delta)
+
+    @staticmethod
+    def transition(old, new):
+        """Move one unit of load between ``(employee_id, status)`` states;
+        ``old`` is None for new requests and ``new`` for deleted ones."""
+        old_key = old if old and EmployeeLoad.is_active(old[1]) and old[0] else None
+        new_key = new if new and EmployeeLoad.is_active(new[1]) and new[0] else None
+        if old_key and new_key and old_key[0] == new_key[0]:
+            return
+        if old_key:
+            EmployeeLoad.apply(old_key[0], -1)
+        if new_key:
+            EmployeeLoad.apply(new_key[0], 1)
+
+    @staticmethod
+    def compute():
+        return dict(
+            Employee.objects.annotate(
+                load=Count(
+                    "purchaserequest",
+                    filter=Q(purchaserequest__status__in=PurchaseRequest.ACTIVE_STATUSES),
+                )
+            ).values_list("id", "load")
+        )
+
+    @staticmethod
+    def rebuild():
+        """Recompute every counter from the purchase requests."""
+        with transaction.atomic():
+            loads = EmployeeLoad.compute()
+            employees = list(Employee.objects.only("id", "active_request_count"))
+            changed = [e for e in employees if e.active_request_count != loads[e.id]]
+            for employee in changed:
+                employee.active_request_count = loads[employee.id]
+            Employee.objects.bulk_update(changed, ["active_request_count"])
+        EmployeeLoadIndex.invalidate()
+        logger.info(f"Employee load rebuilt, {len(changed)} counter(s) corrected")
+        return len(changed)
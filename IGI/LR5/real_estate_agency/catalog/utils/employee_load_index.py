@@ -0,0 +1,127 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from users.models import Employee
+
+logger = logging.getLogger(__name__)
+
+
+class EmployeeLoadIndex(object):
+    """Process-local copy of employee loads, capacities and client links.
+
+    Assignment strategies pick employees from the index without querying
+    the database. Loads are adjusted in place whenever this process changes
+    a counter; changes made by other workers are noticed when a claim
+    against the expected load fails, which reloads the index. Employee and
+    client link changes bump a version key in the ``COORDINATION_CACHE_ALIAS``
+    cache, checked at most every ``EMPLOYEE_LOAD_INDEX_CHECK_INTERVAL``
+    seconds; an index older than ``EMPLOYEE_LOAD_INDEX_MAX_AGE`` is reloaded
+    in any case.
+    """
+
+    KEY = "employee_load_index:version"
+
+    _lock = threading.Lock()
+    _current = None
+    _checked_at = 0.0
+
+    def __init__(self, version, employees, clients):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.employee_ids = sorted(employees)
+        self.loads = {pk: load for pk, (load, _) in employees.items()}
+        self.capacities = {pk: capacity for pk, (_, capacity) in employees.items()}
+        self.clients = clients
+
+    def employees_of(self, client_id):
+        return self.clients.get(client_id, [])
+
+    @staticmethod
+    def _cache():
+        return caches[settings.COORDINATION_CACHE_ALIAS]
+
+    @staticmethod
+    def _shared_version():
+        cache = EmployeeLoadIndex._cache()
+        version = cache.get(EmployeeLoadIndex.KEY)
+        if version is None:
+            cache.add(EmployeeLoadIndex.KEY, int(time.time() * 1000), None)
+            version = cache.get(EmployeeLoadIndex.KEY)
+        return version
+
+    @classmethod
+    def _load(cls, version):
+        employees = {
+            pk: (load, capacity)
+            for pk, load, capacity in Employee.objects.values_list(
+                "id", "active_request_count", "capacity"
+            )
+        }
+        clients = {}
+        for employee_id, client_id in Employee.clients.through.objects.order_by(
+            "employee_id"
+        ).values_list("employee_id", "client_id"):
+            clients.setdefault(client_id, []).append(employee_id)
+        logger.debug(
+            f"Employee load index v{version} loaded: {len(employees)} employees, "
+            f"{len(clients)} clients"
+        )
+        return cls(version, employees, clients)
+
+    @classmethod
+    def get(cls):
+        with cls._lock:
+            index = cls._current
+            fresh = (
+                time.monotonic() - cls._checked_at
+                < settings.EMPLOYEE_LOAD_INDEX_CHECK_INTERVAL
+            )
+        if index is not None and fresh:
+            return index
+
+        version = cls._shared_version()
+        if (
+            index is None
+            or index.version != version
+            or time.monotonic() - index.loaded_at > settings.EMPLOYEE_LOAD_INDEX_MAX_AGE
+        ):
+            index = cls._load(version)
+        with cls._lock:
+            cls._current = index
+            cls._checked_at = time.monotonic()
+        return index
+
+    @classmethod
+    def reload(cls):
+        """Replace the local index with a fresh copy of the database."""
+        index = cls._load(cls._shared_version())
+        with cls._lock:
+            cls._current = index
+            cls._checked_at = time.monotonic()
+        return index
+
+    @classmethod
+    def adjust(cls, employee_id, delta):
+        with cls._lock:
+            index = cls._current
+            if index is not None and employee_id in index.loads:
+                index.loads[employee_id] += delta
+
+    @classmethod
+    def invalidate(cls):
+        """Drop the local index and make other workers reload theirs."""
+        try:
+            cls._cache().incr(cls.KEY)
+        except ValueError:
+            cls._shared_version()
+        cls.clear_local()
+        logger.debug("Employee load index invalidated")
+
+    @classmethod
+    def clear_local(cls):
+        with cls._lock:
+            cls._current = None
+            cls._checked_at = 0.0
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import logging
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, Count, IntegerField, When
+
+from ..models import Estate
+from .catalog_version import CatalogVersion
+
+logger = logging.getLogger(__name__)
+
+
+class EstateFacets(object):
+    """Estate counts per service, service category and price bucket.
+
+    All three come from one grouped query over the filtered queryset and
+    are cached per normalized filter set and ``CatalogVersion``.
+    """
+
+    FILTERS = (
+        "search",
+        "category",
+        "service_category",
+        "min_price",
+        "max_price",
+        "bbox",
+        "lat",
+        "lng",
+        "radius",
+    )
+    PRICE_FILTERS = ("min_price", "max_price")
+
+    @staticmethod
+    def normalize(params, names=FILTERS):
+        """Return the non-empty filters as sorted ``(name, value)`` pairs."""
+        normalized = []
+        for name in sorted(names):
+            value = " ".join(str(params.get(name) or "").split())
+            if not value:
+                continue
+            if name == "search":
+                value = value.lower()
+            elif name in EstateFacets.PRICE_FILTERS:
+                try:
+                    value = str(Decimal(value).quantize(Decimal("0.01")))
+                except InvalidOperation:
+                    pass
+            normalized.append((name, value))
+        return normalized
+
+    @staticmethod
+    def price_buckets():
+        """``(index, lower, upper)`` for every bucket; bounds may be None."""
+        bounds = [None] + list(settings.ESTATE_PRICE_BUCKETS) + [None]
+        return [
+            (index, lower, upper)
+            for index, (lower, upper) in enumerate(zip(bounds, bounds[1:]))
+        ]
+
+    @staticmethod
+    def bucket_filters(lower, upper):
+        """``min_price``/``max_price`` selecting exactly one bucket.
+
+        Buckets hold ``lower <= cost < upper`` while ``max_price`` is
+        inclusive, so the upper bound is moved one cent down.
+        """
+        filters = {}
+        if lower is not None:
+            filters["min_price"] = lower
+        if upper is not None:
+            step = Decimal(1).scaleb(-Estate._meta.get_field("cost").decimal_places)
+            filters["max_price"] = Decimal(upper) - step
+        return filters
+
+    @staticmethod
+    def compute(queryset):
+        buckets = EstateFacets.price_buckets()
+        price_bucket = Case(
+            *[When(cost__lt=upper, then=index) for index, _, upper in buckets[:-1]],
+            default=buckets[-1][0],
+            output_field=IntegerField(),
+        )
+        rows = (
+            queryset.order_by()
+            .annotate(price_bucket=price_bucket)
+            .values_list("category_id", "category__category_id", "price_bucket")
+            .annotate(count=Count("id"))
+        )
+
+        facets = {"categories": {}, "service_categories": {}, "prices": {}}
+        for category_id, service_category_id, bucket, count in rows:
+            for name, key in (
+                ("categories", category_id),
+                ("service_categories", service_category_id),
+                ("prices", bucket),
+            ):
+                if key is not None:
+                    facets[name][key] = facets[name].get(key, 0) + count
+        return facets
+
+    @staticmethod
+    def get(queryset, params):
+        filters = json.dumps(EstateFacets.normalize(params), ensure_ascii=False)
+        digest = hashlib.sha1(filters.encode("utf-8")).hexdigest()
+        key = f"facets:{CatalogVersion.get()}:{digest}"
+
+        facets = cache.get(key)
+        if facets is None:
+            facets = EstateFacets.compute(queryset)
+            cache.set(key, facets, settings.ESTATE_FACETS_CACHE_TTL)
+            logger.debug(f"Facets computed for {filters}")
+        return facets
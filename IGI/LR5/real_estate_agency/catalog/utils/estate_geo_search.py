@@ -0,0 +1,94 @@
+import logging
+import math
+
+from django.conf import settings
+from django.db.models import ExpressionWrapper, F, FloatField, Q, Value
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+from .geohash import Geohash
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+class EstateGeoSearch(object):
+    """Bounding-box and radius filters over geocoded estates.
+
+    Candidates are narrowed with range scans on the indexed
+    ``Estate.geohash`` prefixes covering the area; exact coordinate and
+    distance checks run on those candidates only.
+    """
+
+    @staticmethod
+    def parse_bbox(value):
+        """``west,south,east,north`` -> tuple of floats, or None."""
+        try:
+            west, south, east, north = (float(part) for part in value.split(","))
+        except (AttributeError, ValueError):
+            return None
+        if not (-90 <= south <= north <= 90 and -180 <= west <= east <= 180):
+            return None
+        return west, south, east, north
+
+    @staticmethod
+    def parse_point(lat, lng, radius):
+        """Return ``(lat, lng, radius_km)`` of valid input, or None."""
+        try:
+            lat, lng, radius = float(lat), float(lng), float(radius)
+        except (TypeError, ValueError):
+            return None
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180 and 0 < radius):
+            return None
+        return lat, lng, min(radius, settings.GEO_SEARCH_MAX_RADIUS_KM)
+
+    @staticmethod
+    def _prefix_filter(south, west, north, east):
+        prefixes = Geohash.covering(
+            south,
+            west,
+            north,
+            east,
+            max_precision=settings.ESTATE_GEOHASH_PRECISION,
+            max_cells=settings.GEO_SEARCH_MAX_CELLS,
+        )
+        logger.debug(f"Box {south},{west},{north},{east} covered by {prefixes}")
+        condition = Q()
+        for prefix in prefixes:
+            cell = Q(geohash__gte=prefix)
+            end = Geohash.prefix_end(prefix)
+            if end:
+                cell &= Q(geohash__lt=end)
+            condition |= cell
+        return condition
+
+    @staticmethod
+    def in_bbox(queryset, west, south, east, north):
+        return queryset.filter(
+            EstateGeoSearch._prefix_filter(south, west, north, east),
+            lat__range=(south, north),
+            lng__range=(west, east),
+        )
+
+    @staticmethod
+    def within(queryset, lat, lng, radius_km):
+        """Estates within ``radius_km`` of the point, annotated with
+        ``distance`` in kilometres."""
+        lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+        cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+        lng_delta = min(lat_delta / cos_lat, 180)
+        queryset = EstateGeoSearch.in_bbox(
+            queryset,
+            max(lng - lng_delta, -180),
+            max(lat - lat_delta, -90),
+            min(lng + lng_delta, 180),
+            min(lat + lat_delta, 90),
+        )
+
+        half_chord = Power(Sin(Radians(F("lat") - lat) / 2), 2) + Value(
+            math.cos(math.radians(lat))
+        ) * Cos(Radians(F("lat"))) * Power(Sin(Radians(F("lng") - lng) / 2), 2)
+        distance = ExpressionWrapper(
+            2 * EARTH_RADIUS_KM * ASin(Sqrt(half_chord)), output_field=FloatField()
+        )
+        return queryset.annotate(distance=distance).filter(distance__lte=radius_km)
@@ -0,0 +1,57 @@
+import logging
+
+from django.utils import timezone
+
+from ..models import Estate
+from .catalog_version import CatalogVersion
+from .mapbox_client import MapboxClient
+
+logger = logging.getLogger(__name__)
+
+
+class EstateGeocoder(object):
+    """Fills ``Estate.lat``/``Estate.lng`` outside of the request cycle.
+
+    Estates with an empty ``geocoded_at`` form the job queue: they are
+    created that way and are reset back into it whenever the address changes.
+    """
+
+    @staticmethod
+    def pending():
+        return Estate.objects.filter(geocoded_at__isnull=True).order_by("id")
+
+    @staticmethod
+    def geocode_estate(estate_id, address):
+        resolved, coordinates = MapboxClient.lookup(address)
+        if not resolved:
+            logger.warning(f"Geocoding of estate {estate_id} postponed")
+            return False
+
+        lng, lat = coordinates or (None, None)
+        # The address guard keeps a concurrent address edit queued.
+        updated = Estate.objects.filter(
+            pk=estate_id, address=address, geocoded_at__isnull=True
+        ).update(
+            lat=lat,
+            lng=lng,
+            geohash=Estate.make_geohash(lat, lng),
+            geocoded_at=timezone.now(),
+            similar_refreshed_at=None,
+        )
+        if not updated:
+            return False
+
+        # update() sends no signals, so cached catalogue pages are dropped here.
+        CatalogVersion.bump()
+        logger.info(f"Estate {estate_id} geocoded: lng={lng}, lat={lat}")
+        return True
+
+    @staticmethod
+    def process_pending(limit=100):
+        jobs = list(EstateGeocoder.pending().values_list("id", "address")[:limit])
+        logger.debug(f"Processing {len(jobs)} pending geocoding jobs")
+
+        return sum(
+            EstateGeocoder.geocode_estate(estate_id, address)
+            for estate_id, address in jobs
+        )
@@ -0,0 +1,66 @@
+import logging
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+
+from ..models import Estate, PurchaseRequest, Sale
+from .employee_load import EmployeeLoad
+
+logger = logging.getLogger(__name__)
+
+
+class EstateUnavailableError(Exception):
+    """Raised when the estate was sold or the request closed concurrently."""
+
+
+class EstatePurchase(object):
+    """Turns a purchase request into a sale in one transaction.
+
+    The estate is claimed with a conditional UPDATE of its availability
+    flag, which locks that row only until commit; a competing buyer finds
+    the flag already cleared and gets ``EstateUnavailableError`` instead of
+    hitting the unique constraint on ``Sale.estate``.
+    """
+
+    @staticmethod
+    def buy(purchase_request):
+        estate_id = purchase_request.estate_id
+        try:
+            with transaction.atomic():
+                claimed = Estate.objects.filter(pk=estate_id, is_available=True).update(
+                    is_available=False
+                )
+                if not claimed:
+                    raise EstateUnavailableError(f"Estate {estate_id} is already sold")
+
+                open_requests = dict(
+                    PurchaseRequest.objects.filter(
+                        estate_id=estate_id, status__in=PurchaseRequest.ACTIVE_STATUSES
+                    ).values_list("id", "employee_id")
+                )
+                if purchase_request.pk not in open_requests:
+                    raise EstateUnavailableError(
+                        f"PurchaseRequest {purchase_request.pk} is no longer open"
+                    )
+
+                sale = Sale.objects.create(
+                    client_id=purchase_request.client_id,
+                    employee_id=purchase_request.employee_id,
+                    estate_id=estate_id,
+                )
+                # Closes the buyer's request and the competing ones at once.
+                PurchaseRequest.objects.filter(pk__in=open_requests).update(
+                    status="completed"
+                )
+                EmployeeLoad.apply_many(
+                    {pk: -count for pk, count in Counter(open_requests.values()).items()}
+                )
+        except IntegrityError:
+            raise EstateUnavailableError(f"Estate {estate_id} is already sold")
+
+        purchase_request.status = "completed"
+        logger.info(
+            f"Estate {estate_id} sold as sale {sale.pk}, "
+            f"{len(open_requests)} purchase request(s) closed"
+        )
+        return sale
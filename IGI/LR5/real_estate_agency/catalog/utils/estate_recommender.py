@@ -0,0 +1,207 @@
+import logging
+import math
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from ..models import Estate, SimilarEstate
+
+logger = logging.getLogger(__name__)
+
+
+class EstateRecommender(object):
+    """Precomputed "similar estates" for every available estate.
+
+    Estates are compared on standardized log cost, log area, location and a
+    one-hot service category. Estates with an empty
+    ``similar_refreshed_at`` form the job queue, like geocoding: they are
+    refreshed in batches by the ``refresh_similar_estates`` command, never
+    while serving a request.
+    """
+
+    WEIGHTS = {"cost": 1.0, "area": 1.0, "location": 1.5, "category": 1.0}
+
+    @staticmethod
+    def features(rows):
+        """Feature matrix for ``(id, cost, area, category_id, lat, lng)`` rows."""
+        weights = EstateRecommender.WEIGHTS
+        if not rows:
+            return np.zeros((0, 4))
+        numeric = np.array(
+            [
+                [
+                    math.log1p(float(cost)),
+                    math.log1p(float(area)),
+                    np.nan if lat is None else lat,
+                    np.nan if lng is None else lng,
+                ]
+                for _, cost, area, _, lat, lng in rows
+            ],
+            dtype=float,
+        )
+
+        # Estates that are not geocoded yet sit at the average location.
+        known = (~np.isnan(numeric)).sum(axis=0)
+        means = np.nansum(numeric, axis=0) / np.maximum(known, 1)
+        numeric = np.where(np.isnan(numeric), means, numeric)
+        std = numeric.std(axis=0)
+        numeric = (numeric - numeric.mean(axis=0)) / np.where(std > 0, std, 1)
+        numeric *= [
+            weights["cost"],
+            weights["area"],
+            weights["location"],
+            weights["location"],
+        ]
+
+        categories = sorted({row[3] for row in rows if row[3] is not None})
+        columns = {category: i for i, category in enumerate(categories)}
+        one_hot = np.zeros((len(rows), len(categories)))
+        for i, row in enumerate(rows):
+            if row[3] is not None:
+                one_hot[i, columns[row[3]]] = weights["category"]
+        return np.hstack([numeric, one_hot])
+
+    @staticmethod
+    def _load():
+        rows = list(
+            Estate.objects.filter(is_available=True)
+            .order_by("id")
+            .values_list("id", "cost", "area", "category_id", "lat", "lng")
+        )
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        return ids, EstateRecommender.features(rows)
+
+    @staticmethod
+    def _distances(matrix, positions):
+        """Euclidean distances from the rows at ``positions`` to all rows."""
+        selected = matrix[positions]
+        squared = (
+            (selected ** 2).sum(axis=1)[:, None]
+            + (matrix ** 2).sum(axis=1)[None, :]
+            - 2 * selected @ matrix.T
+        )
+        distances = np.sqrt(np.maximum(squared, 0))
+        distances[np.arange(len(positions)), positions] = np.inf
+        return distances
+
+    @staticmethod
+    def _neighbours(ids, distances, k):
+        k = min(k, len(ids) - 1)
+        if k <= 0:
+            return [[] for _ in distances]
+        nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        result = []
+        for row, candidates in zip(distances, nearest):
+            ordered = candidates[np.argsort(row[candidates], kind="stable")]
+            result.append([(int(ids[i]), float(row[i])) for i in ordered])
+        return result
+
+    @staticmethod
+    def _store(ids, positions, neighbours):
+        estate_ids = [int(ids[p]) for p in positions]
+        links = [
+            SimilarEstate(
+                estate_id=estate_id, similar_id=similar_id, rank=rank, distance=distance
+            )
+            for estate_id, estate_neighbours in zip(estate_ids, neighbours)
+            for rank, (similar_id, distance) in enumerate(estate_neighbours)
+        ]
+        with transaction.atomic():
+            SimilarEstate.objects.filter(estate_id__in=estate_ids).delete()
+            SimilarEstate.objects.bulk_create(links)
+            Estate.objects.filter(id__in=estate_ids).update(
+                similar_refreshed_at=timezone.now()
+            )
+
+    @staticmethod
+    def _refresh_positions(ids, matrix, positions):
+        k = settings.SIMILAR_ESTATES_COUNT
+        batch_size = settings.SIMILAR_ESTATES_BATCH_SIZE
+        for start in range(0, len(positions), batch_size):
+            batch = positions[start:start + batch_size]
+            neighbours = EstateRecommender._neighbours(
+                ids, EstateRecommender._distances(matrix, batch), k
+            )
+            EstateRecommender._store(ids, batch, neighbours)
+
+    @staticmethod
+    def rebuild():
+        """Recompute the neighbours of every available estate."""
+        ids, matrix = EstateRecommender._load()
+        SimilarEstate.objects.exclude(estate_id__in=ids.tolist()).delete()
+        EstateRecommender._refresh_positions(ids, matrix, np.arange(len(ids)))
+        logger.info(f"Similar estates rebuilt for {len(ids)} estates")
+        return len(ids)
+
+    @staticmethod
+    def pending():
+        return Estate.objects.filter(
+            is_available=True, similar_refreshed_at__isnull=True
+        ).order_by("id")
+
+    @staticmethod
+    def process_pending(limit=100):
+        pending = list(EstateRecommender.pending().values_list("id", flat=True)[:limit])
+        if not pending:
+            return 0
+
+        ids, matrix = EstateRecommender._load()
+        position_of = {int(estate_id): i for i, estate_id in enumerate(ids)}
+        positions = np.array(
+            [position_of[i] for i in pending if i in position_of], dtype=np.int64
+        )
+
+        # Queued estates may now be closer to others than their current
+        # worst neighbour; those lists are refreshed in the same pass.
+        k = min(settings.SIMILAR_ESTATES_COUNT, len(ids) - 1)
+        stored = {
+            estate_id: (count, worst)
+            for estate_id, count, worst in SimilarEstate.objects.values("estate_id")
+            .annotate(count=Count("id"), worst=Max("distance"))
+            .values_list("estate_id", "count", "worst")
+        }
+        worst = np.array(
+            [
+                stored[i][1] if i in stored and stored[i][0] >= k else np.inf
+                for i in ids.tolist()
+            ]
+        )
+        closest = EstateRecommender._distances(matrix, positions).min(axis=0)
+        affected = np.union1d(positions, np.flatnonzero(closest < worst))
+
+        EstateRecommender._refresh_positions(ids, matrix, affected)
+        logger.info(
+            f"Similar estates refreshed for {len(positions)} queued and "
+            f"{len(affected) - len(positions)} affected estates"
+        )
+        return len(pending)
+
+    @staticmethod
+    def requeue(estate_id):
+        Estate.objects.filter(pk=estate_id).update(similar_refreshed_at=None)
+
+    @staticmethod
+    def withdraw(estate_id):
+        """Drop an estate that is no longer offered from every list and
+        queue the estates that recommended it."""
+        with transaction.atomic():
+            referring = SimilarEstate.objects.filter(similar_id=estate_id).values("estate_id")
+            Estate.objects.filter(id__in=referring).update(similar_refreshed_at=None)
+            SimilarEstate.objects.filter(similar_id=estate_id).delete()
+            SimilarEstate.objects.filter(estate_id=estate_id).delete()
+        logger.debug(f"Estate {estate_id} withdrawn from recommendations")
+
+    @staticmethod
+    def similar_to(estate):
+        """The stored neighbours of ``estate`` in one query."""
+        return [
+            link.similar
+            for link in SimilarEstate.objects.filter(
+                estate=estate, similar__is_available=True
+            )
+            .select_related("similar__category__category")
+            .order_by("rank")
+        ]
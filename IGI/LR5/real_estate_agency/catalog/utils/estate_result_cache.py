@@ -0,0 +1,70 @@
+import hashlib
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .catalog_version import CatalogVersion
+from .estate_facets import EstateFacets
+
+logger = logging.getLogger(__name__)
+
+
+class EstateResultCache(object):
+    """Estate list pages cached as ``(ids, total count)``.
+
+    Keys are built from the normalized filters, the effective ordering and
+    the page number, and embed ``CatalogVersion`` so any estate or sale
+    change invalidates every cached page.
+    """
+
+    _lock = threading.Lock()
+    _stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def key(params, ordering, page):
+        canonical = EstateFacets.normalize(params) + [("ordering", ordering)]
+        if str(page) not in ("", "1"):
+            canonical.append(("page", str(page)))
+        payload = json.dumps(canonical, ensure_ascii=False)
+        digest = hashlib.sha1(payload.encode("utf-8")).hexdigest()
+        return f"estate_results:{CatalogVersion.get()}:{digest}"
+
+    @classmethod
+    def _count(cls, name):
+        with cls._lock:
+            cls._stats[name] += 1
+
+    @classmethod
+    def get(cls, key):
+        """Return ``(ids, count)`` or None."""
+        entry = cache.get(key)
+        cls._count("hits" if entry is not None else "misses")
+        return entry
+
+    @staticmethod
+    def set(key, ids, count):
+        cache.set(key, (list(ids), count), settings.ESTATE_RESULT_CACHE_TTL)
+        logger.debug(f"Cached {len(ids)} estate ids under {key}")
+
+    @staticmethod
+    def hydrate(queryset, ids):
+        """Load ``ids`` with one query, preserving their order."""
+        objects = queryset.order_by().in_bulk(ids)
+        return [objects[pk] for pk in ids if pk in objects]
+
+    @classmethod
+    def get_stats(cls):
+        with cls._lock:
+            stats = dict(cls._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    @classmethod
+    def reset_stats(cls):
+        with cls._lock:
+            for name in cls._stats:
+                cls._stats[name] = 0
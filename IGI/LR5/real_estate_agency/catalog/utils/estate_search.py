@@ -0,0 +1,190 @@
+import logging
+import re
+
+from django.db import connections, router
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+logger = logging.getLogger(__name__)
+
+
+class EstateSearch(object):
+    """Full-text search over estate address, description and service name.
+
+    On SQLite the text lives in an FTS5 table kept in sync by triggers on
+    ``catalog_estate`` and ``catalog_service``; matches are ranked with
+    bm25. Other backends fall back to ``icontains`` filtering.
+    """
+
+    TABLE = "catalog_estate_fts"
+
+    SCHEMA = [
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(
+            address, description, category_name,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {TABLE}_ai AFTER INSERT ON catalog_estate
+        BEGIN
+            INSERT INTO {TABLE} (rowid, address, description, category_name)
+            VALUES (
+                new.id, new.address, new.description,
+                COALESCE((SELECT name FROM catalog_service WHERE id = new.category_id), '')
+            );
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {TABLE}_au
+        AFTER UPDATE OF address, description, category_id ON catalog_estate
+        BEGIN
+            DELETE FROM {TABLE} WHERE rowid = old.id;
+            INSERT INTO {TABLE} (rowid, address, description, category_name)
+            VALUES (
+                new.id, new.address, new.description,
+                COALESCE((SELECT name FROM catalog_service WHERE id = new.category_id), '')
+            );
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {TABLE}_ad AFTER DELETE ON catalog_estate
+        BEGIN
+            DELETE FROM {TABLE} WHERE rowid = old.id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {TABLE}_service_au
+        AFTER UPDATE OF name ON catalog_service
+        BEGIN
+            UPDATE {TABLE} SET category_name = new.name
+            WHERE rowid IN (SELECT id FROM catalog_estate WHERE category_id = new.id);
+        END
+        """,
+    ]
+
+    _installed = set()
+
+    @staticmethod
+    def _alias():
+        from catalog.models import Estate
+
+        return router.db_for_read(Estate)
+
+    @classmethod
+    def is_supported(cls, using=None):
+        using = using or cls._alias()
+        if using in cls._installed:
+            return True
+        connection = connections[using]
+        if connection.vendor != "sqlite":
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+                [cls.TABLE],
+            )
+            found = cursor.fetchone() is not None
+        if found:
+            cls._installed.add(using)
+        return found
+
+    @classmethod
+    def install(cls, using="default"):
+        """Create the index and its triggers; safe to call repeatedly."""
+        connection = connections[using]
+        if connection.vendor != "sqlite":
+            return False
+
+        existed = cls.is_supported(using)
+        with connection.cursor() as cursor:
+            for statement in cls.SCHEMA:
+                cursor.execute(statement)
+        cls._installed.add(using)
+        if not existed:
+            cls.rebuild(using)
+            logger.info(f"Created full-text index {cls.TABLE} on {using}")
+        return True
+
+    @classmethod
+    def rebuild(cls, using="default"):
+        """Refill the index from ``catalog_estate``."""
+        with connections[using].cursor() as cursor:
+            cursor.execute(f"DELETE FROM {cls.TABLE}")
+            cursor.execute(
+                f"""
+                INSERT INTO {cls.TABLE} (rowid, address, description, category_name)
+                SELECT e.id, e.address, e.description, COALESCE(s.name, '')
+                FROM catalog_estate e
+                LEFT JOIN catalog_service s ON s.id = e.category_id
+                """
+            )
+            cursor.execute(f"SELECT count(*) FROM {cls.TABLE}")
+            count = cursor.fetchone()[0]
+        logger.info(f"Full-text index {cls.TABLE} rebuilt with {count} estates")
+        return count
+
+    @staticmethod
+    def match_expression(query):
+        """Turn user input into an FTS5 query of quoted prefix terms."""
+        tokens = re.findall(r"\w+", query or "")
+        return " ".join(f'"{token}"*' for token in tokens)
+
+    @classmethod
+    def ranked_ids(cls, query, limit=None, using=None):
+        """Matching ids by relevance, regardless of availability."""
+        expression = cls.match_expression(query)
+        if not expression:
+            return []
+        sql = (
+            f"SELECT rowid FROM {cls.TABLE} WHERE {cls.TABLE} MATCH %s "
+            f"ORDER BY bm25({cls.TABLE})"
+        )
+        params = [expression]
+        if limit:
+            sql += " LIMIT %s"
+            params.append(limit)
+        with connections[using or cls._alias()].cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+    @classmethod
+    def filter(cls, queryset, query):
+        """Return ``(queryset, ranked)``; ``ranked`` tells whether the
+        full-text index was used and ``order_by_rank`` can be applied.
+
+        The match is a subquery of the estate query, so availability and
+        the other filters apply in the same statement."""
+        if not cls.is_supported(queryset.db):
+            logger.debug("Full-text index unavailable, searching with icontains")
+            return queryset.filter(
+                Q(address__icontains=query)
+                | Q(description__icontains=query)
+                | Q(category__name__icontains=query)
+            ), False
+
+        expression = cls.match_expression(query)
+        if not expression:
+            return queryset.none(), False
+        logger.debug(f"Full-text search for {query!r} as {expression!r}")
+        return queryset.filter(
+            id__in=RawSQL(
+                f"SELECT rowid FROM {cls.TABLE} WHERE {cls.TABLE} MATCH %s", [expression]
+            )
+        ), True
+
+    @classmethod
+    def order_by_rank(cls, queryset, query, *tiebreakers):
+        """Order by bm25 relevance, computed only for the rows that passed
+        the other filters."""
+        expression = cls.match_expression(query)
+        if not expression:
+            return queryset.order_by(*tiebreakers)
+        table = queryset.model._meta.db_table
+        rank = RawSQL(
+            f"SELECT bm25({cls.TABLE}) FROM {cls.TABLE} "
+            f'WHERE {cls.TABLE} MATCH %s AND rowid = "{table}"."id"',
+            [expression],
+            output_field=FloatField(),
+        )
+        return queryset.annotate(search_rank=rank).order_by("search_rank", *tiebreakers)
@@ -0,0 +1,118 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+
+class GeocodeCache(object):
+    """Two-tier address -> (lng, lat) cache.
+
+    The first tier is a per-process LRU, the second one is the shared
+    ``GEOCODE_CACHE_ALIAS`` Django cache. Addresses that Mapbox could not
+    resolve are cached as an empty tuple with a shorter TTL.
+    """
+
+    _lock = threading.Lock()
+    _local = OrderedDict()
+    _stats = {"local_hits": 0, "shared_hits": 0, "misses": 0}
+
+    @staticmethod
+    def normalize(address):
+        return " ".join(str(address).lower().split())
+
+    @staticmethod
+    def _key(address):
+        digest = hashlib.sha1(
+            GeocodeCache.normalize(address).encode("utf-8")
+        ).hexdigest()
+        return f"geocode:{digest}"
+
+    @staticmethod
+    def _shared():
+        return caches[settings.GEOCODE_CACHE_ALIAS]
+
+    @classmethod
+    def _count(cls, name):
+        with cls._lock:
+            cls._stats[name] += 1
+
+    @classmethod
+    def _remember_locally(cls, key, coordinates, ttl):
+        with cls._lock:
+            cls._local[key] = (time.monotonic() + ttl, coordinates)
+            cls._local.move_to_end(key)
+            while len(cls._local) > settings.GEOCODE_CACHE_LOCAL_SIZE:
+                cls._local.popitem(last=False)
+
+    @classmethod
+    def get(cls, address):
+        """Return ``(found, coordinates)``; ``coordinates`` is None for
+        addresses cached as not found."""
+        key = cls._key(address)
+
+        with cls._lock:
+            entry = cls._local.get(key)
+            if entry and entry[0] > time.monotonic():
+                cls._local.move_to_end(key)
+                cls._stats["local_hits"] += 1
+                return True, entry[1] or None
+            cls._local.pop(key, None)
+
+        coordinates = cls._shared().get(key)
+        if coordinates is not None:
+            cls._count("shared_hits")
+            cls._remember_locally(key, coordinates, cls._ttl(coordinates))
+            return True, tuple(coordinates) or None
+
+        cls._count("misses")
+        return False, None
+
+    @staticmethod
+    def _ttl(coordinates):
+        if coordinates:
+            return settings.GEOCODE_CACHE_TTL
+        return settings.GEOCODE_CACHE_NEGATIVE_TTL
+
+    @classmethod
+    def set(cls, address, coordinates):
+        key = cls._key(address)
+        coordinates = tuple(coordinates) if coordinates else ()
+        ttl = cls._ttl(coordinates)
+
+        cls._shared().set(key, coordinates, ttl)
+        cls._remember_locally(key, coordinates, ttl)
+        logger.debug(f"Geocode cached for {address}: {coordinates}")
+
+    @classmethod
+    def invalidate(cls, address):
+        key = cls._key(address)
+        with cls._lock:
+            cls._local.pop(key, None)
+        cls._shared().delete(key)
+        logger.info(f"Geocode cache invalidated for {address}")
+
+    @classmethod
+    def clear_local(cls):
+        with cls._lock:
+            cls._local.clear()
+
+    @classmethod
+    def get_stats(cls):
+        with cls._lock:
+            stats = dict(cls._stats)
+        lookups = sum(stats.values())
+        hits = stats["local_hits"] + stats["shared_hits"]
+        stats["hit_ratio"] = hits / lookups if lookups else 0.0
+        return stats
+
+    @classmethod
+    def reset_stats(cls):
+        with cls._lock:
+            for name in cls._stats:
+                cls._stats[name] = 0
@@ -0,0 +1,74 @@
+import math
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+class Geohash(object):
+    """Geohash encoding and prefix coverings of bounding boxes.
+
+    Estates sharing a prefix lie in the same cell, so a box can be searched
+    with a few index range scans on the stored hash.
+    """
+
+    @staticmethod
+    def encode(lat, lng, precision=9):
+        lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+        chars, bits, value, even = [], 0, 0, True
+        while len(chars) < precision:
+            interval, coordinate = (lng_range, lng) if even else (lat_range, lat)
+            middle = (interval[0] + interval[1]) / 2
+            value <<= 1
+            if coordinate >= middle:
+                value |= 1
+                interval[0] = middle
+            else:
+                interval[1] = middle
+            even = not even
+            bits += 1
+            if bits == 5:
+                chars.append(BASE32[value])
+                bits, value = 0, 0
+        return "".join(chars)
+
+    @staticmethod
+    def prefix_end(prefix):
+        """Smallest hash sorting after every hash starting with ``prefix``,
+        or None when there is none (a prefix of only ``z``).
+
+        Built from base32 characters alone, so the range holds under any
+        collation that orders digits before lowercase letters.
+        """
+        stripped = prefix.rstrip(BASE32[-1])
+        if not stripped:
+            return None
+        return stripped[:-1] + BASE32[BASE32.index(stripped[-1]) + 1]
+
+    @staticmethod
+    def cell_size(precision):
+        """Return ``(lat_degrees, lng_degrees)`` of a cell."""
+        bits = 5 * precision
+        return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+    @staticmethod
+    def covering(south, west, north, east, max_precision=9, max_cells=16):
+        """Prefixes of the coarsest-but-fitting cells covering the box."""
+        for precision in range(max_precision, 0, -1):
+            cell_lat, cell_lng = Geohash.cell_size(precision)
+            rows = Geohash._indexes(south, north, -90, cell_lat, 180)
+            cols = Geohash._indexes(west, east, -180, cell_lng, 360)
+            if len(rows) * len(cols) <= max_cells:
+                break
+
+        return sorted({
+            Geohash.encode(
+                -90 + (row + 0.5) * cell_lat, -180 + (col + 0.5) * cell_lng, precision
+            )
+            for row in rows
+            for col in cols
+        })
+
+    @staticmethod
+    def _indexes(low, high, origin, size, span):
+        last = math.ceil(span / size) - 1
+        first = min(max(math.floor((low - origin) / size), 0), last)
+        return range(first, min(max(math.floor((high - origin) / size), 0), last) + 1)
@@ -2,12 +2,22 @@ import requests
 import logging
 from django.conf import settings
 from urllib.parse import quote
+from real_estate_agency.http_client import OutboundHttpClient
+
+from .geocode_cache import GeocodeCache
 
 logger = logging.getLogger(__name__)
 
 class MapboxClient(object):
     @staticmethod
-    def get_map_image_url(address):
+    def lookup(address):
+        """Return ``(resolved, coordinates)``; ``resolved`` is False when
+        Mapbox could not be asked and the lookup should be retried."""
+        found, coordinates = GeocodeCache.get(address)
+        if found:
+            logger.debug(f"Geocode cache hit for {address}: {coordinates}")
+            return True, coordinates
+
         geocoding_url = settings.MAPBOX_GEOCODING_API.format(
             quote(address)
         )
@@ -19,28 +29,58 @@ class MapboxClient(object):
         }
 
         try:
-            response = requests.get(geocoding_url, params=params, timeout=5)
+            response = OutboundHttpClient.get(geocoding_url, params=params, timeout=5)
             response.raise_for_status()
             data = response.json()
 
             if not data.get('features'):
                 logger.warning(f"Address not found: {address}")
-                return settings.MAPBOX_DEFAULT_IMAGE
+                GeocodeCache.set(address, None)
+                return True, None
 
             lng, lat = data['features'][0]['geometry']['coordinates']
             logger.debug(f"lng={lng}, lat={lat}")
 
-            map_url = settings.MAPBOX_STATIC_MAP_API.format(
-                lng=lng,
-                lat=lat,
-                token=settings.MAPBOX_ACCESS_TOKEN
-            )
-            logger.info(f"Generate map URL for {address}: {map_url}")
-            return map_url
+            GeocodeCache.set(address, (lng, lat))
+            return True, (lng, lat)
 
         except requests.RequestException as e:
             logger.error(f"Error while requesting Mapbox API for address {address}: {str(e)}")
-            return settings.MAPBOX_DEFAULT_IMAGE
-        except (KeyError, IndexError) as e:
+            return False, None
+        except (KeyError, IndexError, ValueError) as e:
             logger.error(f"Error processing Mapbox API response for address {address}: {str(e)}")
+            return False, None
+
+    @staticmethod
+    def geocode(address):
+        return MapboxClient.lookup(address)[1]
+
+    @staticmethod
+    def get_static_map_url(lng, lat):
+        return settings.MAPBOX_STATIC_MAP_API.format(
+            lng=lng,
+            lat=lat,
+            token=settings.MAPBOX_ACCESS_TOKEN
+        )
+
+    @staticmethod
+    def fetch_static_map(lng, lat):
+        try:
+            response = OutboundHttpClient.get(
+                MapboxClient.get_static_map_url(lng, lat), timeout=5
+            )
+            response.raise_for_status()
+            return response.content
+        except requests.RequestException as e:
+            logger.error(f"Error while requesting static map for {lng},{lat}: {str(e)}")
+            return None
+
+    @staticmethod
+    def get_map_image_url(address):
+        coordinates = MapboxClient.geocode(address)
+        if not coordinates:
             return settings.MAPBOX_DEFAULT_IMAGE
+
+        map_url = MapboxClient.get_static_map_url(*coordinates)
+        logger.info(f"Generate map URL for {address}: {map_url}")
+        return map_url
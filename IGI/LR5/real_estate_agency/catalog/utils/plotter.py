@@ -1,25 +1,34 @@
-import matplotlib
-matplotlib.use('Agg')
-from matplotlib import pyplot as plt
+from io import BytesIO
+
+from matplotlib.figure import Figure
 
 
 class Plotter:
     @staticmethod
-    def plt_bars(data, path=None, categories=None, show=False, x_label=None, y_label=None, title=None):
-        plt.figure(figsize=(10, 6))
-        plt.bar(range(len(data)), data)
+    def bars_figure(data, categories=None, x_label=None, y_label=None, title=None):
+        # Figure objects are not registered in pyplot's global state, so
+        # several threads can render at the same time.
+        data = list(data)
+        figure = Figure(figsize=(10, 6))
+        axes = figure.subplots()
+        axes.bar(range(len(data)), data)
         if x_label:
-            plt.xlabel(x_label)
+            axes.set_xlabel(x_label)
         if y_label:
-            plt.ylabel(y_label)
+            axes.set_ylabel(y_label)
         if categories:
-            plt.xticks(range(len(data)), categories, rotation=15)
+            axes.set_xticks(range(len(data)), list(categories), rotation=15)
         if title:
-            plt.title(title)
+            axes.set_title(title)
+        return figure
 
+    @staticmethod
+    def plt_bars(data, path=None, categories=None, x_label=None, y_label=None, title=None, image_format="jpg"):
+        figure = Plotter.bars_figure(data, categories, x_label, y_label, title)
         if path:
-            plt.savefig(path)
-        if show:
-            plt.show()
+            figure.savefig(path, format=image_format)
+            return None
 
-        plt.close('all')
+        buffer = BytesIO()
+        figure.savefig(buffer, format=image_format)
+        return buffer.getvalue()
@@ -0,0 +1,39 @@
+import logging
+
+from django.db import transaction
+
+from ..models import PurchaseRequest
+from .employee_load import EmployeeLoad
+
+logger = logging.getLogger(__name__)
+
+
+class PurchaseRequestBatch(object):
+    """Status changes for many purchase requests of one employee.
+
+    Requests are moved with a single UPDATE, bypassing ``save()`` and its
+    per-row signals, and the employee's load counter is adjusted once for
+    the whole batch. Only open requests can be moved, so completed ones
+    are never reopened.
+    """
+
+    @staticmethod
+    def set_status(employee, status, request_ids=None):
+        """Move the employee's open requests (all of them when
+        ``request_ids`` is None) to ``status``; return how many moved."""
+        if status not in dict(PurchaseRequest.STATUS_CHOICES):
+            raise ValueError(f"Unknown purchase request status: {status}")
+
+        requests = PurchaseRequest.objects.filter(
+            employee=employee, status__in=PurchaseRequest.ACTIVE_STATUSES
+        ).exclude(status=status)
+        if request_ids is not None:
+            requests = requests.filter(pk__in=request_ids)
+
+        with transaction.atomic():
+            moved = requests.update(status=status)
+            if status not in PurchaseRequest.ACTIVE_STATUSES:
+                EmployeeLoad.apply_many({employee.pk: -moved})
+
+        logger.info(f"{moved} purchase request(s) of employee {employee.pk} set to {status}")
+        return moved
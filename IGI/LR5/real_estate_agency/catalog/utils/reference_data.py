@@ -0,0 +1,114 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from ..models import Service, ServiceCategory
+
+logger = logging.getLogger(__name__)
+
+
+class ReferenceData(object):
+    """Process-local copy of the ``Service`` and ``ServiceCategory`` tables.
+
+    Workers compare their snapshot with a version key in the
+    ``COORDINATION_CACHE_ALIAS`` cache at most every
+    ``REFERENCE_DATA_CHECK_INTERVAL`` seconds and reload both tables when
+    it changed, or when the snapshot is older than
+    ``REFERENCE_DATA_MAX_AGE`` in case a bump was lost. Objects in the
+    snapshot are shared between requests and must not be modified; copy
+    them before annotating.
+    """
+
+    KEY = "reference_data:version"
+
+    _lock = threading.Lock()
+    _snapshot = None
+    _checked_at = 0.0
+
+    @staticmethod
+    def _cache():
+        return caches[settings.COORDINATION_CACHE_ALIAS]
+
+    @staticmethod
+    def _shared_version():
+        cache = ReferenceData._cache()
+        version = cache.get(ReferenceData.KEY)
+        if version is None:
+            cache.add(ReferenceData.KEY, int(time.time() * 1000), None)
+            version = cache.get(ReferenceData.KEY)
+        return version
+
+    @staticmethod
+    def _load(version):
+        categories = list(ServiceCategory.objects.all())
+        categories_by_id = {category.id: category for category in categories}
+        services = list(Service.objects.all())
+        for service in services:
+            service.category = categories_by_id[service.category_id]
+        logger.info(
+            f"Reference data v{version} loaded: {len(services)} services, "
+            f"{len(categories)} service categories"
+        )
+        return {
+            "version": version,
+            "loaded_at": time.monotonic(),
+            "services": services,
+            "services_by_id": {service.id: service for service in services},
+            "service_categories": categories,
+            "service_categories_by_id": categories_by_id,
+        }
+
+    @classmethod
+    def snapshot(cls):
+        with cls._lock:
+            snapshot = cls._snapshot
+            fresh = time.monotonic() - cls._checked_at < settings.REFERENCE_DATA_CHECK_INTERVAL
+        if snapshot is not None and fresh:
+            return snapshot
+
+        version = cls._shared_version()
+        if (
+            snapshot is None
+            or snapshot["version"] != version
+            or time.monotonic() - snapshot["loaded_at"] > settings.REFERENCE_DATA_MAX_AGE
+        ):
+            snapshot = cls._load(version)
+        with cls._lock:
+            cls._snapshot = snapshot
+            cls._checked_at = time.monotonic()
+        return snapshot
+
+    @classmethod
+    def services(cls):
+        return cls.snapshot()["services"]
+
+    @classmethod
+    def service_categories(cls):
+        return cls.snapshot()["service_categories"]
+
+    @classmethod
+    def service(cls, service_id):
+        return cls.snapshot()["services_by_id"].get(service_id)
+
+    @classmethod
+    def service_category(cls, category_id):
+        return cls.snapshot()["service_categories_by_id"].get(category_id)
+
+    @classmethod
+    def invalidate(cls):
+        """Drop the local snapshot and make other workers reload theirs."""
+        try:
+            cls._cache().incr(cls.KEY)
+        except ValueError:
+            cls._shared_version()
+        cls.clear_local()
+        logger.debug("Reference data invalidated")
+
+    @classmethod
+    def clear_local(cls):
+        with cls._lock:
+            cls._snapshot = None
+            cls._checked_at = 0.0
@@ -0,0 +1,198 @@
+import logging
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import (
+    DailySalesRollup,
+    EmployeeDailySalesRollup,
+    PurchaseRequest,
+    Sale,
+    ServiceSalesRollup,
+)
+
+logger = logging.getLogger(__name__)
+
+CONTRIBUTION_FIELDS = (
+    "estate__category_id",
+    "employee_id",
+    "date_of_sale",
+    "cost",
+    "service_cost",
+)
+
+
+class SalesRollup(object):
+    """Keeps the statistics rollup tables in step with sales and requests.
+
+    A sale contributes to its service row, to its employee/day row and to
+    its day row; signal handlers apply the difference on every change and
+    ``rebuild`` recomputes every row from scratch.
+    """
+
+    @staticmethod
+    def contribution(**lookup):
+        return Sale.objects.filter(**lookup).values_list(*CONTRIBUTION_FIELDS).first()
+
+    @staticmethod
+    def _add(model, lookup, sign, **values):
+        model.objects.get_or_create(**lookup)
+        model.objects.filter(**lookup).update(
+            **{name: F(name) + sign * value for name, value in values.items()}
+        )
+
+    @staticmethod
+    def apply(contribution, sign=1):
+        if not contribution:
+            return
+
+        service_id, employee_id, date_of_sale, cost, service_cost = contribution
+        service_cost = service_cost or Decimal(0)
+
+        with transaction.atomic():
+            if service_id:
+                SalesRollup._add(
+                    ServiceSalesRollup,
+                    {"service_id": service_id},
+                    sign,
+                    sold_count=1,
+                    service_cost_sum=service_cost,
+                    full_cost_sum=cost,
+                )
+            if employee_id:
+                SalesRollup._add(
+                    EmployeeDailySalesRollup,
+                    {"employee_id": employee_id, "date": date_of_sale},
+                    sign,
+                    sale_count=1,
+                    service_cost_sum=service_cost,
+                    total_cost_sum=cost,
+                )
+            SalesRollup._add(
+                DailySalesRollup,
+                {"date": date_of_sale},
+                sign,
+                sale_count=1,
+                service_cost_sum=service_cost,
+                total_cost_sum=cost,
+            )
+        logger.debug(f"Sales rollups updated with {contribution}, sign={sign}")
+
+    @staticmethod
+    def apply_request(created_at, sign=1):
+        SalesRollup._add(
+            DailySalesRollup,
+            {"date": timezone.localdate(created_at)},
+            sign,
+            request_count=1,
+        )
+
+    @staticmethod
+    def compute():
+        services = defaultdict(lambda: [0, Decimal(0), Decimal(0)])
+        employee_days = defaultdict(lambda: [0, Decimal(0), Decimal(0)])
+        days = defaultdict(lambda: [0, Decimal(0), Decimal(0), 0])
+
+        for service_id, employee_id, date_of_sale, cost, service_cost in (
+            Sale.objects.values_list(*CONTRIBUTION_FIELDS).iterator()
+        ):
+            service_cost = service_cost or Decimal(0)
+            rows = [days[date_of_sale]]
+            if service_id:
+                rows.append(services[service_id])
+            if employee_id:
+                rows.append(employee_days[(employee_id, date_of_sale)])
+            for row in rows:
+                row[0] += 1
+                row[1] += service_cost
+                row[2] += cost
+
+        for created_at in PurchaseRequest.objects.values_list(
+            "created_at", flat=True
+        ).iterator():
+            days[timezone.localdate(created_at)][3] += 1
+
+        return services, employee_days, days
+
+    @staticmethod
+    def rebuild():
+        services, employee_days, days = SalesRollup.compute()
+
+        with transaction.atomic():
+            ServiceSalesRollup.objects.all().delete()
+            EmployeeDailySalesRollup.objects.all().delete()
+            DailySalesRollup.objects.all().delete()
+
+            ServiceSalesRollup.objects.bulk_create(
+                ServiceSalesRollup(
+                    service_id=service_id,
+                    sold_count=count,
+                    service_cost_sum=service_cost,
+                    full_cost_sum=cost,
+                )
+                for service_id, (count, service_cost, cost) in services.items()
+            )
+            EmployeeDailySalesRollup.objects.bulk_create(
+                EmployeeDailySalesRollup(
+                    employee_id=employee_id,
+                    date=date,
+                    sale_count=count,
+                    service_cost_sum=service_cost,
+                    total_cost_sum=cost,
+                )
+                for (employee_id, date), (count, service_cost, cost) in employee_days.items()
+            )
+            DailySalesRollup.objects.bulk_create(
+                DailySalesRollup(
+                    date=date,
+                    sale_count=count,
+                    service_cost_sum=service_cost,
+                    total_cost_sum=cost,
+                    request_count=requests,
+                )
+                for date, (count, service_cost, cost, requests) in days.items()
+            )
+
+        logger.info(
+            f"Sales rollups rebuilt: {len(services)} services, "
+            f"{len(employee_days)} employee days, {len(days)} days"
+        )
+
+    @staticmethod
+    def check():
+        """Return rows whose stored values differ from a fresh computation."""
+        services, employee_days, days = SalesRollup.compute()
+        expected = {}
+        for service_id, values in services.items():
+            expected[("service", service_id)] = tuple(values)
+        for key, values in employee_days.items():
+            expected[("employee_day",) + key] = tuple(values)
+        for date, values in days.items():
+            expected[("day", date)] = tuple(values)
+
+        stored = {}
+        for row in ServiceSalesRollup.objects.values_list(
+            "service_id", "sold_count", "service_cost_sum", "full_cost_sum"
+        ):
+            stored[("service", row[0])] = tuple(row[1:])
+        for row in EmployeeDailySalesRollup.objects.values_list(
+            "employee_id", "date", "sale_count", "service_cost_sum", "total_cost_sum"
+        ):
+            stored[("employee_day", row[0], row[1])] = tuple(row[2:])
+        for row in DailySalesRollup.objects.values_list(
+            "date", "sale_count", "service_cost_sum", "total_cost_sum", "request_count"
+        ):
+            stored[("day", row[0])] = tuple(row[1:])
+
+        empty_values = {0, Decimal(0)}
+        return {
+            key: (stored.get(key), expected.get(key))
+            for key in expected.keys() | stored.keys()
+            if stored.get(key) != expected.get(key)
+            and not (
+                expected.get(key) is None and set(stored[key]) <= empty_values
+            )
+        }
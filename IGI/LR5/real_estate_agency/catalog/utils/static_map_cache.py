@@ -0,0 +1,63 @@
+import hashlib
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+
+from .mapbox_client import MapboxClient
+
+logger = logging.getLogger(__name__)
+
+
+class StaticMapCache(object):
+    """On-disk copies of Mapbox static maps under ``MEDIA_ROOT``.
+
+    File names carry a digest of the coordinates, so moving an estate
+    produces a new file and the old one is removed on the next fetch.
+    """
+
+    @staticmethod
+    def version(lng, lat):
+        key = f"{settings.MAPBOX_STATIC_MAP_API}|{lng:.6f},{lat:.6f}"
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def _directory():
+        return Path(settings.MEDIA_ROOT) / settings.STATIC_MAP_CACHE_DIR
+
+    @staticmethod
+    def get_path(estate):
+        version = StaticMapCache.version(estate.lng, estate.lat)
+        return StaticMapCache._directory() / f"{estate.pk}-{version}.png"
+
+    @staticmethod
+    def fetch(estate):
+        path = StaticMapCache.get_path(estate)
+        if path.exists():
+            logger.debug(f"Static map for estate {estate.pk} served from {path}")
+            return path
+
+        content = MapboxClient.fetch_static_map(estate.lng, estate.lat)
+        if content is None:
+            return None
+
+        StaticMapCache.invalidate(estate.pk)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(content)
+        os.replace(tmp_path, path)
+
+        logger.info(f"Static map for estate {estate.pk} stored in {path}")
+        return path
+
+    @staticmethod
+    def invalidate(estate_id):
+        for path in StaticMapCache._directory().glob(f"{estate_id}-*.png"):
+            try:
+                path.unlink()
+                logger.debug(f"Static map {path} removed")
+            except FileNotFoundError:
+                pass
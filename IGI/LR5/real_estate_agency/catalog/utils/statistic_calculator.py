@@ -2,7 +2,7 @@ import logging
 from datetime import timedelta
 
 import pandas as pd
-from django.db.models import Count, Sum, F
+from django.db.models import Sum, F
 from django.utils import timezone
 from users.models import Client, Employee
 
@@ -15,9 +15,10 @@ class StatisticsCalculator(object):
     @staticmethod
     def get_sale_cost_stats():
         logger.info("StatisticCalculator.get_sale_cost_stats()")
-        sales = Sale.objects.all()
+        rows = list(Sale.objects.values_list("cost", "service_cost"))
+        sale_costs, service_costs = zip(*rows) if rows else ((), ())
 
-        estate_df = pd.Series([float(s.cost) for s in sales])
+        estate_df = pd.Series([float(cost) for cost in sale_costs], dtype=float)
         full_cost_stats = {
             "mean_cost": estate_df.mean() or 0,
             "median_cost": estate_df.median() or 0,
@@ -25,7 +26,9 @@ class StatisticsCalculator(object):
         }
         logger.debug(f"full_cost_stats: {full_cost_stats}")
 
-        service_df = pd.Series([float(s.estate.category.cost) for s in sales])
+        service_df = pd.Series(
+            [float(cost or 0) for cost in service_costs], dtype=float
+        )
         service_cost_stats = {
             "mean_cost": service_df.mean() or 0,
             "median_cost": service_df.median() or 0,
@@ -63,8 +66,8 @@ class StatisticsCalculator(object):
         logger.info("StatisticCalculator.get_services_sold_estate_count()")
 
         services = (
-            Service.objects.filter(estate__sale__isnull=False)
-            .annotate(count=Count("estate"))
+            Service.objects.filter(sales_rollup__sold_count__gt=0)
+            .annotate(count=F("sales_rollup__sold_count"))
             .order_by("-count")
         )
         counts = services.values_list("count", flat=True)
@@ -77,10 +80,8 @@ class StatisticsCalculator(object):
         logger.info("StatisticCalculator.get_services_by_service_profit()")
 
         services_by_service_profit = (
-            Service.objects.filter(
-                estate__sale__isnull=False,
-            )
-            .annotate(total_service_cost=Sum("estate__category__cost"))
+            Service.objects.filter(sales_rollup__sold_count__gt=0)
+            .annotate(total_service_cost=F("sales_rollup__service_cost_sum"))
             .order_by("-total_service_cost")
         )
         service_profits = services_by_service_profit.values_list(
@@ -96,8 +97,8 @@ class StatisticsCalculator(object):
         logger.info("StatisticCalculator.get_services_by_full_costs()")
 
         services_by_full_costs = (
-            Service.objects.filter(estate__sale__isnull=False)
-            .annotate(total_value=Sum("estate__cost") + Sum("cost"))
+            Service.objects.filter(sales_rollup__sold_count__gt=0)
+            .annotate(total_value=F("sales_rollup__full_cost_sum"))
             .order_by("-total_value")
         )
         profits = services_by_full_costs.values_list("total_value", flat=True)
@@ -105,14 +106,21 @@ class StatisticsCalculator(object):
 
         return services_by_full_costs, profits
 
+    @staticmethod
+    def _employee_rollups(days_ago):
+        since = timezone.localdate() - timedelta(days=days_ago)
+        return Employee.objects.filter(
+            daily_sales_rollups__date__gte=since,
+            daily_sales_rollups__sale_count__gt=0,
+        ).select_related("user")
+
     @staticmethod
     def get_employees_by_service_profit(days_ago=30):
         logger.info("StatisticCalculator.get_employees_by_service_profit()")
 
-        time_ago = timezone.now() - timedelta(days=days_ago)
         employee_service_stats = (
-            Employee.objects.filter(sale__date_of_sale__gte=time_ago)
-            .annotate(total_service_cost=Sum("sale__estate__category__cost"))
+            StatisticsCalculator._employee_rollups(days_ago)
+            .annotate(total_service_cost=Sum("daily_sales_rollups__service_cost_sum"))
             .order_by("-total_service_cost")
         )
         costs = employee_service_stats.values_list("total_service_cost", flat=True)
@@ -124,14 +132,46 @@ class StatisticsCalculator(object):
     def get_employees_by_full_costs(days_ago=30):
         logger.info("StatisticCalculator.get_employees_by_full_costs()")
 
-        time_ago = timezone.now() - timedelta(days=days_ago)
         employee_total_stats = (
-            Employee.objects.filter(sale__date_of_sale__gte=time_ago)
-            .annotate(
-                total_cost=Sum("sale__cost"))
+            StatisticsCalculator._employee_rollups(days_ago)
+            .annotate(total_cost=Sum("daily_sales_rollups__total_cost_sum"))
             .order_by("-total_cost")
         )
         costs = employee_total_stats.values_list("total_cost", flat=True)
         logger.debug(f"employee_total_stats: {employee_total_stats}")
 
         return employee_total_stats, costs
+
+    CHARTS = {
+        "services_by_sold_count": "get_services_by_sold_count",
+        "services_by_service_profit": "get_services_by_service_profit",
+        "services_by_full_costs": "get_services_by_full_costs",
+        "employee_service_stats": "get_employees_by_service_profit",
+        "employee_total_stats": "get_employees_by_full_costs",
+    }
+
+    @staticmethod
+    def to_chart_series(name, objects, values):
+        if name.startswith("employee"):
+            labels = [employee.user.username for employee in objects]
+        else:
+            labels = [str(service)[:12] for service in objects]
+
+        return [float(value) for value in values], labels
+
+    @staticmethod
+    def get_chart_series(name):
+        logger.info(f"StatisticCalculator.get_chart_series({name})")
+
+        objects, values = getattr(
+            StatisticsCalculator, StatisticsCalculator.CHARTS[name]
+        )()
+        return StatisticsCalculator.to_chart_series(name, objects, values)
+
+    @staticmethod
+    def get_all_chart_series():
+        charts = {}
+        for name in StatisticsCalculator.CHARTS:
+            values, labels = StatisticsCalculator.get_chart_series(name)
+            charts[name] = {"labels": labels, "values": values}
+        return charts
@@ -1,18 +1,39 @@
+import copy
+import hashlib
+import json
 import logging
 
 from django.contrib import messages
-from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Q
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
 from django.shortcuts import redirect, get_object_or_404
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from django.views import View
 from django.views.generic import ListView, DetailView, CreateView, TemplateView
 from django.conf import settings
+from django.core.paginator import InvalidPage, Paginator
 from users.models import Client, Employee
 
 from .forms import PurchaseRequestForm
-from .models import ServiceCategory, Service, Estate, Sale, PurchaseRequest
-from .utils import Plotter, StatisticsCalculator, MapboxClient
+from .models import Service, Estate, Sale, PurchaseRequest
+from .utils import (
+    ChartCache,
+    CursorPaginator,
+    EstateFacets,
+    EstateGeoSearch,
+    EstatePurchase,
+    EstateRecommender,
+    EstateResultCache,
+    EstateSearch,
+    EstateUnavailableError,
+    PurchaseRequestBatch,
+    ReferenceData,
+    StatisticsCalculator,
+    StaticMapCache,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -20,33 +41,34 @@ logger = logging.getLogger(__name__)
 class ServiceListView(ListView):
     model = Service
     template_name = "service_list.html"
+    context_object_name = "service_list"
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        services = ReferenceData.services()
         logger.debug(f"Getting queryset of service list")
 
         service_category = self.request.GET.get("service_category")
         if service_category:
             logger.debug(f"Filtering by service_category: {service_category}")
-            queryset = queryset.filter(category_id=service_category)
+            services = [s for s in services if str(s.category_id) == service_category]
 
         min_price = self.request.GET.get("min_price")
         max_price = self.request.GET.get("max_price")
 
         if min_price:
             logger.debug(f"Filtering by min_price: {min_price}")
-            queryset = queryset.filter(cost__gte=float(min_price))
+            services = [s for s in services if s.cost >= float(min_price)]
 
         if max_price:
             logger.debug(f"Filtering by max_price: {max_price}")
-            queryset = queryset.filter(cost__lte=float(max_price))
+            services = [s for s in services if s.cost <= float(max_price)]
 
         logger.info("ServiceListView queryset prepared")
-        return queryset.select_related("category")
+        return services
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["service_categories"] = ServiceCategory.objects.all()
+        context["service_categories"] = ReferenceData.service_categories()
         return context
 
 
@@ -55,21 +77,39 @@ class AvailableEstateListView(LoginRequiredMixin, ListView):
     template_name = "estate_list.html"
     paginate_by = 9
     ordering = "-cost"
+    # Everything the estate cards render; the full description is left out.
+    list_fields = (
+        "id",
+        "address",
+        "cost",
+        "area",
+        "image",
+        "summary",
+        "category__id",
+        "category__name",
+        "category__category_id",
+    )
+
+    @property
+    def cursor_paging(self):
+        return self.request.GET.get("paging") == "cursor"
 
     def get_queryset(self):
         logger.debug("Fetching queryset for AvailableEstateListView")
-        sold_estates_ids = Sale.objects.all().values_list("estate_id", flat=True)
-        queryset = Estate.objects.exclude(id__in=sold_estates_ids).select_related(
-            "category"
+        self.sort_ordering = self.ordering
+        self.result_ordering = None
+        queryset = (
+            Estate.objects.filter(is_available=True)
+            .select_related("category")
+            .only(*self.list_fields)
         )
 
         search_query = self.request.GET.get("search")
         if search_query:
-            queryset = queryset.filter(
-                Q(address__icontains=search_query)
-                | Q(description__icontains=search_query)
-                | Q(category__name__icontains=search_query)
-            )
+            logger.debug(f"Searching for: {search_query}")
+            queryset, ranked = EstateSearch.filter(queryset, search_query)
+        else:
+            ranked = False
 
         category_id = self.request.GET.get("category")
         if category_id:
@@ -90,6 +130,28 @@ class AvailableEstateListView(LoginRequiredMixin, ListView):
             logger.debug(f"Filtering by max_price: {max_price}")
             queryset = queryset.filter(cost__lte=max_price)
 
+        bbox = self.request.GET.get("bbox")
+        if bbox:
+            box = EstateGeoSearch.parse_bbox(bbox)
+            if box:
+                logger.debug(f"Filtering by bbox: {box}")
+                queryset = EstateGeoSearch.in_bbox(queryset, *box)
+            else:
+                logger.warning(f"Invalid bbox: {bbox}")
+
+        point = None
+        if self.request.GET.get("radius"):
+            point = EstateGeoSearch.parse_point(
+                self.request.GET.get("lat"),
+                self.request.GET.get("lng"),
+                self.request.GET.get("radius"),
+            )
+            if point:
+                logger.debug(f"Filtering by distance: {point}")
+                queryset = EstateGeoSearch.within(queryset, *point)
+            else:
+                logger.warning("Invalid lat/lng/radius parameters")
+
         sort = self.request.GET.get("sort")
         if sort:
             logger.debug(f"Sorting by: {sort}")
@@ -100,10 +162,17 @@ class AvailableEstateListView(LoginRequiredMixin, ListView):
                 "area_desc": "-area",
             }
             if sort in sort_options:
-                queryset = queryset.order_by(sort_options[sort])
+                self.sort_ordering = sort_options[sort]
             else:
                 logger.warning(f"Invalid sort option: {sort}")
-                queryset = queryset.order_by(self.ordering)
+                self.sort_ordering = self.ordering
+            queryset = queryset.order_by(self.sort_ordering)
+        elif ranked and not self.cursor_paging:
+            queryset = EstateSearch.order_by_rank(queryset, search_query, self.ordering)
+            self.result_ordering = "rank"
+        elif point and not self.cursor_paging:
+            queryset = queryset.order_by("distance", "id")
+            self.result_ordering = "distance"
         else:
             queryset = queryset.order_by(self.ordering)
 
@@ -112,12 +181,94 @@ class AvailableEstateListView(LoginRequiredMixin, ListView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["categories"] = Service.objects.all()
-        context["service_categories"] = ServiceCategory.objects.all()
+        facets = EstateFacets.get(self.object_list, self.request.GET)
+        # Snapshot objects are shared between requests, annotate copies.
+        context["categories"] = [copy.copy(c) for c in ReferenceData.services()]
+        for category in context["categories"]:
+            category.facet_count = facets["categories"].get(category.id, 0)
+        context["service_categories"] = [
+            copy.copy(c) for c in ReferenceData.service_categories()
+        ]
+        for service_category in context["service_categories"]:
+            service_category.facet_count = facets["service_categories"].get(
+                service_category.id, 0
+            )
+        context["price_facets"] = self._price_facets(facets["prices"])
         context["search_query"] = self.request.GET.get("search", "")
         context["current_sort"] = self.request.GET.get("sort")
+        context["cursor_paging"] = self.cursor_paging
         return context
 
+    def _price_facets(self, counts):
+        price_facets = []
+        for index, lower, upper in EstateFacets.price_buckets():
+            query = self.request.GET.copy()
+            for name in ("page", "cursor", "min_price", "max_price"):
+                query.pop(name, None)
+            query.update(EstateFacets.bucket_filters(lower, upper))
+            price_facets.append({
+                "lower": lower,
+                "upper": upper,
+                "count": counts.get(index, 0),
+                "url": f"{self.request.path}?{query.urlencode()}",
+            })
+        return price_facets
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.cursor_paging:
+            return self._paginate_by_cursor(queryset, page_size)
+
+        page_number = (
+            self.kwargs.get(self.page_kwarg) or self.request.GET.get(self.page_kwarg) or 1
+        )
+        key = EstateResultCache.key(
+            self.request.GET, self.result_ordering or self.sort_ordering, page_number
+        )
+        entry = EstateResultCache.get(key)
+        if entry is None:
+            paginator, page, object_list, is_paginated = super().paginate_queryset(
+                queryset, page_size
+            )
+            EstateResultCache.set(
+                key, [estate.pk for estate in page.object_list], paginator.count
+            )
+            return paginator, page, object_list, is_paginated
+
+        ids, count = entry
+        paginator = self.get_paginator(
+            queryset,
+            page_size,
+            orphans=self.get_paginate_orphans(),
+            allow_empty_first_page=self.get_allow_empty(),
+        )
+        paginator.count = count
+        try:
+            number = paginator.validate_number(
+                paginator.num_pages if page_number == "last" else page_number
+            )
+        except InvalidPage as e:
+            raise Http404(str(e))
+        page = paginator._get_page(EstateResultCache.hydrate(queryset, ids), number, paginator)
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def _paginate_by_cursor(self, queryset, page_size):
+        paginator = CursorPaginator(queryset, page_size, self.sort_ordering)
+        try:
+            page = paginator.page(self.request.GET.get("cursor"))
+        except InvalidPage as e:
+            raise Http404(str(e))
+
+        page.next_url = self._cursor_url(page.next_cursor)
+        page.previous_url = self._cursor_url(page.previous_cursor)
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def _cursor_url(self, cursor):
+        if cursor is None:
+            return None
+        query = self.request.GET.copy()
+        query["cursor"] = cursor
+        return f"{self.request.path}?{query.urlencode()}"
+
 
 class EstateDetailView(LoginRequiredMixin, DetailView):
     model = Estate
@@ -144,17 +295,48 @@ class EstateDetailView(LoginRequiredMixin, DetailView):
             )
 
         if self.request.user.is_authenticated:
-            context["map_image_url"] = MapboxClient.get_map_image_url(
-                self.object.address
-            )
+            if self.object.has_coordinates:
+                version = StaticMapCache.version(self.object.lng, self.object.lat)
+                context["map_image_url"] = (
+                    f"{reverse('estate_map', args=[self.object.pk])}?v={version}"
+                )
+            else:
+                context["map_image_url"] = settings.MAPBOX_DEFAULT_IMAGE
             logger.debug(
                 f"Map image URL for estate {self.object.id}: {context['map_image_url']}"
             )
 
+        context["similar_estates"] = EstateRecommender.similar_to(self.object)
+
         logger.info("EstateDetailView context prepared")
         return context
 
 
+class EstateMapView(LoginRequiredMixin, View):
+    def get(self, request, pk):
+        estate = get_object_or_404(Estate.objects.only("id", "lat", "lng"), pk=pk)
+        if not estate.has_coordinates:
+            logger.debug(f"Estate {pk} has no coordinates, redirecting to placeholder")
+            return redirect(settings.MAPBOX_DEFAULT_IMAGE)
+
+        etag = f'"{StaticMapCache.version(estate.lng, estate.lat)}"'
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            logger.debug(f"Static map for estate {pk} not modified")
+            response = HttpResponseNotModified()
+        else:
+            path = StaticMapCache.fetch(estate)
+            if path is None:
+                logger.warning(f"Static map for estate {pk} unavailable")
+                return redirect(settings.MAPBOX_DEFAULT_IMAGE)
+            response = FileResponse(open(path, "rb"), content_type="image/png")
+
+        response["ETag"] = etag
+        patch_cache_control(
+            response, private=True, max_age=settings.STATIC_MAP_CACHE_MAX_AGE
+        )
+        return response
+
+
 class CreatePurchaseRequestView(LoginRequiredMixin, CreateView):
     model = PurchaseRequest
     form_class = PurchaseRequestForm
@@ -240,14 +422,12 @@ class ClientDashboardView(LoginRequiredMixin, TemplateView):
         if action == "buy":
             if purchase_request.status in ["new", "in_progress"]:
                 logger.debug(f"Creating Sale for PurchaseRequest id={request_id}")
-                Sale.objects.create(
-                    client=purchase_request.client,
-                    employee=purchase_request.employee,
-                    estate=purchase_request.estate,
-                )
-
-                purchase_request.status = "completed"
-                purchase_request.save()
+                try:
+                    EstatePurchase.buy(purchase_request)
+                except EstateUnavailableError as error:
+                    logger.warning(f"Purchase of PurchaseRequest id={request_id} failed: {error}")
+                    messages.error(request, "This estate is no longer available.")
+                    return self.render_to_response(self.get_context_data(), status=409)
                 logger.info(
                     f"Sale created and PurchaseRequest id={request_id} marked as completed"
                 )
@@ -269,6 +449,7 @@ class ClientDashboardView(LoginRequiredMixin, TemplateView):
 
 class EmployeeDashboardView(LoginRequiredMixin, TemplateView):
     template_name = "employee_dashboard.html"
+    paginate_by = 10
 
     def get_context_data(self, **kwargs):
         logger.debug(
@@ -277,18 +458,50 @@ class EmployeeDashboardView(LoginRequiredMixin, TemplateView):
         context = super().get_context_data(**kwargs)
 
         if hasattr(self.request.user, "employee"):
-            context["clients"] = Client.objects.filter(
-                purchaserequest__employee=self.request.user.employee,
-                purchaserequest__status__in=["new", "in_progress"],
-            ).distinct()
-
-            context["requests"] = PurchaseRequest.objects.filter(
-                employee=self.request.user.employee, status__in=["new", "in_progress"]
-            ).select_related("estate", "client")
+            employee = self.request.user.employee
+            open_requests = PurchaseRequest.objects.filter(
+                employee=employee, status__in=PurchaseRequest.ACTIVE_STATUSES
+            )
 
-            context["sales"] = Sale.objects.filter(
-                employee=self.request.user.employee
-            ).select_related("estate", "client")
+            clients = (
+                Client.objects.filter(
+                    purchaserequest__employee=employee,
+                    purchaserequest__status__in=PurchaseRequest.ACTIVE_STATUSES,
+                )
+                .distinct()
+                .select_related("user")
+                .only("user__first_name", "user__last_name", "user__email")
+                .order_by("id")
+            )
+            context["clients"] = self._paginate(clients, "clients_page")
+
+            requests = (
+                open_requests.select_related("estate", "client__user")
+                .only(
+                    "status",
+                    "created_at",
+                    "estate__address",
+                    "client__user__first_name",
+                    "client__user__last_name",
+                )
+                .order_by("-created_at", "-id")
+            )
+            context["requests"] = self._paginate(requests, "requests_page")
+
+            sales = (
+                Sale.objects.filter(employee=employee)
+                .select_related("estate", "client__user")
+                .only(
+                    "date_of_sale",
+                    "cost",
+                    "service_cost",
+                    "estate__address",
+                    "client__user__first_name",
+                    "client__user__last_name",
+                )
+                .order_by("-date_of_sale", "-id")
+            )
+            context["sales"] = self._paginate(sales, "sales_page")
 
             logger.info(
                 f"EmployeeDashboardView context prepared for user {self.request.user.username}"
@@ -299,6 +512,97 @@ class EmployeeDashboardView(LoginRequiredMixin, TemplateView):
 
         return context
 
+    def _paginate(self, queryset, param):
+        """Page of one dashboard section; the other sections keep their
+        page numbers in the navigation links."""
+        page = Paginator(queryset, self.paginate_by).get_page(self.request.GET.get(param))
+        page.previous_url = page.next_url = None
+        if page.has_previous():
+            page.previous_url = self._page_url(param, page.previous_page_number())
+        if page.has_next():
+            page.next_url = self._page_url(param, page.next_page_number())
+        return page
+
+    def _page_url(self, param, number):
+        query = self.request.GET.copy()
+        query[param] = number
+        return f"{self.request.path}?{query.urlencode()}"
+
+
+class EmployeeRequestBatchView(LoginRequiredMixin, View):
+    """Moves many of the employee's open requests to another status."""
+
+    def post(self, request, *args, **kwargs):
+        if not hasattr(request.user, "employee"):
+            logger.warning(f"User {request.user.username} is not an employee")
+            messages.error(request, "You must be employee.")
+            return redirect("employee_dashboard")
+
+        status = request.POST.get("status")
+        request_ids = None
+        if request.POST.get("select") != "all":
+            request_ids = [pk for pk in request.POST.getlist("request_id") if pk.isdigit()]
+            if not request_ids:
+                logger.error("No request_id provided in batch POST request")
+                messages.error(request, "No requests selected.")
+                return redirect("employee_dashboard")
+
+        try:
+            moved = PurchaseRequestBatch.set_status(
+                request.user.employee, status, request_ids
+            )
+        except ValueError as error:
+            logger.error(f"Batch update by {request.user.username} rejected: {error}")
+            messages.error(request, "Incorrect request.")
+            return redirect("employee_dashboard")
+
+        messages.success(request, f"Updated requests: {moved}.")
+        return redirect("employee_dashboard")
+
+
+class SuperuserRequiredMixin(UserPassesTestMixin):
+    """Statistics are only shown to superusers, see statistics.html."""
+
+    def test_func(self):
+        return self.request.user.is_superuser
+
+
+class StatisticsChartView(LoginRequiredMixin, SuperuserRequiredMixin, View):
+    def get(self, request, name):
+        if name not in StatisticsCalculator.CHARTS:
+            raise Http404(f"Unknown chart: {name}")
+
+        data, categories = StatisticsCalculator.get_chart_series(name)
+        etag = f'"{ChartCache.version(name, data, categories)}"'
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            logger.debug(f"Chart {name} not modified")
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(
+                ChartCache.get_image(name, data, categories), content_type="image/jpeg"
+            )
+
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, max_age=settings.CHART_MAX_AGE)
+        return response
+
+
+class StatisticsDataView(LoginRequiredMixin, SuperuserRequiredMixin, View):
+    def get(self, request):
+        payload = {"charts": StatisticsCalculator.get_all_chart_series()}
+        content = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+        etag = f'"{hashlib.sha1(content.encode("utf-8")).hexdigest()[:16]}"'
+
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            logger.debug("Statistics data not modified")
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type="application/json")
+
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
 
 class StatisticsView(LoginRequiredMixin, TemplateView):
     template_name = "statistics.html"
@@ -327,39 +631,28 @@ class StatisticsView(LoginRequiredMixin, TemplateView):
             StatisticsCalculator.get_employees_by_full_costs()
         )
 
-        image_paths = {
-            "services_by_sold_count": f"{settings.MEDIA_URL}services_by_sold_count.jpg",
-            "services_by_service_profit": f"{settings.MEDIA_URL}services_by_service_profit.jpg",
-            "employee_service_stats": f"{settings.MEDIA_URL}employee_service_stats.jpg",
-            "employee_total_stats": f"{settings.MEDIA_URL}employee_total_stats.jpg",
-            "services_by_full_costs": f"{settings.MEDIA_URL}services_by_full_costs.jpg",
+        chart_data = {
+            "services_by_sold_count": (services_by_sold_count, counts),
+            "services_by_service_profit": (
+                services_by_service_profit,
+                service_profits,
+            ),
+            "employee_service_stats": (
+                employee_service_stats,
+                employee_service_costs,
+            ),
+            "employee_total_stats": (employee_total_stats, total_costs),
+            "services_by_full_costs": (services_by_full_costs, full_costs),
         }
-
-        Plotter.plt_bars(
-            counts,
-            path=image_paths["services_by_sold_count"][1:],
-            categories=(str(s)[:12] for s in services_by_sold_count),
-        )
-        Plotter.plt_bars(
-            service_profits,
-            path=image_paths["services_by_service_profit"][1:],
-            categories=(str(s)[:12] for s in services_by_sold_count),
-        )
-        Plotter.plt_bars(
-            employee_service_costs,
-            path=image_paths["employee_service_stats"][1:],
-            categories=(e.user.username for e in employee_service_stats),
-        )
-        Plotter.plt_bars(
-            total_costs,
-            path=image_paths["employee_total_stats"][1:],
-            categories=(e.user.username for e in employee_total_stats),
-        )
-        Plotter.plt_bars(
-            full_costs,
-            path=image_paths["services_by_full_costs"][1:],
-            categories=(str(s)[:12] for s in services_by_full_costs),
-        )
+        chart_images = {}
+        for name, (objects, values) in chart_data.items():
+            data, categories = StatisticsCalculator.to_chart_series(
+                name, objects, values
+            )
+            version = ChartCache.version(name, data, categories)
+            chart_images[name] = (
+                f"{reverse('statistics_chart', args=[name])}?v={version}"
+            )
 
         context.update(
             {
@@ -371,7 +664,9 @@ class StatisticsView(LoginRequiredMixin, TemplateView):
                 "employee_service_stats": employee_service_stats,
                 "employee_total_stats": employee_total_stats,
                 "highest_cost_service": services_by_full_costs.first(),
-                "chart_images": image_paths,
+                "chart_images": chart_images,
+                "client_side_charts": settings.STATISTICS_CLIENT_SIDE_CHARTS,
+                "statistics_data_url": reverse("statistics_data"),
             }
         )
 
@@ -0,0 +1,176 @@
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised without touching the network while a host is failing."""
+
+
+class CircuitBreaker(object):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                return True
+            # Only one trial request is let through while half-open.
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class HostMetrics(object):
+    def __init__(self):
+        self.requests = 0
+        self.failures = 0
+        self.rejected = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, latency, failed):
+        with self._lock:
+            self.requests += 1
+            self.failures += int(failed)
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def record_rejected(self):
+        with self._lock:
+            self.rejected += 1
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "avg_latency_ms": (
+                    self.total_latency / self.requests * 1000 if self.requests else 0.0
+                ),
+                "max_latency_ms": self.max_latency * 1000,
+            }
+
+
+class _Host(object):
+    def __init__(self):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=settings.OUTBOUND_HTTP_POOL_SIZE
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.breaker = CircuitBreaker(
+            settings.OUTBOUND_HTTP_FAILURE_THRESHOLD,
+            settings.OUTBOUND_HTTP_RESET_TIMEOUT,
+        )
+        self.slots = threading.BoundedSemaphore(settings.OUTBOUND_HTTP_MAX_CONCURRENCY)
+        self.metrics = HostMetrics()
+
+
+class OutboundHttpClient(object):
+    """Process-wide entry point for calls to third-party HTTP APIs.
+
+    Every host gets a pooled keep-alive session, a circuit breaker and a
+    bounded number of concurrent requests. Callers handle
+    ``requests.RequestException`` as before: an open circuit or an exhausted
+    concurrency limit surface as ``CircuitOpenError``.
+    """
+
+    _hosts = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def _host(cls, host):
+        with cls._lock:
+            if host not in cls._hosts:
+                cls._hosts[host] = _Host()
+            return cls._hosts[host]
+
+    @classmethod
+    def get(cls, url, **kwargs):
+        return cls.request("GET", url, **kwargs)
+
+    @classmethod
+    def request(cls, method, url, **kwargs):
+        host_name = urlsplit(url).netloc
+        host = cls._host(host_name)
+
+        # The slot is taken first: asking the breaker may move it to
+        # half-open, and that trial must not be lost to a timed-out acquire.
+        if not host.slots.acquire(timeout=settings.OUTBOUND_HTTP_ACQUIRE_TIMEOUT):
+            host.metrics.record_rejected()
+            logger.warning(f"Too many concurrent requests to {host_name}")
+            raise CircuitOpenError(f"Concurrency limit reached for {host_name}")
+
+        if not host.breaker.allow():
+            host.slots.release()
+            host.metrics.record_rejected()
+            logger.warning(f"Circuit open for {host_name}, skipping {method} {url}")
+            raise CircuitOpenError(f"Circuit open for {host_name}")
+
+        started = time.monotonic()
+        failed = True
+        try:
+            response = host.session.request(method, url, **kwargs)
+            failed = response.status_code >= 500
+            return response
+        finally:
+            host.slots.release()
+            latency = time.monotonic() - started
+            host.metrics.record(latency, failed)
+            if failed:
+                host.breaker.record_failure()
+                logger.warning(f"{method} {url} failed after {latency:.3f}s")
+            else:
+                host.breaker.record_success()
+
+    @classmethod
+    def get_metrics(cls):
+        with cls._lock:
+            hosts = dict(cls._hosts)
+        return {
+            name: dict(host.metrics.as_dict(), circuit=host.breaker.state)
+            for name, host in hosts.items()
+        }
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            for host in cls._hosts.values():
+                host.session.close()
+            cls._hosts.clear()
@@ -68,6 +68,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "users.context_processors.timezone_cookie",
             ],
         },
     },
@@ -162,6 +163,11 @@ USE_I18N = True
 
 USE_TZ = True
 
+TIMEZONE_COOKIE_NAME = 'tz'
+TIMEZONE_CACHE_TTL = 60 * 60 * 24
+# Optional CSV of start_ip,end_ip,timezone rows used before ip-api.com
+TIMEZONE_IP_RANGES_FILE = None
+
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
@@ -170,11 +176,39 @@ STATIC_URL = "static/"
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "geocoding": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.path.join(BASE_DIR, "cache", "geocoding"),
+        "TIMEOUT": None,
+    },
+    # Version keys and counters every worker process must see.
+    "coordination": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.path.join(BASE_DIR, "cache", "coordination"),
+        "TIMEOUT": None,
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Outbound HTTP
+
+OUTBOUND_HTTP_POOL_SIZE = 10
+OUTBOUND_HTTP_MAX_CONCURRENCY = 10
+OUTBOUND_HTTP_ACQUIRE_TIMEOUT = 0.5
+OUTBOUND_HTTP_FAILURE_THRESHOLD = 5
+OUTBOUND_HTTP_RESET_TIMEOUT = 30
+
 # Mapbox
 
 MAPBOX_ACCESS_TOKEN = Config.MAPBOX_ACCESS_TOKEN
@@ -182,3 +216,48 @@ MAPBOX_GEOCODING_API = 'https://api.mapbox.com/geocoding/v5/mapbox.places/{}.jso
 MAPBOX_STATIC_MAP_API = 'https://api.mapbox.com/styles/v1/mapbox/streets-v12/static/pin-s+0d6efd({lng},{lat})/{lng},{lat},15,0/600x400?access_token={token}'
 MAPBOX_LANGUAGE = 'ru'
 MAPBOX_DEFAULT_IMAGE = MEDIA_URL + 'map_placeholder.jpg'
+
+GEOCODE_CACHE_ALIAS = 'geocoding'
+COORDINATION_CACHE_ALIAS = 'coordination'
+GEOCODE_CACHE_TTL = 60 * 60 * 24 * 30
+GEOCODE_CACHE_NEGATIVE_TTL = 60 * 60
+GEOCODE_CACHE_LOCAL_SIZE = 1024
+
+STATIC_MAP_CACHE_DIR = 'maps'
+STATIC_MAP_CACHE_MAX_AGE = 60 * 60 * 24 * 365
+
+# Estate search
+
+# Totals shown in cursor pagination mode are refreshed this often
+ESTATE_COUNT_CACHE_TTL = 60
+# Upper bounds of the price filter buckets, the last bucket is open-ended
+ESTATE_PRICE_BUCKETS = [50000, 100000, 200000, 500000]
+ESTATE_FACETS_CACHE_TTL = 60 * 10
+ESTATE_RESULT_CACHE_TTL = 60 * 5
+# Geo search: stored geohash length and the limits of a single search
+ESTATE_GEOHASH_PRECISION = 9
+GEO_SEARCH_MAX_CELLS = 16
+GEO_SEARCH_MAX_RADIUS_KM = 50
+# Similar estates shown on the detail page and rows compared per batch
+SIMILAR_ESTATES_COUNT = 4
+SIMILAR_ESTATES_BATCH_SIZE = 256
+# How often a worker checks whether services or service categories changed
+REFERENCE_DATA_CHECK_INTERVAL = 5
+# Snapshots are reloaded after this long even if no change was announced
+REFERENCE_DATA_MAX_AGE = 60 * 5
+
+# Purchase request assignment
+
+# least_loaded, round_robin, weighted_capacity or client_affinity
+EMPLOYEE_ASSIGNMENT_STRATEGY = 'least_loaded'
+# How often a worker checks whether employees or their clients changed
+EMPLOYEE_LOAD_INDEX_CHECK_INTERVAL = 5
+# The index is reloaded after this long even if no change was announced
+EMPLOYEE_LOAD_INDEX_MAX_AGE = 60
+
+# Statistics charts
+
+# Render charts in the browser from statistics/data/ instead of Plotter images
+STATISTICS_CLIENT_SIDE_CHARTS = False
+CHART_CACHE_TTL = 60 * 60 * 24
+CHART_MAX_AGE = 60 * 60 * 24 * 30
@@ -22,7 +22,11 @@ from django.urls import include
 from django.urls import path
 from django.views.generic import RedirectView
 
+from .views import cache_stats, outbound_http_metrics
+
 urlpatterns = [
+    path("admin/outbound-http/", outbound_http_metrics, name="outbound_http_metrics"),
+    path("admin/cache-stats/", cache_stats, name="cache_stats"),
     path("admin/", admin.site.urls),
     path('catalog/', include('catalog.urls')),
     path('home/', include('home.urls')),
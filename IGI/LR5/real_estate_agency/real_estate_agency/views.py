@@ -0,0 +1,19 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+
+from catalog.utils import EstateResultCache, GeocodeCache
+
+from .http_client import OutboundHttpClient
+
+
+@staff_member_required
+def outbound_http_metrics(request):
+    return JsonResponse(OutboundHttpClient.get_metrics())
+
+
+@staff_member_required
+def cache_stats(request):
+    return JsonResponse({
+        "estate_results": EstateResultCache.get_stats(),
+        "geocode": GeocodeCache.get_stats(),
+    })
@@ -0,0 +1,5 @@
+from django.conf import settings
+
+
+def timezone_cookie(request):
+    return {"TIMEZONE_COOKIE_NAME": settings.TIMEZONE_COOKIE_NAME}
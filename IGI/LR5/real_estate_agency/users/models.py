@@ -61,6 +61,17 @@ class Employee(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     hire_date = models.DateField()
     clients = models.ManyToManyField(Client, blank=True)
+    # Open purchase requests assigned to the employee, kept by catalog signals.
+    active_request_count = models.PositiveIntegerField(default=0, editable=False)
+    # Open requests the employee is expected to handle at once.
+    capacity = models.PositiveSmallIntegerField(default=10)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["active_request_count", "id"], name="employee_load_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.username}"
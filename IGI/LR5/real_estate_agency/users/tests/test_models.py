@@ -1,11 +1,13 @@
 from datetime import datetime
 
 from django.core.exceptions import ValidationError
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from catalog.tests.caches import LOCMEM_CACHES
 
 from ..models import User, Profile, Client, Employee
 
 
+@override_settings(CACHES=LOCMEM_CACHES)
 class UserModelTest(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -86,6 +88,7 @@ class UserModelTest(TestCase):
             user.full_clean()
 
 
+@override_settings(CACHES=LOCMEM_CACHES)
 class ProfileModelTest(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -128,6 +131,7 @@ class ProfileModelTest(TestCase):
         new_user.full_clean()
 
 
+@override_settings(CACHES=LOCMEM_CACHES)
 class ClientModelTest(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -169,6 +173,7 @@ class ClientModelTest(TestCase):
         self.assertEqual(self.client.user.first_name, "Client")
 
 
+@override_settings(CACHES=LOCMEM_CACHES)
 class EmployeeModelTest(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -1,7 +1,15 @@
+import os
+import tempfile
 from datetime import date
+from unittest.mock import patch
+
+import pytz
+import requests
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.test import TestCase
-from ..utils import RestrictedAgeValidator
+from django.test import RequestFactory, TestCase, override_settings
+from real_estate_agency.http_client import OutboundHttpClient
+from ..utils import RestrictedAgeValidator, TimezoneService
 
 class RestrictedAgeValidatorTests(TestCase):
     def setUp(self):
@@ -31,3 +39,95 @@ class RestrictedAgeValidatorTests(TestCase):
     def test_invalid_input_type(self):
         with self.assertRaises(TypeError):
             self.validator("2000-05-08")
+
+
+class TimezoneServiceTests(TestCase):
+    def setUp(self):
+        OutboundHttpClient.reset()
+        self.addCleanup(OutboundHttpClient.reset)
+
+    @patch("requests.Session.request")
+    def test_timezone_from_ip(self, mock_request):
+        mock_request.return_value.status_code = 200
+        mock_request.return_value.json.return_value = {"timezone": "Europe/Minsk"}
+        self.assertEqual(
+            TimezoneService.get_timezone_from_ip("1.2.3.4"),
+            pytz.timezone("Europe/Minsk"),
+        )
+
+    @patch("requests.Session.request")
+    def test_outage_returns_none(self, mock_request):
+        mock_request.side_effect = requests.Timeout("slow")
+        self.assertIsNone(TimezoneService.get_timezone_from_ip("1.2.3.4"))
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class TimezoneCachingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def make_request(self, ip="1.2.3.4", **cookies):
+        request = self.factory.get("/", REMOTE_ADDR=ip)
+        request.COOKIES.update(cookies)
+        request.session = {}
+        return request
+
+    @patch.object(TimezoneService, "get_timezone_from_ip")
+    def test_cookie_skips_lookup(self, mock_lookup):
+        request = self.make_request(tz="Asia/Tokyo")
+        self.assertEqual(TimezoneService.get_timezone(request), pytz.timezone("Asia/Tokyo"))
+        mock_lookup.assert_not_called()
+
+    @patch.object(TimezoneService, "get_timezone_from_ip")
+    def test_invalid_cookie_is_ignored(self, mock_lookup):
+        mock_lookup.return_value = pytz.timezone("Europe/Minsk")
+        request = self.make_request(tz="Not/AZone")
+        self.assertEqual(TimezoneService.get_timezone(request), pytz.timezone("Europe/Minsk"))
+
+    @patch.object(TimezoneService, "get_timezone_from_ip")
+    def test_memoized_in_session(self, mock_lookup):
+        mock_lookup.return_value = pytz.timezone("Europe/Minsk")
+        request = self.make_request()
+        TimezoneService.get_timezone(request)
+        cache.clear()
+        TimezoneService.get_timezone(request)
+        self.assertEqual(mock_lookup.call_count, 1)
+        self.assertEqual(request.session["timezone"]["timezone"], "Europe/Minsk")
+
+    @patch.object(TimezoneService, "get_timezone_from_ip")
+    def test_cached_per_ip(self, mock_lookup):
+        mock_lookup.return_value = pytz.timezone("Europe/Minsk")
+        TimezoneService.get_timezone(self.make_request())
+        TimezoneService.get_timezone(self.make_request())
+        TimezoneService.get_timezone(self.make_request(ip="5.6.7.8"))
+        self.assertEqual(mock_lookup.call_count, 2)
+
+    @patch.object(TimezoneService, "get_timezone_from_ip")
+    def test_failed_lookup_is_not_remembered(self, mock_lookup):
+        mock_lookup.return_value = None
+        request = self.make_request()
+        self.assertEqual(TimezoneService.get_timezone(request), pytz.UTC)
+        self.assertNotIn("timezone", request.session)
+        self.assertIsNone(cache.get("timezone:ip:1.2.3.4"))
+
+        mock_lookup.return_value = pytz.timezone("Europe/Minsk")
+        self.assertEqual(TimezoneService.get_timezone(request), pytz.timezone("Europe/Minsk"))
+        self.assertEqual(mock_lookup.call_count, 2)
+
+    @patch.object(TimezoneService, "get_timezone_from_ip")
+    def test_offline_table(self, mock_lookup):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+            f.write("1.0.0.0,1.255.255.255,Asia/Tokyo\n")
+            f.write("5.0.0.0,5.255.255.255,Europe/Minsk\n")
+        self.addCleanup(os.remove, f.name)
+
+        with self.settings(TIMEZONE_IP_RANGES_FILE=f.name):
+            self.assertEqual(
+                TimezoneService.get_timezone(self.make_request(ip="5.6.7.8")),
+                pytz.timezone("Europe/Minsk"),
+            )
+            self.assertEqual(TimezoneService.get_timezone_from_table("9.9.9.9"), None)
+        mock_lookup.assert_not_called()
@@ -1,6 +1,6 @@
 import datetime
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from home.models import Review
 from ..models import Client, User, Profile
@@ -30,6 +30,12 @@ class SignUpViewTest(TestCase):
         self.assertEqual(resp.status_code, 200)
         self.assertTemplateUsed(resp, "signup.html")
 
+    @override_settings(TIMEZONE_COOKIE_NAME="client_tz")
+    def test_timezone_cookie_name_from_settings(self):
+        resp = self.client.get(reverse("signup"))
+        self.assertEqual(resp.context["TIMEZONE_COOKIE_NAME"], "client_tz")
+        self.assertContains(resp, 'var name = "client_tz";')
+
     def test_signup_form_in_context(self):
         resp = self.client.get(reverse("signup"))
         self.assertEqual(resp.status_code, 200)
@@ -1,17 +1,115 @@
+import bisect
+import csv
+import ipaddress
+import logging
+from functools import lru_cache
+
 import pytz
-import requests
+from django.conf import settings
+from django.core.cache import cache
+from real_estate_agency.http_client import OutboundHttpClient
+
+logger = logging.getLogger(__name__)
+
+
+class IpRangeTimezoneTable:
+    """Offline lookup in a CSV of ``start_ip,end_ip,timezone`` rows."""
+
+    def __init__(self, rows):
+        self._ranges = sorted(
+            (int(ipaddress.ip_address(start)), int(ipaddress.ip_address(end)), tz)
+            for start, end, tz in rows
+        )
+        self._starts = [start for start, _, _ in self._ranges]
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def load(path):
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = [row[:3] for row in csv.reader(f) if len(row) >= 3]
+        logger.info(f"Loaded {len(rows)} IP ranges from {path}")
+        return IpRangeTimezoneTable(rows)
+
+    def lookup(self, ip):
+        try:
+            address = int(ipaddress.ip_address(ip))
+        except ValueError:
+            return None
+        index = bisect.bisect_right(self._starts, address) - 1
+        if index >= 0 and address <= self._ranges[index][1]:
+            return self._ranges[index][2]
+        return None
+
 
 class TimezoneService:
+    SESSION_KEY = "timezone"
+
+    @staticmethod
+    def _parse(name):
+        try:
+            return pytz.timezone(name) if name else None
+        except pytz.UnknownTimeZoneError:
+            return None
+
+    @staticmethod
+    def get_timezone_from_table(ip):
+        if not settings.TIMEZONE_IP_RANGES_FILE:
+            return None
+        try:
+            table = IpRangeTimezoneTable.load(settings.TIMEZONE_IP_RANGES_FILE)
+        except OSError as e:
+            logger.error(f"Can not read IP ranges table: {str(e)}")
+            return None
+        return TimezoneService._parse(table.lookup(ip))
+
     @staticmethod
     def get_timezone_from_ip(ip):
+        """Return the timezone reported for ``ip``, UTC when the service
+        does not know it, or None when the lookup failed."""
         try:
-            response = requests.get(f"http://ip-api.com/json/{ip}", timeout=3)
+            response = OutboundHttpClient.get(f"http://ip-api.com/json/{ip}", timeout=3)
             tz = response.json().get('timezone')
             return pytz.timezone(tz) if tz else pytz.timezone('UTC')
-        except:
-            return pytz.timezone('UTC')
+        except Exception as e:
+            logger.warning(f"Timezone lookup for {ip} failed: {str(e)}")
+            return None
+
+    @staticmethod
+    def resolve_ip(ip):
+        key = f"timezone:ip:{ip}"
+        user_timezone = TimezoneService._parse(cache.get(key))
+        if user_timezone:
+            return user_timezone
+
+        user_timezone = (
+            TimezoneService.get_timezone_from_table(ip)
+            or TimezoneService.get_timezone_from_ip(ip)
+        )
+        # Failures are not cached, the next request tries again.
+        if user_timezone:
+            cache.set(key, user_timezone.zone, settings.TIMEZONE_CACHE_TTL)
+        return user_timezone
 
     @staticmethod
     def get_timezone(request):
+        user_timezone = TimezoneService._parse(
+            request.COOKIES.get(settings.TIMEZONE_COOKIE_NAME)
+        )
+        if user_timezone:
+            return user_timezone
+
         ip = request.META.get('REMOTE_ADDR')
-        return TimezoneService.get_timezone_from_ip(ip)
\ No newline at end of file
+        memo = request.session.get(TimezoneService.SESSION_KEY)
+        if memo and memo.get("ip") == ip:
+            user_timezone = TimezoneService._parse(memo.get("timezone"))
+            if user_timezone:
+                return user_timezone
+
+        user_timezone = TimezoneService.resolve_ip(ip)
+        if user_timezone is None:
+            return pytz.timezone('UTC')
+        request.session[TimezoneService.SESSION_KEY] = {
+            "ip": ip,
+            "timezone": user_timezone.zone,
+        }
+        return user_timezone